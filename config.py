@@ -1,5 +1,31 @@
-from dataclasses import dataclass
-from typing import Dict, Any
+import dataclasses
+from dataclasses import dataclass, field
+from typing import Dict, Any, Mapping, Optional, Union, get_args, get_origin
+
+# 环境变量 SUFY_TEST_<配置段>_<字段> 覆盖配置文件中的值，例如 SUFY_TEST_OBJECT_BUCKET、SUFY_TEST_LOCAL_ENABLE
+ENV_PREFIX = 'SUFY_TEST_'
+
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+_FALSE_VALUES = ('0', 'false', 'no', 'off')
+
+
+def _parse_env_value(name: str, value: str, type_: Any) -> Any:
+    if get_origin(type_) is Union:
+        # Optional[X]：空字符串表示None
+        if value == '':
+            return None
+        type_ = next(t for t in get_args(type_) if t is not type(None))
+    if type_ is bool:
+        if value.lower() in _TRUE_VALUES:
+            return True
+        if value.lower() in _FALSE_VALUES:
+            return False
+        raise ValueError(f'{name}: expected a boolean, got {value!r}')
+    if type_ is list:
+        return [item.strip() for item in value.split(',') if item.strip()]
+    if type_ in (int, float):
+        return type_(value)
+    return value
 
 
 @dataclass()
@@ -38,21 +64,81 @@ class ProxyConfig:
 
 @dataclass()
 class VCRConfig:
+    # yaml / json / blob，blob 把较大的body按内容单独保存，见 util.blob_cassette
     serializer: str
     record_mode: str
     match_on: list
+    # 回放模式：整个测试用例（包括准备测试环境的请求）录制到持久化的cassette中，之后不再访问网络
+    replay: bool = False
+    # 大于该字节数的body只录制大小、sha256和开头若干字节，默认为空，录制完整的body；回放模式下不生效
+    body_digest_threshold: Optional[int] = None
 
     @staticmethod
     def from_dict(dict_: Dict[str, Any]):
         return VCRConfig(**dict_)
 
 
+@dataclass()
+class LocalServerConfig:
+    enable: bool = False
+    host: str = '127.0.0.1'
+    port: int = 0
+
+    @staticmethod
+    def from_dict(dict_: Dict[str, Any]):
+        return LocalServerConfig(**dict_)
+
+
+@dataclass()
+class ClientConfig:
+    # 默认值与sdk的默认值相同，并发请求数超过连接池大小时多出的连接用完即关闭
+    max_pool_connections: int = 10
+    connect_timeout: float = 60
+    read_timeout: float = 60
+    tcp_keepalive: bool = False
+    # legacy / standard / adaptive
+    retry_mode: str = 'legacy'
+    # 包括第一次请求在内的最大尝试次数，为空时使用重试模式的默认值
+    max_attempts: Optional[int] = None
+
+    @staticmethod
+    def from_dict(dict_: Dict[str, Any]):
+        return ClientConfig(**dict_)
+
+
+@dataclass()
+class CleanupConfig:
+    # 清空bucket时并发执行批量删除的线程数
+    workers: int = 8
+    # 大于1时按目录拆分后并发列举待删除的文件，回放模式下总是顺序列举
+    list_workers: int = 4
+
+    @staticmethod
+    def from_dict(dict_: Dict[str, Any]):
+        return CleanupConfig(**dict_)
+
+
+@dataclass()
+class ReportConfig:
+    # 记录client每次调用的耗时，每个测试用例结束时和进程退出时把各操作的耗时表输出到stderr；关闭时不记录
+    latency: bool = False
+
+    @staticmethod
+    def from_dict(dict_: Dict[str, Any]):
+        return ReportConfig(**dict_)
+
+
 @dataclass()
 class TestConfig:
     auth: AuthConfig
     object: ObjectConfig
     proxy: ProxyConfig
     vcr: VCRConfig
+    # 启用时测试用例连接本地的对象存储服务，忽略object.endpoint
+    local: LocalServerConfig = field(default_factory=LocalServerConfig)
+    client: ClientConfig = field(default_factory=ClientConfig)
+    cleanup: CleanupConfig = field(default_factory=CleanupConfig)
+    report: ReportConfig = field(default_factory=ReportConfig)
 
     @staticmethod
     def from_dict(dict_: Dict[str, Any]):
@@ -61,15 +147,41 @@ class TestConfig:
             object=ObjectConfig.from_dict(dict_['object']),
             proxy=ProxyConfig.from_dict(dict_['proxy']),
             vcr=VCRConfig.from_dict(dict_['vcr']),
+            local=LocalServerConfig.from_dict(dict_.get('local', {})),
+            client=ClientConfig.from_dict(dict_.get('client', {})),
+            cleanup=CleanupConfig.from_dict(dict_.get('cleanup', {})),
+            report=ReportConfig.from_dict(dict_.get('report', {})),
         )
 
+    def with_env_overrides(self, environ: Mapping[str, str]) -> 'TestConfig':
+        """
+        返回应用了 SUFY_TEST_<配置段>_<字段> 环境变量的新配置，字段名不区分大小写，
+        例如 SUFY_TEST_AUTH_ACCESSKEY、SUFY_TEST_CLIENT_MAX_POOL_CONNECTIONS、SUFY_TEST_VCR_MATCH_ON=method,uri
+        """
+        sections = {}
+        for section_field in dataclasses.fields(self):
+            section = getattr(self, section_field.name)
+            changes = {}
+            for f in dataclasses.fields(section):
+                name = f'{ENV_PREFIX}{section_field.name}_{f.name}'.upper()
+                if name in environ:
+                    changes[f.name] = _parse_env_value(name, environ[name], f.type)
+            if changes:
+                sections[section_field.name] = dataclasses.replace(section, **changes)
+        return dataclasses.replace(self, **sections)
+
 
 __all__ = [
+    'ENV_PREFIX',
     'TestConfig',
     'AuthConfig',
     'ObjectConfig',
     'VCRConfig',
     'ProxyConfig',
+    'LocalServerConfig',
+    'ClientConfig',
+    'CleanupConfig',
+    'ReportConfig',
 ]
 
 
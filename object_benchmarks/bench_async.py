@@ -0,0 +1,121 @@
+"""
+相同并发数下对比线程池+同步client与协程client处理小文件请求的吞吐和延迟
+
+    python -m object_benchmarks.bench_async --concurrency 1000 --ops 20000 --output async.json
+"""
+import argparse
+import asyncio
+import dataclasses
+import sys
+import time
+from typing import Any, Awaitable, Callable, List
+
+from botocore.exceptions import ClientError
+
+from object_benchmarks.bench_base import BenchmarkContext, BenchmarkResult, LatencyStats, run_concurrent, \
+    write_report, KiB
+from object_tests.object_test_base import create_object_service, get_object_fixture
+from util.async_client import AsyncObjectClient
+from util.payload import SeededPayload
+
+
+async def run_async(operation: str, fn: Callable[[int], Awaitable[Any]], ops: int, concurrency: int,
+                    object_size: int = 0) -> BenchmarkResult:
+    """
+    与 run_concurrent 相同，但用 concurrency 个协程代替线程
+    """
+    latencies: List[float] = []
+    errors = 0
+    next_op = 0
+
+    async def worker():
+        nonlocal errors, next_op
+        while next_op < ops:
+            i = next_op
+            next_op += 1
+            start = time.perf_counter()
+            try:
+                await fn(i)
+            except ClientError:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    return BenchmarkResult(
+        operation=operation,
+        object_size=object_size,
+        concurrency=concurrency,
+        ops=len(latencies),
+        errors=errors,
+        seconds=time.perf_counter() - start,
+        latency_ms=LatencyStats.from_seconds(latencies),
+    )
+
+
+def bench_threaded(ctx: BenchmarkContext, prefix: str, body: bytes, objects: int, ops: int,
+                   concurrency: int) -> List[BenchmarkResult]:
+    test_config = dataclasses.replace(
+        ctx.test_config,
+        client=dataclasses.replace(ctx.test_config.client, max_pool_connections=concurrency),
+    )
+    object_service = create_object_service(ctx.sufy_session, test_config)
+
+    def put(i: int):
+        object_service.put_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}', Body=body)
+
+    def get(i: int):
+        object_service.get_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}')['Body'].read()
+
+    def head(i: int):
+        object_service.head_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}')
+
+    return [
+        run_concurrent(f'threaded {name}', fn, ops, concurrency, len(body))
+        for name, fn in (('put_object', put), ('get_object', get), ('head_object', head))
+    ]
+
+
+async def bench_asyncio(ctx: BenchmarkContext, prefix: str, body: bytes, objects: int, ops: int,
+                        concurrency: int) -> List[BenchmarkResult]:
+    async_object_service: AsyncObjectClient = get_object_fixture().create_async_object_service(concurrency)
+
+    async def put(i: int):
+        await async_object_service.put_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}', Body=body)
+
+    async def get(i: int):
+        (await async_object_service.get_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}'))['Body'].read()
+
+    async def head(i: int):
+        await async_object_service.head_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i % objects}')
+
+    async with async_object_service:
+        return [
+            await run_async(f'asyncio {name}', fn, ops, concurrency, len(body))
+            for name, fn in (('put_object', put), ('get_object', get), ('head_object', head))
+        ]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--concurrency', type=int, default=1000)
+    parser.add_argument('--ops', type=int, default=10000)
+    parser.add_argument('--objects', type=int, default=1000)
+    parser.add_argument('--size', type=int, default=1 * KiB)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    results: List[BenchmarkResult] = []
+    with BenchmarkContext() as ctx:
+        body = SeededPayload(args.size, seed='async').read()
+        results += asyncio.run(bench_asyncio(ctx, ctx.key('async/'), body, args.objects, args.ops, args.concurrency))
+        results += bench_threaded(ctx, ctx.key('threaded/'), body, args.objects, args.ops, args.concurrency)
+        for result in results:
+            print(result, file=sys.stderr)
+        write_report(args.output, ctx.metadata(), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
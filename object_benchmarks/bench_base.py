@@ -0,0 +1,186 @@
+import json
+import math
+import platform
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field, asdict
+from typing import Any, Callable, Dict, List, Optional
+
+from botocore.exceptions import ClientError
+
+from config import TestConfig
+from object_tests.object_test_base import get_object_fixture, get_endpoint_url
+from util.cleanup import BucketCleaner
+
+KiB = 1024
+MiB = 1024 * KiB
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """
+    最近秩法计算百分位数，sorted_values 需要已经排序
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass()
+class LatencyStats:
+    p50: float
+    p95: float
+    p99: float
+    mean: float
+    max: float
+
+    @staticmethod
+    def from_seconds(latencies: List[float]) -> 'LatencyStats':
+        values = sorted(t * 1000 for t in latencies)
+        return LatencyStats(
+            p50=percentile(values, 50),
+            p95=percentile(values, 95),
+            p99=percentile(values, 99),
+            mean=sum(values) / len(values) if values else 0.0,
+            max=values[-1] if values else 0.0,
+        )
+
+
+@dataclass()
+class BenchmarkResult:
+    operation: str
+    object_size: int
+    concurrency: int
+    ops: int
+    errors: int
+    seconds: float
+    latency_ms: LatencyStats
+    extra: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def ops_per_second(self) -> float:
+        return self.ops / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        return self.ops_per_second * self.object_size
+
+    def to_dict(self) -> Dict[str, Any]:
+        d = asdict(self)
+        d['ops_per_second'] = self.ops_per_second
+        d['bytes_per_second'] = self.bytes_per_second
+        return d
+
+    def __str__(self) -> str:
+        return f'{self.operation:<24} size={self.object_size:<10} c={self.concurrency:<4} ' \
+               f'{self.ops_per_second:10.1f} ops/s  p50={self.latency_ms.p50:8.2f}ms  ' \
+               f'p95={self.latency_ms.p95:8.2f}ms  p99={self.latency_ms.p99:8.2f}ms  errors={self.errors}'
+
+
+def run_concurrent(operation: str, fn: Callable[[int], Any], ops: int, concurrency: int,
+                   object_size: int = 0) -> BenchmarkResult:
+    """
+    使用 concurrency 个线程共执行 ops 次 fn(i)，记录每次调用的延迟
+    """
+    latencies: List[float] = []
+    errors = 0
+    lock = threading.Lock()
+
+    def call(i: int):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn(i)
+        except ClientError:
+            with lock:
+                errors += 1
+            return
+        elapsed = time.perf_counter() - start
+        with lock:
+            latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='bench') as executor:
+        list(executor.map(call, range(ops)))
+    return BenchmarkResult(
+        operation=operation,
+        object_size=object_size,
+        concurrency=concurrency,
+        ops=len(latencies),
+        errors=errors,
+        seconds=time.perf_counter() - start,
+        latency_ms=LatencyStats.from_seconds(latencies),
+    )
+
+
+class BenchmarkContext:
+    """
+    复用测试用例的配置与client，所有benchmark文件写在同一个随机前缀下，结束时删除
+    """
+
+    def __init__(self):
+        fixture = get_object_fixture()
+        self.test_config: TestConfig = fixture.test_config
+        self.sufy_session = fixture.sufy_session
+        self.object_service = fixture.object_service
+        self.bucket_name = self.test_config.object.bucket
+        self.key_prefix = f'bench-{uuid.uuid4().hex[:8]}/'
+        self.ensure_bucket()
+
+    def ensure_bucket(self):
+        try:
+            self.object_service.head_bucket(Bucket=self.bucket_name)
+        except ClientError as e:
+            if e.response['Error']['Code'] != '404':
+                raise
+            self.object_service.create_bucket(
+                Bucket=self.bucket_name,
+                CreateBucketConfiguration={'LocationConstraint': self.test_config.object.region},
+            )
+
+    def key(self, name: str) -> str:
+        return self.key_prefix + name
+
+    def cleanup(self, prefix: Optional[str] = None):
+        BucketCleaner(self.object_service, self.bucket_name, prefix=prefix or self.key_prefix).run()
+
+    def metadata(self) -> Dict[str, Any]:
+        return {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'endpoint': get_endpoint_url(self.test_config),
+            'bucket': self.bucket_name,
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+        }
+
+    def __enter__(self) -> 'BenchmarkContext':
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.cleanup()
+
+
+def write_report(path: Optional[str], metadata: Dict[str, Any], results: List[BenchmarkResult]):
+    report = json.dumps({
+        'metadata': metadata,
+        'results': [r.to_dict() for r in results],
+    }, indent=2)
+    if path is None:
+        print(report)
+        return
+    with open(path, 'w') as f:
+        f.write(report)
+
+
+__all__ = [
+    'BenchmarkContext',
+    'BenchmarkResult',
+    'LatencyStats',
+    'run_concurrent',
+    'write_report',
+    'percentile',
+    'KiB',
+    'MiB',
+]
@@ -0,0 +1,82 @@
+"""
+对比 MultipartUploader 关闭与开启 checksums 时 upload_part 的吞吐和每GiB CPU时间，
+分片与 upload_file 一样是文件映射上的 MemoryViewReader 窗口，上传结束后中止分片上传
+
+    python -m object_benchmarks.bench_checksum --size 1073741824 --part-size 67108864 --output checksum.json
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from typing import List
+
+from object_benchmarks.bench_base import BenchmarkContext, BenchmarkResult, LatencyStats, write_report, MiB
+from util.checksum import crc32c_available
+from util.payload import SeededPayload
+from util.transfer import MultipartUploader, mapped_parts
+
+GiB = 1024 * MiB
+
+
+def measure(ctx: BenchmarkContext, path: str, part_size: int, workers: int, checksums: bool,
+            repeat: int) -> BenchmarkResult:
+    key = ctx.key(f'checksum-{checksums}')
+    latencies: List[float] = []
+    cpu_seconds: List[float] = []
+    wall_seconds: List[float] = []
+    size = parts = 0
+    uploader = MultipartUploader(ctx.object_service, ctx.bucket_name, key, workers=workers, checksums=checksums)
+    for _ in range(repeat):
+        upload_id = ctx.object_service.create_multipart_upload(Bucket=ctx.bucket_name, Key=key)['UploadId']
+        try:
+            with mapped_parts(path, part_size) as readers:
+                cpu_start = time.process_time()
+                result = uploader.upload_parts(upload_id, readers)
+                cpu_seconds.append(time.process_time() - cpu_start)
+        finally:
+            uploader.abort(upload_id)
+        wall_seconds.append(result.seconds)
+        latencies.extend(t.seconds for t in result.timings)
+        size, parts = result.size, len(result.parts)
+    best = min(range(repeat), key=lambda i: cpu_seconds[i])
+    return BenchmarkResult(
+        operation=f'upload_part checksums={"on" if checksums else "off"}',
+        object_size=part_size,
+        concurrency=workers,
+        ops=parts,
+        errors=0,
+        seconds=wall_seconds[best],
+        latency_ms=LatencyStats.from_seconds(latencies),
+        extra={
+            'bytes': size,
+            'cpu_seconds_per_gib': cpu_seconds[best] / (size / GiB),
+        },
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', type=int, default=1 * GiB)
+    parser.add_argument('--part-size', type=int, default=64 * MiB)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp, BenchmarkContext() as ctx:
+        path = os.path.join(tmp, 'payload')
+        with open(path, 'wb') as f:
+            for view in SeededPayload(args.size, seed='checksum').iter_views():
+                f.write(view)
+        results: List[BenchmarkResult] = []
+        for checksums in (False, True):
+            result = measure(ctx, path, args.part_size, args.workers, checksums, args.repeat)
+            print(f'{result}  cpu={result.extra["cpu_seconds_per_gib"]:.3f}s/GiB', file=sys.stderr)
+            results.append(result)
+        write_report(args.output, {**ctx.metadata(), 'crc32c': crc32c_available()}, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
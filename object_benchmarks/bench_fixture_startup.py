@@ -0,0 +1,51 @@
+"""
+对比每个测试用例重新创建测试环境与进程内共享测试环境的耗时
+
+    python -m object_benchmarks.bench_fixture_startup --tests 50
+"""
+import argparse
+import time
+
+import sufycore.session
+
+from object_tests.object_test_base import read_test_config, create_object_service, get_object_fixture
+
+
+def per_test_setup(with_bucket: bool):
+    test_config = read_test_config()
+    sufy_session = sufycore.session.Session()
+    object_service = create_object_service(sufy_session, test_config)
+    if with_bucket:
+        object_service.head_bucket(Bucket=test_config.object.bucket)
+
+
+def shared_setup(with_bucket: bool, first: bool):
+    fixture = get_object_fixture()
+    if with_bucket and first:
+        fixture.object_service.head_bucket(Bucket=fixture.test_config.object.bucket)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--tests', type=int, default=50, help='number of simulated test methods')
+    parser.add_argument('--with-bucket', action='store_true', help='include the head_bucket round trip')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    for _ in range(args.tests):
+        per_test_setup(args.with_bucket)
+    per_test = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.tests):
+        shared_setup(args.with_bucket, i == 0)
+    shared = time.perf_counter() - start
+
+    print(f'tests: {args.tests}')
+    print(f'per-test setup: {per_test:.3f}s total, {per_test / args.tests * 1000:.1f}ms/test')
+    print(f'shared setup:   {shared:.3f}s total, {shared / args.tests * 1000:.1f}ms/test')
+    print(f'saving:         {per_test - shared:.3f}s ({per_test / max(shared, 1e-9):.1f}x)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+在新进程中用 -X importtime 导入测试框架，统计冷启动的导入耗时并列出累计耗时最多的模块
+
+    python -m object_benchmarks.bench_import_time --module object_tests.object_test_base --top 20
+"""
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, asdict
+from typing import Dict, List
+
+# 输出格式：import time: <self us> | <cumulative us> | <缩进表示嵌套层级><模块名>
+_IMPORT_TIME = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+# 只在需要时才应该导入的模块
+_WATCHED = ('vcr', 'yaml', 'sufycore', 'botocore')
+
+_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@dataclass()
+class ModuleImport:
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def import_times(module: str) -> List[ModuleImport]:
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=_ROOT,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    imports = []
+    for line in proc.stderr.splitlines():
+        match = _IMPORT_TIME.match(line)
+        if match:
+            imports.append(ModuleImport(
+                module=match.group(4),
+                self_us=int(match.group(1)),
+                cumulative_us=int(match.group(2)),
+                depth=len(match.group(3)) // 2,
+            ))
+    return imports
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--module', default='object_tests.object_test_base')
+    parser.add_argument('--top', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=5, help='report the fastest of several cold starts')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    best: Dict[str, ModuleImport] = {}
+    wall: List[float] = []
+    for _ in range(args.repeat):
+        start = time.perf_counter()
+        imports = import_times(args.module)
+        wall.append(time.perf_counter() - start)
+        for item in imports:
+            if item.module not in best or item.cumulative_us < best[item.module].cumulative_us:
+                best[item.module] = item
+
+    total = best[args.module].cumulative_us if args.module in best else 0
+    slowest = sorted(best.values(), key=lambda i: i.cumulative_us, reverse=True)[:args.top]
+    watched = {name: name in best for name in _WATCHED}
+
+    print(f'import {args.module}: {total / 1000:.1f}ms cumulative, '
+          f'process {min(wall) * 1000:.1f}ms', file=sys.stderr)
+    for item in slowest:
+        print(f'{item.cumulative_us / 1000:10.1f}ms {item.self_us / 1000:8.1f}ms  '
+              f'{"  " * item.depth}{item.module}', file=sys.stderr)
+    print('imported at startup: ' + ', '.join(f'{k}={v}' for k, v in watched.items()), file=sys.stderr)
+
+    report = json.dumps({
+        'module': args.module,
+        'python': sys.version.split()[0],
+        'cumulative_ms': total / 1000,
+        'process_ms': min(wall) * 1000,
+        'imported': watched,
+        'slowest': [asdict(item) for item in slowest],
+    }, indent=2)
+    if args.output is None:
+        print(report)
+    else:
+        with open(args.output, 'w') as f:
+            f.write(report)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+固定并发数下对比不同连接池大小的吞吐，连接池小于并发数时请求排队等待连接或者每次新建连接
+
+    python -m object_benchmarks.bench_pool_size --concurrency 64 --pool-sizes 1 10 32 64 --output pool.json
+"""
+import argparse
+import dataclasses
+import sys
+from typing import List
+
+from object_benchmarks.bench_base import BenchmarkContext, BenchmarkResult, run_concurrent, write_report, KiB
+from object_tests.object_test_base import create_object_service
+from util.payload import SeededPayload
+from util.seed import ObjectSeeder
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--pool-sizes', type=int, nargs='+', default=[1, 4, 10, 32, 64])
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--size', type=int, default=4 * KiB)
+    parser.add_argument('--objects', type=int, default=100)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    results: List[BenchmarkResult] = []
+    with BenchmarkContext() as ctx:
+        body = SeededPayload(args.size, seed='pool-size').read()
+        ObjectSeeder(ctx.object_service, ctx.bucket_name).run((ctx.key(f'pool/{i}'), body) for i in range(args.objects))
+
+        for pool_size in args.pool_sizes:
+            test_config = dataclasses.replace(
+                ctx.test_config,
+                client=dataclasses.replace(ctx.test_config.client, max_pool_connections=pool_size),
+            )
+            object_service = create_object_service(ctx.sufy_session, test_config)
+
+            def get(i: int):
+                resp = object_service.get_object(Bucket=ctx.bucket_name, Key=ctx.key(f'pool/{i % args.objects}'))
+                resp['Body'].read()
+
+            # 预热，建立连接
+            run_concurrent('warmup', get, args.concurrency, args.concurrency)
+            result = run_concurrent('get_object', get, args.ops, args.concurrency, args.size)
+            result.extra = {'max_pool_connections': pool_size}
+            results.append(result)
+            print(f'pool={pool_size:<4} {result}', file=sys.stderr)
+
+        write_report(args.output, ctx.metadata(), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,73 @@
+"""
+对比逐个调用 generate_presigned_url 与 BatchPresigner 批量生成预签名URL的速度，只在本地计算，不访问服务端
+
+    python -m object_benchmarks.bench_presign --keys 20000 --output presign.json
+"""
+import argparse
+import platform
+import sys
+import time
+from typing import Callable, List
+
+from object_benchmarks.bench_base import BenchmarkResult, LatencyStats, write_report
+from object_tests.object_test_base import get_object_fixture
+from util.presign import BatchPresigner
+
+
+def measure(operation: str, fn: Callable[[], List[str]], keys: int, repeat: int) -> BenchmarkResult:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        urls = fn()
+        latencies.append(time.perf_counter() - start)
+        if len(urls) != keys:
+            raise AssertionError(f'{operation} returned {len(urls)} urls, expected {keys}')
+    # ops 为每轮生成的URL数，ops_per_second 即每秒生成的URL数
+    return BenchmarkResult(
+        operation=operation,
+        object_size=0,
+        concurrency=1,
+        ops=keys,
+        errors=0,
+        seconds=min(latencies),
+        latency_ms=LatencyStats.from_seconds(latencies),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--keys', type=int, default=20000)
+    parser.add_argument('--method', default='get_object', choices=['get_object', 'put_object'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    fixture = get_object_fixture()
+    object_service = fixture.object_service
+    bucket = fixture.test_config.object.bucket
+    keys = [f'presign/{i:08d}' for i in range(args.keys)]
+
+    def single() -> List[str]:
+        return [
+            object_service.generate_presigned_url(args.method, Params={'Bucket': bucket, 'Key': key})
+            for key in keys
+        ]
+
+    presigner = BatchPresigner(object_service, bucket, args.method)
+    results = [
+        measure('generate_presigned_url', single, len(keys), args.repeat),
+        measure('BatchPresigner', lambda: presigner.presign(keys), len(keys), args.repeat),
+    ]
+    for result in results:
+        print(f'{result.operation:<24} {result.ops_per_second:10.0f} urls/s', file=sys.stderr)
+    write_report(args.output, {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        'bucket': bucket,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+    }, results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,60 @@
+"""
+对比单连接 get_object 与多路区间并发下载的吞吐，测试文件与 test_complete_multipart_upload 一样由5MiB的分片合成
+
+    python -m object_benchmarks.bench_ranged_get --parts 40 --workers 1 4 8 16
+"""
+import argparse
+import time
+
+from object_benchmarks.bench_base import BenchmarkContext, MiB
+from util.download import RangedDownloader
+from util.payload import SeededPayload
+from util.transfer import MultipartUploader
+
+
+def timed(fn) -> float:
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def single_stream(object_service, bucket: str, key: str):
+    body = object_service.get_object(Bucket=bucket, Key=key)['Body']
+    while body.read(MiB):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--parts', type=int, default=20)
+    parser.add_argument('--part-size', type=int, default=5 * MiB)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with BenchmarkContext() as ctx:
+        object_service = ctx.object_service
+        bucket = ctx.bucket_name
+        key = ctx.key('ranged-get')
+        payload = SeededPayload(args.parts * args.part_size, seed=key)
+        MultipartUploader(object_service, bucket, key).upload(payload.parts(args.part_size))
+        size_mib = payload.size / MiB
+
+        print(f'object: {size_mib:.0f} MiB in {args.parts} parts')
+        best = min(timed(lambda: single_stream(object_service, bucket, key)) for _ in range(args.repeat))
+        print(f'{"single stream":<24} {size_mib / best:8.1f} MiB/s')
+        for workers in args.workers:
+            for by_part_number in (True, False):
+                downloader = RangedDownloader(
+                    object_service, bucket, key,
+                    workers=workers,
+                    range_size=args.part_size,
+                    use_part_numbers=by_part_number,
+                )
+                best = min(timed(downloader.download) for _ in range(args.repeat))
+                mode = 'part numbers' if by_part_number else 'byte ranges'
+                print(f'{f"{workers}-way {mode}":<24} {size_mib / best:8.1f} MiB/s')
+
+
+if __name__ == '__main__':
+    main()
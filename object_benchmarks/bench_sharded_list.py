@@ -0,0 +1,81 @@
+"""
+在 dir{i}/… 与 dir{i}/subdir{j}/… 形状的keyspace上对比顺序分页列举与按目录拆分的并发列举
+
+    python -m object_benchmarks.bench_sharded_list --dirs 4 --subdirs 8 --keys 2000 --workers 2 4 8 16
+"""
+import argparse
+import sys
+import time
+from typing import List
+
+from object_benchmarks.bench_base import BenchmarkContext, BenchmarkResult, LatencyStats, write_report
+from util.listing import ShardedLister
+from util.seed import ObjectSeeder
+
+
+def sequential_keys(ctx: BenchmarkContext, prefix: str) -> List[str]:
+    keys: List[str] = []
+    kwargs = {'Bucket': ctx.bucket_name, 'Prefix': prefix}
+    while True:
+        resp = ctx.object_service.list_objects_v2(**kwargs)
+        keys.extend(item['Key'] for item in resp.get('Contents', []))
+        if not resp['IsTruncated']:
+            return keys
+        kwargs['ContinuationToken'] = resp['NextContinuationToken']
+
+
+def measure(operation: str, fn, expected: List[str], repeat: int, workers: int) -> BenchmarkResult:
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        keys = fn()
+        latencies.append(time.perf_counter() - start)
+        if keys != expected:
+            raise AssertionError(f'{operation} returned {len(keys)} keys, expected {len(expected)}')
+    # ops 为列举出的key数，ops_per_second 即每秒列举的key数
+    best = min(latencies)
+    return BenchmarkResult(
+        operation=operation,
+        object_size=0,
+        concurrency=workers,
+        ops=len(expected),
+        errors=0,
+        seconds=best,
+        latency_ms=LatencyStats.from_seconds(latencies),
+    )
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--dirs', type=int, default=4)
+    parser.add_argument('--subdirs', type=int, default=8)
+    parser.add_argument('--keys', type=int, default=2000, help='keys directly under each directory')
+    parser.add_argument('--workers', type=int, nargs='+', default=[2, 4, 8, 16])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    results: List[BenchmarkResult] = []
+    with BenchmarkContext() as ctx:
+        prefix = ctx.key('keyspace/')
+        dirs = [f'{prefix}dir{d}/' for d in range(args.dirs)]
+        dirs += [f'{d}subdir{s}/' for d in list(dirs) for s in range(args.subdirs)]
+        keys = sorted(f'{d}{i:08d}' for d in dirs for i in range(args.keys))
+        ObjectSeeder(ctx.object_service, ctx.bucket_name, workers=32).run((key, b'') for key in keys)
+        print(f'keyspace: {len(keys)} keys in {len(dirs)} directories', file=sys.stderr)
+
+        results.append(measure('sequential', lambda: sequential_keys(ctx, prefix), keys, args.repeat, 1))
+        for workers in args.workers:
+            lister = ShardedLister(ctx.object_service, ctx.bucket_name, prefix=prefix, workers=workers)
+            direct, shards = lister.shards()
+            result = measure('sharded', lambda: list(lister.iter_keys()), keys, args.repeat, workers)
+            result.extra = {'shards': len(shards), 'discovered_keys': direct}
+            results.append(result)
+        for result in results:
+            print(result, file=sys.stderr)
+        write_report(args.output, ctx.metadata(), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
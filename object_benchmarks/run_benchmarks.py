@@ -0,0 +1,135 @@
+"""
+对象存储client的吞吐与延迟基准测试，按 文件大小 x 并发数 的矩阵执行，结果以JSON格式输出
+
+    python -m object_benchmarks.run_benchmarks --output bench.json
+    python -m object_benchmarks.run_benchmarks --sizes 1024 1048576 --concurrency 1 16 --ops 500
+"""
+import argparse
+import sys
+from typing import List
+
+from object_benchmarks.bench_base import BenchmarkContext, BenchmarkResult, run_concurrent, write_report, KiB, MiB
+from util.payload import SeededPayload
+from util.seed import ObjectSeeder
+from util.transfer import MultipartUploader
+
+
+def bench_small_objects(ctx: BenchmarkContext, size: int, concurrency: int, ops: int) -> List[BenchmarkResult]:
+    payload = SeededPayload(size, seed=size).read()
+    prefix = ctx.key(f'small-{size}-{concurrency}/')
+
+    def put(i: int):
+        ctx.object_service.put_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i}', Body=payload)
+
+    def get(i: int):
+        body = ctx.object_service.get_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i}')['Body']
+        while body.read(MiB):
+            pass
+
+    def head(i: int):
+        ctx.object_service.head_object(Bucket=ctx.bucket_name, Key=f'{prefix}{i}')
+
+    results = [
+        run_concurrent('put_object', put, ops, concurrency, size),
+        run_concurrent('get_object', get, ops, concurrency, size),
+        run_concurrent('head_object', head, ops, concurrency, size),
+    ]
+    ctx.cleanup(prefix)
+    return results
+
+
+def bench_list_objects(ctx: BenchmarkContext, keys: int, page_size: int, concurrency: int) -> BenchmarkResult:
+    """
+    每个线程从头到尾分页列举同一批文件，统计每一页的延迟
+    """
+    prefix = ctx.key('list/')
+    ObjectSeeder(ctx.object_service, ctx.bucket_name, workers=32).run((f'{prefix}{i:08d}', b'') for i in range(keys))
+    pages = -(-keys // page_size)
+
+    def list_page(i: int):
+        # 第i页从第 (i % pages) * page_size 个文件之后开始
+        start_after = f'{prefix}{(i % pages) * page_size - 1:08d}' if i % pages else ''
+        ctx.object_service.list_objects_v2(
+            Bucket=ctx.bucket_name,
+            Prefix=prefix,
+            StartAfter=start_after,
+            MaxKeys=page_size,
+        )
+
+    result = run_concurrent('list_objects_v2', list_page, pages * concurrency, concurrency)
+    result.extra = {'keys': keys, 'page_size': page_size}
+    ctx.cleanup(prefix)
+    return result
+
+
+def bench_delete_objects(ctx: BenchmarkContext, batches: int, batch_size: int, concurrency: int) -> BenchmarkResult:
+    prefix = ctx.key('delete/')
+    ObjectSeeder(ctx.object_service, ctx.bucket_name, workers=32).run(
+        (f'{prefix}{i:08d}', b'') for i in range(batches * batch_size)
+    )
+
+    def delete_batch(i: int):
+        ctx.object_service.delete_objects(
+            Bucket=ctx.bucket_name,
+            Delete={
+                'Objects': [{'Key': f'{prefix}{k:08d}'} for k in range(i * batch_size, (i + 1) * batch_size)],
+                'Quiet': True,
+            },
+        )
+
+    result = run_concurrent('delete_objects', delete_batch, batches, concurrency)
+    result.extra = {'batch_size': batch_size, 'keys_per_second': result.ops_per_second * batch_size}
+    return result
+
+
+def bench_multipart_upload(ctx: BenchmarkContext, size: int, part_size: int, concurrency: int,
+                           ops: int) -> BenchmarkResult:
+    payload = SeededPayload(size, seed=size)
+
+    def upload(i: int):
+        MultipartUploader(
+            ctx.object_service, ctx.bucket_name, ctx.key(f'multipart-{size}-{concurrency}-{i}'),
+            workers=concurrency,
+        ).upload(payload.parts(part_size))
+
+    result = run_concurrent('multipart_upload', upload, ops, 1, size)
+    result.concurrency = concurrency
+    result.extra = {'part_size': part_size}
+    return result
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1 * KiB, 64 * KiB, 1 * MiB])
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32])
+    parser.add_argument('--ops', type=int, default=200, help='operations per small-object measurement')
+    parser.add_argument('--list-keys', type=int, default=5000)
+    parser.add_argument('--delete-batches', type=int, default=10)
+    parser.add_argument('--multipart-sizes', type=int, nargs='+', default=[32 * MiB, 128 * MiB])
+    parser.add_argument('--part-size', type=int, default=8 * MiB)
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    results: List[BenchmarkResult] = []
+
+    def record(result: BenchmarkResult):
+        results.append(result)
+        print(result, file=sys.stderr)
+
+    with BenchmarkContext() as ctx:
+        for size in args.sizes:
+            for concurrency in args.concurrency:
+                for result in bench_small_objects(ctx, size, concurrency, args.ops):
+                    record(result)
+        for concurrency in args.concurrency:
+            record(bench_list_objects(ctx, args.list_keys, 1000, concurrency))
+            record(bench_delete_objects(ctx, args.delete_batches, 1000, concurrency))
+        for size in args.multipart_sizes:
+            for concurrency in args.concurrency:
+                record(bench_multipart_upload(ctx, size, args.part_size, concurrency, 3))
+        write_report(args.output, ctx.metadata(), results)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
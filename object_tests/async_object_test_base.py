@@ -0,0 +1,26 @@
+import unittest
+
+from object_tests.object_test_base import BaseObjectTest, get_object_fixture
+from util.async_client import AsyncObjectClient
+
+
+class AsyncBaseObjectTest(BaseObjectTest, unittest.IsolatedAsyncioTestCase):
+    """
+    使用协程版client的测试基类，bucket的准备和清理与 BaseObjectTest 相同，
+    每个用例运行在独立的事件循环中，async_object_service 在用例开始时创建
+    """
+    async_object_service: AsyncObjectClient
+
+    async def asyncSetUp(self) -> None:
+        if self.test_config.vcr.replay:
+            # 协程版client直接使用socket，vcr无法录制和回放
+            self.skipTest('asyncio client requests cannot be replayed from cassettes')
+        self.async_object_service = get_object_fixture().create_async_object_service()
+
+    async def asyncTearDown(self) -> None:
+        await self.async_object_service.close()
+
+
+__all__ = [
+    'AsyncBaseObjectTest',
+]
@@ -0,0 +1,103 @@
+import asyncio
+
+from botocore.exceptions import ClientError
+
+from object_tests.async_object_test_base import AsyncBaseObjectTest
+from util.payload import PayloadReader
+
+
+class AsyncObjectTest(AsyncBaseObjectTest):
+    async def test_put_get_head_delete_object(self):
+        key = self.object_key('test_put_get_head_delete_object')
+        content = self.payload(4096).read()
+        metadata = {
+            'test-key1': 'test-value1',
+        }
+
+        resp = await self.async_object_service.put_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Body=content,
+            Metadata=metadata,
+        )
+        self.assertIsNotNone(resp['ETag'])
+        etag = resp['ETag']
+
+        resp = await self.async_object_service.head_object(Bucket=self.bucket_name, Key=key)
+        self.assertEqual(len(content), resp['ContentLength'])
+        self.assertEqual(etag, resp['ETag'])
+        self.assertEqual(metadata, resp['Metadata'])
+
+        resp = await self.async_object_service.get_object(Bucket=self.bucket_name, Key=key)
+        self.assertBodyMatches(resp['Body'], content)
+
+        await self.async_object_service.delete_object(Bucket=self.bucket_name, Key=key)
+        with self.assertRaises(ClientError) as cm:
+            await self.async_object_service.head_object(Bucket=self.bucket_name, Key=key)
+        self.assertEqual('404', cm.exception.response['Error']['Code'])
+
+    async def test_concurrent_put_and_list_objects_v2(self):
+        prefix = self.object_key('dir/')
+        count = 50
+
+        await asyncio.gather(*[
+            self.async_object_service.put_object(Bucket=self.bucket_name, Key=f'{prefix}{i:03d}', Body=b'')
+            for i in range(count)
+        ])
+
+        keys = []
+        kwargs = {'Bucket': self.bucket_name, 'Prefix': prefix, 'MaxKeys': 20}
+        while True:
+            resp = await self.async_object_service.list_objects_v2(**kwargs)
+            keys.extend(o['Key'] for o in resp.get('Contents', []))
+            if not resp['IsTruncated']:
+                break
+            kwargs['ContinuationToken'] = resp['NextContinuationToken']
+        self.assertEqual([f'{prefix}{i:03d}' for i in range(count)], keys)
+
+    async def test_multipart_upload(self):
+        key = self.object_key('test_multipart_upload')
+        part_size = 5 * 1024 * 1024
+        payload = self.payload(part_size * 2 + 1024)
+
+        upload_id = (await self.async_object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        ))['UploadId']
+
+        async def upload_part(part_number: int, body: PayloadReader):
+            resp = await self.async_object_service.upload_part(
+                Bucket=self.bucket_name,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=body,
+            )
+            return {'PartNumber': part_number, 'ETag': resp['ETag']}
+
+        parts = await asyncio.gather(*[
+            upload_part(i + 1, body) for i, body in enumerate(payload.parts(part_size))
+        ])
+
+        resp = await self.async_object_service.list_parts(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+        self.assertEqual([1, 2, 3], [p['PartNumber'] for p in resp['Parts']])
+
+        await self.async_object_service.complete_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts},
+        )
+        resp = await self.async_object_service.get_object(Bucket=self.bucket_name, Key=key)
+        self.assertBodyMatches(resp['Body'], payload)
+
+    async def test_abort_multipart_upload(self):
+        key = self.object_key('test_abort_multipart_upload')
+        upload_id = (await self.async_object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        ))['UploadId']
+
+        await self.async_object_service.abort_multipart_upload(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
+        with self.assertRaises(ClientError):
+            await self.async_object_service.list_parts(Bucket=self.bucket_name, Key=key, UploadId=upload_id)
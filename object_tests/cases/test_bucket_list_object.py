@@ -4,7 +4,7 @@ from util.cass import CassetteUtils
 
 class ListObjectTest(BaseObjectTest):
     def test_list_object(self):
-        prefix = 'dir1/'
+        prefix = self.object_key('dir1/')
         subdir = prefix + 'subdir/'
         delimiter = '/'
         n = 10
@@ -13,8 +13,7 @@ class ListObjectTest(BaseObjectTest):
             keys.append(f'{prefix}test-list-objects-v1-{i}')
         for i in range(n):
             keys.append(f'{subdir}test-list-objects-v1-{i}')
-        for key in keys:
-            self.prepare_test_file(key, key)
+        self.seed_objects({key: key for key in keys})
 
         def run():
             resp1 = self.object_service.list_objects(
@@ -88,7 +87,7 @@ class ListObjectTest(BaseObjectTest):
             self.assertEqual('OK', resp.status_message)
 
     def test_list_object_v2(self):
-        prefix = 'dir2/'
+        prefix = self.object_key('dir2/')
         subdir = prefix + 'subdir/'
         delimiter = '/'
         n = 10
@@ -97,8 +96,7 @@ class ListObjectTest(BaseObjectTest):
             keys.append(f'{prefix}test-list-objects-v2-{i}')
         for i in range(n):
             keys.append(f'{subdir}test-list-objects-v2-{i}')
-        for key in keys:
-            self.prepare_test_file(key, key)
+        self.seed_objects({key: key for key in keys})
 
         def run():
             resp1 = self.object_service.list_objects_v2(
@@ -5,6 +5,14 @@ from util.cass import CassetteUtils
 
 
 class BucketManageTest(BaseObjectTest):
+    # 创建、删除bucket的用例使用独立的bucket，不影响其他测试类
+    bucket_suffix = 'manage'
+
+    def setUp(self):
+        super().setUp()
+        # 用例会删除bucket，每个测试用例开始前都需要确保bucket存在
+        self.make_sure_bucket_exists()
+
     def test_create_bucket(self):
         self.force_delete_bucket()
 
@@ -1,9 +1,13 @@
+from typing import TYPE_CHECKING
+
 from botocore.exceptions import ClientError
-from vcr.cassette import Cassette
 
 from object_tests.object_test_base import BaseObjectTest
 from util.cass import CassetteUtils
 
+if TYPE_CHECKING:
+    from vcr.cassette import Cassette
+
 
 class TestObjectAcl(BaseObjectTest):
     def test_put_object_acl(self):
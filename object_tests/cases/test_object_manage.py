@@ -1,11 +1,12 @@
-from object_tests.object_test_base import BaseObjectTest
+from object_tests.object_test_base import BaseObjectTest, create_bucket_cleaner, get_local_server
 from util.cass import CassetteUtils
+from util.cleanup import BucketCleaner
 
 
 class ObjectManageTest(BaseObjectTest):
     def test_copy_object(self):
-        src_key = "testCopyObjectFileKeySrc"
-        dest_key = "testCopyObjectFileKeyDest"
+        src_key = self.object_key("testCopyObjectFileKeySrc")
+        dest_key = self.object_key("testCopyObjectFileKeyDest")
         content = "testCopyObjectFileContent"
         metadata_directive = "REPLACE"
 
@@ -44,7 +45,7 @@ class ObjectManageTest(BaseObjectTest):
         self.object_service.head_object(Bucket=self.bucket_name, Key=src_key)
 
     def test_delete_object(self):
-        key = "testDeleteObjectFileKey"
+        key = self.object_key("testDeleteObjectFileKey")
         content = "testDeleteObjectFileContent"
 
         self.prepare_test_file(key, content)
@@ -79,10 +80,9 @@ class ObjectManageTest(BaseObjectTest):
     def test_delete_objects(self):
         keys = []
         for i in range(0, 10):
-            keys.append(f"testDeleteObjectsFileKey{i}")
+            keys.append(self.object_key(f"testDeleteObjectsFileKey{i}"))
 
-        for key in keys:
-            self.prepare_test_file(key, key + "-content")
+        self.seed_objects({key: key + "-content" for key in keys})
 
         def run():
             self.object_service.delete_objects(
@@ -117,7 +117,7 @@ class ObjectManageTest(BaseObjectTest):
                 )
 
     def test_restore_object(self):
-        key = "testRestoreObjectFileKey"
+        key = self.object_key("testRestoreObjectFileKey")
         content = "testRestoreObjectFileContent"
 
         self.object_service.put_object(
@@ -150,3 +150,47 @@ class ObjectManageTest(BaseObjectTest):
             self.check_public_response_header(resp)
             self.assertEqual(202, resp.status_code)
             self.assertEqual("Accepted", resp.status_message)
+
+    def test_clean_retries_failed_deletes(self):
+        if not self.test_config.local.enable:
+            self.skipTest('failed deletes can only be injected into the local object service')
+        keys = [self.object_key(f'clean/{i}') for i in range(10)]
+        self.seed_objects({key: b'data' for key in keys})
+        store = get_local_server(self.test_config).store
+
+        # 前两次批量删除失败的key在第三次删除成功
+        store.inject_delete_errors(self.bucket_name, keys[:3], times=2)
+        report = BucketCleaner(self.object_service, self.bucket_name, prefix=self.key_prefix,
+                               retry_backoff=0).run()
+        self.assertEqual((len(keys), 0), (report.deleted, report.failed))
+
+        # 超过重试次数的key计入失败
+        self.seed_objects({key: b'data' for key in keys})
+        store.inject_delete_errors(self.bucket_name, keys[:3], times=3)
+        report = BucketCleaner(self.object_service, self.bucket_name, prefix=self.key_prefix,
+                               max_retries=1, retry_backoff=0).run()
+        self.assertEqual((len(keys) - 3, 3), (report.deleted, report.failed))
+
+    def test_clean_sharded_listing(self):
+        keys = [self.object_key(f'sharded/top-{i}') for i in range(3)]
+        keys += [self.object_key(f'sharded/dir{d}/sub{s}/{i}') for d in range(4) for s in range(3) for i in range(4)]
+        self.seed_objects({key: b'data' for key in keys})
+
+        delimiters = []
+
+        def record_delimiter(params, **kwargs):
+            delimiters.append(params.get('Delimiter'))
+
+        events = self.object_service.meta.events
+        events.register('provide-client-params.*.ListObjectsV2', record_delimiter, unique_id='test-sharded-listing')
+        self.addCleanup(events.unregister, 'provide-client-params.*.ListObjectsV2', unique_id='test-sharded-listing')
+
+        cleaner = create_bucket_cleaner(self.object_service, self.bucket_name, self.test_config,
+                                        prefix=self.key_prefix, list_workers=4, batch_size=7)
+        report = cleaner.run()
+        self.assertEqual((len(keys), 0), (report.deleted, report.failed))
+        # 先按目录发现分片，再逐个分片列举
+        self.assertIn('/', delimiters)
+        self.assertIn(None, delimiters)
+        resp = self.object_service.list_objects_v2(Bucket=self.bucket_name, Prefix=self.key_prefix)
+        self.assertEqual(0, resp['KeyCount'])
@@ -1,12 +1,24 @@
+import io
+import os
+import tempfile
+from collections import Counter
+from datetime import timedelta
 from typing import Dict
 
+from botocore.exceptions import ClientError
+
 from object_tests.object_test_base import BaseObjectTest
-from util.cass import CassetteUtils
+from util.cass import DIGEST_PREFIX_SIZE, CassetteUtils
+from util.cleanup import MultipartUploadSweeper
+from util.download import RangedDownloader
+from util.paginate import iter_multipart_uploads
+from util.resumable import ResumableUploader, UploadCheckpoint
+from util.transfer import MultipartCopier, MultipartUploader
 
 
 class MultipartUploadTest(BaseObjectTest):
     def test_create_multipart_upload(self):
-        key = 'test_create_multipart_upload'
+        key = self.object_key('test_create_multipart_upload')
         content_type = 'text/plain'
 
         def run():
@@ -38,7 +50,7 @@ class MultipartUploadTest(BaseObjectTest):
             self.assertEqual('OK', resp.status_message)
 
     def test_upload_part(self):
-        key = 'test_upload_part'
+        key = self.object_key('test_upload_part')
         content_type = 'application/octet-stream'
         upload_id = self.object_service.create_multipart_upload(
             Bucket=self.bucket_name,
@@ -52,7 +64,7 @@ class MultipartUploadTest(BaseObjectTest):
                 Bucket=self.bucket_name,
                 UploadId=upload_id,
                 PartNumber=1,
-                Body=self.random_bytes(1024),
+                Body=self.payload(1024).reader(),
             )
             self.assertIsNotNone(put_object_response)
             self.assertIsNotNone(put_object_response['ETag'])
@@ -73,8 +85,40 @@ class MultipartUploadTest(BaseObjectTest):
             self.assertEqual('OK', resp.status_message)
             self.assertIsNotNone(resp.get_header_value('ETag'))
 
+    def test_upload_part_body_digest(self):
+        key = self.object_key('test_upload_part_body_digest')
+        upload_id = self.object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        )['UploadId']
+        payload = self.payload(1024 * 1024)
+        # 不依赖配置，指定阈值录制摘要
+        vcr = self.create_vcr(self.vcr.cassette_library_dir, record_mode=self.vcr.record_mode,
+                              body_digest_threshold=64 * 1024)
+
+        with vcr.use_cassette('test_upload_part_body_digest.yaml') as cass:
+            self.object_service.upload_part(
+                Key=key,
+                Bucket=self.bucket_name,
+                UploadId=upload_id,
+                PartNumber=1,
+                Body=payload.reader(),
+            )
+            cu = CassetteUtils(cass)
+
+            req = cu.request()
+            self.check_public_request_header(req)
+            self.assertEqual('PUT', req.method)
+            self.assertEqual('uploadId=' + upload_id + '&partNumber=1', req.url.query)
+
+            # 超过阈值的body只录制摘要，大小、sha256和开头的内容与完整的body相同；回放模式下录制完整的body
+            self.assertEqual(not self.test_config.vcr.replay, req.body.is_digest)
+            self.assertEqual(len(payload), req.body.size)
+            self.assertEqual(payload.digest('sha256'), req.body.digest)
+            self.assertEqual(payload.read(0, DIGEST_PREFIX_SIZE), req.body.prefix)
+
     def test_complete_multipart_upload(self):
-        key = "testCompleteMultipartUploadFile"
+        key = self.object_key("testCompleteMultipartUploadFile")
         content_type = 'application/octet-stream'
         parts = 2
         part_size = 5 * 1024 * 1024
@@ -84,18 +128,15 @@ class MultipartUploadTest(BaseObjectTest):
             ContentType=content_type,
         )['UploadId']
 
-        part_number_2_etag: Dict[int, str] = {}
-        contents = b''
-        for part_number in range(1, parts + 1):
-            part_content = self.random_bytes(part_size)
-            contents += part_content
-            part_number_2_etag[part_number] = self.object_service.upload_part(
-                Key=key,
-                Bucket=self.bucket_name,
-                UploadId=upload_id,
-                PartNumber=part_number,
-                Body=part_content,
-            )['ETag']
+        # 并发上传所有分片，分片内容按需生成，不在内存中保存；上传时一次遍历计算每个分片的校验和
+        payload = self.payload(parts * part_size)
+        upload_result = MultipartUploader(self.object_service, self.bucket_name, key, checksums=True).upload_parts(
+            upload_id,
+            payload.parts(part_size),
+        )
+        part_number_2_etag: Dict[int, str] = {p['PartNumber']: p['ETag'] for p in upload_result.parts}
+        for part_number, checksums in upload_result.checksums.items():
+            self.assertEqual(part_number_2_etag[part_number], checksums.etag)
 
         e_tag = ''
 
@@ -141,10 +182,31 @@ class MultipartUploadTest(BaseObjectTest):
         self.assertEqual(resp['ContentLength'], parts * part_size)
         self.assertEqual(resp['ContentType'], content_type)
         self.assertEqual(resp['ETag'], e_tag)
-        self.assertEqual(resp['Body'].read(), contents)
+        self.assertEqual(upload_result.predicted_etag, e_tag)
+        self.assertBodyMatches(resp['Body'], payload)
+
+        # 按分片和按字节区间并发下载到内存和文件，字节区间与分片边界不对齐
+        with tempfile.TemporaryDirectory() as tmp:
+            for use_part_numbers, ranges in ((True, parts), (False, 4)):
+                downloader = RangedDownloader(
+                    self.object_service, self.bucket_name, key,
+                    workers=4,
+                    range_size=3 * 1024 * 1024,
+                    use_part_numbers=use_part_numbers,
+                )
+                data, result = downloader.download()
+                self.assertEqual((parts * part_size, e_tag, ranges, use_part_numbers),
+                                 (result.size, result.etag, result.ranges, result.by_part_number))
+                self.assertBodyMatches(io.BytesIO(data), payload)
+
+                path = os.path.join(tmp, f'download-{use_part_numbers}')
+                result = downloader.download_to_file(path)
+                self.assertEqual((ranges, use_part_numbers), (result.ranges, result.by_part_number))
+                with open(path, 'rb') as f:
+                    self.assertBodyMatches(f, payload)
 
     def test_multipart_copy_upload(self):
-        key = "testMultipartCopyUploadFile"
+        key = self.object_key("testMultipartCopyUploadFile")
         content_type = 'application/octet-stream'
         parts = 2
         part_size = 5 * 1024 * 1024
@@ -155,7 +217,7 @@ class MultipartUploadTest(BaseObjectTest):
             ContentType=content_type,
         )['UploadId']
 
-        bs = self.random_bytes(part_size)
+        bs = self.payload(part_size).read()
 
         # 上传一个文件
         self.object_service.put_object(
@@ -201,11 +263,188 @@ class MultipartUploadTest(BaseObjectTest):
 
         self.assertEqual(resp['ContentLength'], parts * part_size)
         self.assertEqual(resp['ContentType'], content_type)
-        self.assertEqual(resp['Body'].read(), bs * parts)
+        self.assertBodyMatches(resp['Body'], bs * parts)
         self.assertEqual(resp['ETag'], complete_resp['ETag'])
 
+    def test_multipart_copier(self):
+        src_key = self.object_key("testMultipartCopierSrcFile")
+        key = self.object_key("testMultipartCopierFile")
+        content_type = 'application/octet-stream'
+        parts = 2
+        part_size = 5 * 1024 * 1024
+        payload = self.payload(parts * part_size)
+
+        # 上传一个文件
+        self.object_service.put_object(
+            Bucket=self.bucket_name,
+            Key=src_key,
+            ContentType=content_type,
+            Body=payload.reader(),
+        )
+
+        # 服务端按分片并发复制
+        result = MultipartCopier(
+            self.object_service,
+            self.bucket_name,
+            key,
+            part_size=part_size,
+            multipart_threshold=part_size,
+        ).copy(self.bucket_name, src_key)
+        self.assertTrue(result.multipart)
+        self.assertEqual([p['PartNumber'] for p in result.parts], list(range(1, parts + 1)))
+        for part in result.parts:
+            self.assertIsNotNone(part['ETag'])
+
+        # 获取文件内容，判断是否与源文件一致
+        resp = self.object_service.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+
+        self.assertEqual(resp['ContentLength'], parts * part_size)
+        self.assertEqual(resp['ContentType'], content_type)
+        self.assertBodyMatches(resp['Body'], payload)
+        self.assertEqual(resp['ETag'], result.etag)
+
+    def test_multipart_upload_file(self):
+        key = self.object_key("testMultipartUploadLocalFile")
+        content_type = 'application/octet-stream'
+        part_size = 5 * 1024 * 1024
+        # 最后一个分片小于分片大小
+        payload = self.payload(2 * part_size + 1024)
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = os.path.join(tmp_dir.name, 'upload.bin')
+        with open(path, 'wb') as f:
+            for view in payload.iter_views():
+                f.write(view)
+
+        # 文件映射到内存后按分片窗口上传
+        result = MultipartUploader(self.object_service, self.bucket_name, key, checksums=True).upload_file(
+            path,
+            part_size=part_size,
+            ContentType=content_type,
+        )
+        self.assertEqual([p['PartNumber'] for p in result.parts], [1, 2, 3])
+        self.assertEqual([t.size for t in result.timings], [part_size, part_size, 1024])
+        self.assertEqual(result.predicted_etag, result.etag)
+
+        resp = self.object_service.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+        self.assertEqual(resp['ContentLength'], len(payload))
+        self.assertEqual(resp['ContentType'], content_type)
+        self.assertEqual(resp['ETag'], result.etag)
+        self.assertBodyMatches(resp['Body'], payload)
+
+    def test_resumable_upload_file(self):
+        key = self.object_key("testResumableUploadFile")
+        part_size = 5 * 1024 * 1024
+        payload = self.payload(3 * part_size + 1024)
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = os.path.join(tmp_dir.name, 'upload.bin')
+        checkpoint_path = os.path.join(tmp_dir.name, 'upload.checkpoint')
+        with open(path, 'wb') as f:
+            for view in payload.iter_views():
+                f.write(view)
+
+        # 模拟上传中断：分片1、2已经上传，但进程在记录分片2之前退出
+        upload_id = self.object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        )['UploadId']
+        interrupted = MultipartUploader(self.object_service, self.bucket_name, key).upload_numbered_parts(
+            upload_id,
+            [(1, payload.reader(0, part_size)), (2, payload.reader(part_size, 2 * part_size))],
+        )
+        stat = os.stat(path)
+        UploadCheckpoint(
+            bucket=self.bucket_name,
+            key=key,
+            upload_id=upload_id,
+            part_size=part_size,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            parts={1: interrupted.parts[0]['ETag']},
+        ).save(checkpoint_path)
+
+        # 继续上传时根据 list_parts 核对检查点，只上传缺少的分片3、4
+        result = ResumableUploader(
+            self.object_service,
+            self.bucket_name,
+            key,
+            checkpoint_path,
+            part_size=part_size,
+        ).upload_file(path)
+        self.assertEqual(result.upload_id, upload_id)
+        self.assertEqual([t.part_number for t in result.timings], [3, 4])
+        self.assertEqual([p['PartNumber'] for p in result.parts], [1, 2, 3, 4])
+        self.assertFalse(os.path.exists(checkpoint_path))
+
+        resp = self.object_service.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+        self.assertEqual(resp['ContentLength'], len(payload))
+        self.assertEqual(resp['ETag'], result.etag)
+        self.assertBodyMatches(resp['Body'], payload)
+
+    def test_resumable_upload_verifies_unrecorded_parts(self):
+        key = self.object_key("testResumableUploadVerifyFile")
+        part_size = 5 * 1024 * 1024
+        payload = self.payload(2 * part_size + 1024)
+
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        path = os.path.join(tmp_dir.name, 'upload.bin')
+        checkpoint_path = os.path.join(tmp_dir.name, 'upload.checkpoint')
+        with open(path, 'wb') as f:
+            for view in payload.iter_views():
+                f.write(view)
+
+        # 服务端的分片2大小与本地一致但内容不同，且不在检查点中
+        upload_id = self.object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        )['UploadId']
+        interrupted = MultipartUploader(self.object_service, self.bucket_name, key).upload_numbered_parts(
+            upload_id,
+            [(1, payload.reader(0, part_size)), (2, self.payload(part_size, 'other').reader())],
+        )
+        stat = os.stat(path)
+        UploadCheckpoint(
+            bucket=self.bucket_name,
+            key=key,
+            upload_id=upload_id,
+            part_size=part_size,
+            size=stat.st_size,
+            mtime_ns=stat.st_mtime_ns,
+            parts={1: interrupted.parts[0]['ETag']},
+        ).save(checkpoint_path)
+
+        # 分片2的ETag与本地内容的MD5不一致，重新上传
+        result = ResumableUploader(
+            self.object_service,
+            self.bucket_name,
+            key,
+            checkpoint_path,
+            part_size=part_size,
+        ).upload_file(path)
+        self.assertEqual([t.part_number for t in result.timings], [2, 3])
+
+        resp = self.object_service.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+        )
+        self.assertEqual(resp['ETag'], result.etag)
+        self.assertBodyMatches(resp['Body'], payload)
+
     def test_abort_multipart_upload(self):
-        key = 'testAbortMultipartUploadFile'
+        key = self.object_key('testAbortMultipartUploadFile')
         content_type = 'application/octet-stream'
         part_size = 5 * 1024 * 1024
 
@@ -215,14 +454,14 @@ class MultipartUploadTest(BaseObjectTest):
             ContentType=content_type,
         )['UploadId']
 
-        bs = self.random_bytes(part_size)
+        payload = self.payload(part_size)
 
         # 上传一个文件
         self.object_service.put_object(
             Bucket=self.bucket_name,
             Key=key,
             ContentType=content_type,
-            Body=bs,
+            Body=payload.reader(),
         )
 
         # 拷贝分片
@@ -248,11 +487,54 @@ class MultipartUploadTest(BaseObjectTest):
             UploadId=upload_id,
         )
 
+    def test_sweep_stale_uploads(self):
+        prefix = self.object_key("testSweepStaleUploads-")
+        part_size = 5 * 1024 * 1024
+        payload = self.payload(part_size + 1024)
+
+        # 两个未完成的分片上传，共上传 part_size + 1024 字节
+        upload_ids = []
+        for i, parts in enumerate([[payload.reader(0, part_size)], [payload.reader(part_size)]]):
+            upload_id = self.object_service.create_multipart_upload(
+                Bucket=self.bucket_name,
+                Key=f'{prefix}{i}',
+            )['UploadId']
+            MultipartUploader(self.object_service, self.bucket_name, f'{prefix}{i}').upload_parts(upload_id, parts)
+            upload_ids.append(upload_id)
+
+        # 以服务端记录的发起时间为当前时间，回放时与录制时的判断相同
+        initiated = max(u['Initiated'] for u in iter_multipart_uploads(
+            self.object_service, Bucket=self.bucket_name, Prefix=prefix,
+        ))
+
+        # 刚发起的上传不算过期
+        report = MultipartUploadSweeper(
+            self.object_service,
+            self.bucket_name,
+            prefix=prefix,
+            now=lambda: initiated,
+        ).run()
+        self.assertEqual(report.aborted, 0)
+
+        report = MultipartUploadSweeper(
+            self.object_service,
+            self.bucket_name,
+            prefix=prefix,
+            older_than=timedelta(0),
+            now=lambda: initiated + timedelta(seconds=1),
+        ).run()
+        self.assertEqual(report.aborted, 2)
+        self.assertEqual(report.failed, 0)
+        self.assertEqual(report.bytes, len(payload))
+        for i, upload_id in enumerate(upload_ids):
+            with self.assertRaises(ClientError):
+                self.object_service.list_parts(Bucket=self.bucket_name, Key=f'{prefix}{i}', UploadId=upload_id)
+
     def test_list_parts(self):
         """
         测试列出文件级别的分片
         """
-        key = "testListPartsFile"
+        key = self.object_key("testListPartsFile")
         content_type = 'application/octet-stream'
         parts = 3
         part_size = 5 * 1024 * 1024
@@ -263,14 +545,14 @@ class MultipartUploadTest(BaseObjectTest):
             ContentType=content_type,
         )['UploadId']
 
-        bs = self.random_bytes(part_size)
+        payload = self.payload(part_size)
 
         # 上传一个文件
         self.object_service.put_object(
             Bucket=self.bucket_name,
             Key=key,
             ContentType=content_type,
-            Body=bs,
+            Body=payload.reader(),
         )
 
         part_number_2_etag: Dict[int, str] = {}
@@ -291,15 +573,12 @@ class MultipartUploadTest(BaseObjectTest):
             part_number_2_etag[i] = etag
 
         # 再上传一个分片
-        resp = self.object_service.upload_part(
-            Key=key,
-            Bucket=self.bucket_name,
-            UploadId=upload_id,
-            PartNumber=parts,
-            Body=bs,
+        upload_result = MultipartUploader(self.object_service, self.bucket_name, key).upload_parts(
+            upload_id,
+            [payload.reader()],
+            first_part_number=parts,
         )
-        self.assertIsNotNone(resp)
-        etag = resp['ETag']
+        etag = upload_result.parts[0]['ETag']
         self.assertIsNotNone(etag)
         part_number_2_etag[parts] = etag
 
@@ -322,24 +601,68 @@ class MultipartUploadTest(BaseObjectTest):
             self.assertIsNotNone(part['LastModified'])
             self.assertEqual(part['PartNumber'] in part_number_2_etag, True)
 
+    def test_multipart_copier_copy_parts(self):
+        """
+        在已有的分片上传中并发拷贝源文件的全部分片
+        """
+        key = self.object_key("testMultipartCopierCopyPartsFile")
+        src_key = self.object_key("testMultipartCopierCopyPartsSrcFile")
+        parts = 2
+        part_size = 5 * 1024 * 1024
+
+        upload_id = self.object_service.create_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+        )['UploadId']
+
+        self.object_service.put_object(
+            Bucket=self.bucket_name,
+            Key=src_key,
+            Body=self.payload(parts * part_size, 'src').reader(),
+        )
+
+        copy_result = MultipartCopier(self.object_service, self.bucket_name, key, part_size=part_size).copy_parts(
+            upload_id,
+            self.bucket_name,
+            src_key,
+        )
+        part_number_2_etag: Dict[int, str] = {p['PartNumber']: p['ETag'] for p in copy_result.parts}
+        self.assertEqual(sorted(part_number_2_etag), list(range(1, parts + 1)))
+
+        resp = self.object_service.list_parts(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+        )
+        self.assertEqual([p['PartNumber'] for p in resp['Parts']], list(range(1, parts + 1)))
+        for part in resp['Parts']:
+            self.assertEqual(part['Size'], part_size)
+            self.assertEqual(part['ETag'], part_number_2_etag[part['PartNumber']])
+
+        self.object_service.abort_multipart_upload(
+            Bucket=self.bucket_name,
+            Key=key,
+            UploadId=upload_id,
+        )
+
     def test_list_multipart_uploads(self):
         """
         创建两个不同key的分片上传任务，第一个任务上传一个分片，第二个任务上传两个分片，然后列举bucket级别正在进行的分片上传的文件
         """
-        key = "testKey"
-        prefix = "testListMultipartUploadsFile-"
+        key = self.object_key("testKey")
+        prefix = self.object_key("testListMultipartUploadsFile-")
         key1 = prefix + "1"
         key2 = prefix + "2"
         content_type = 'application/octet-stream'
         part_size = 5 * 1024 * 1024
-        bs = self.random_bytes(part_size)
+        payload = self.payload(part_size)
 
         # 先上传一个文件
         self.object_service.put_object(
             Bucket=self.bucket_name,
             Key=key,
             ContentType=content_type,
-            Body=bs,
+            Body=payload.reader(),
         )
 
         # 创建第一个分片上传任务
@@ -377,24 +700,15 @@ class MultipartUploadTest(BaseObjectTest):
                 CopySourceRange=f'bytes={0}-{part_size - 1}',
             )
 
-        # 列举bucket级别正在进行的分片
-        resp = self.object_service.list_multipart_uploads(
-            Bucket=self.bucket_name,
-            MaxUploads=2,
-            Prefix=prefix,
-        )
-        multipart_uploads = resp['Uploads']
-        while resp['IsTruncated']:
-            resp = self.object_service.list_multipart_uploads(
+        # 列举bucket级别正在进行的分片，分页器逐条返回，不在内存中累积所有分页
+        upload_ids = Counter(
+            upload['UploadId']
+            for upload in iter_multipart_uploads(
+                self.object_service,
                 Bucket=self.bucket_name,
                 MaxUploads=2,
                 Prefix=prefix,
-                KeyMarker=resp['NextKeyMarker'],
-                UploadIdMarker=resp['NextUploadIdMarker'],
             )
-            multipart_uploads.extend(resp['Uploads'])
-
-        upload1 = list(filter(lambda x: x['UploadId'] == upload_id1, multipart_uploads))
-        upload2 = list(filter(lambda x: x['UploadId'] == upload_id2, multipart_uploads))
-        self.assertEqual(len(upload1), 1)
-        self.assertEqual(len(upload2), 1)
+        )
+        self.assertEqual(upload_ids[upload_id1], 1)
+        self.assertEqual(upload_ids[upload_id2], 1)
@@ -0,0 +1,70 @@
+import contextlib
+import datetime
+import re
+import sys
+import types
+from typing import Iterator, List, Optional
+from unittest import mock
+
+from object_tests.object_test_base import BaseObjectTest
+from util.presign import BatchPresigner
+
+_SIGNING_DATE = re.compile(r'\d{8}T\d{6}Z')
+
+
+def _signing_date(url: str) -> Optional[str]:
+    match = _SIGNING_DATE.search(url)
+    return match.group(0) if match else None
+
+
+@contextlib.contextmanager
+def _frozen_signing_time(now: datetime.datetime) -> Iterator[None]:
+    """
+    固定签名时间。较新的sdk通过 auth 模块的 get_current_datetime 取当前时间，较早的版本使用 datetime.datetime.utcnow
+    """
+
+    class FrozenDatetime(datetime.datetime):
+        @classmethod
+        def utcnow(cls):
+            return now.replace(tzinfo=None)
+
+        @classmethod
+        def now(cls, tz=None):
+            return now if tz is not None else now.replace(tzinfo=None)
+
+    frozen_module = types.SimpleNamespace(**{**vars(datetime), 'datetime': FrozenDatetime})
+    with contextlib.ExitStack() as stack:
+        for name in ('botocore.auth', 'sufycore.auth'):
+            module = sys.modules.get(name)
+            if module is None:
+                continue
+            if hasattr(module, 'get_current_datetime'):
+                stack.enter_context(mock.patch.object(module, 'get_current_datetime', lambda *args, **kwargs: now))
+            if isinstance(getattr(module, 'datetime', None), types.ModuleType):
+                stack.enter_context(mock.patch.object(module, 'datetime', frozen_module))
+        yield
+
+
+class ObjectPresignTest(BaseObjectTest):
+    def test_batch_presign(self):
+        keys = [self.object_key(name) for name in ('a', 'dir/b', 'dir/c d', '中文/e~f', 'g+h=i&j')]
+        now = datetime.datetime(2024, 1, 2, 3, 4, 5, tzinfo=datetime.timezone.utc)
+
+        def single(client_method: str, **params) -> List[str]:
+            return [
+                self.object_service.generate_presigned_url(
+                    client_method,
+                    Params={**params, 'Bucket': self.bucket_name, 'Key': key},
+                    ExpiresIn=600,
+                )
+                for key in keys
+            ]
+
+        for client_method, params in (('get_object', {'ResponseContentType': 'text/plain'}), ('put_object', {})):
+            presigner = BatchPresigner(self.object_service, self.bucket_name, client_method, expires_in=600, **params)
+            # 签名时间精确到秒，固定签名时间后逐个签名与批量签名的结果应完全相同
+            with _frozen_signing_time(now):
+                expected = single(client_method, **params)
+                urls = presigner.presign(keys)
+            self.assertEqual(now.strftime('%Y%m%dT%H%M%SZ'), _signing_date(expected[0]))
+            self.assertEqual(expected, urls)
@@ -1,6 +1,10 @@
+import hashlib
+import os
+
 from botocore.exceptions import ParamValidationError
 
 from object_tests.object_test_base import BaseObjectTest
+from util.blob_cassette import BLOB_DIR, BLOB_SERIALIZER
 from util.cass import CassetteUtils
 
 
@@ -17,7 +21,7 @@ class PutGetObjectTest(BaseObjectTest):
         run()
 
     def test_put_object(self):
-        key = 'testKey1'
+        key = self.object_key('testKey1')
         content = 'HelloWorld'
         metadata = {
             'test-key1': 'test-value1',
@@ -64,7 +68,7 @@ class PutGetObjectTest(BaseObjectTest):
             self.assertIsNotNone(resp.get_header_value('ETag'))
 
     def test_get_object(self):
-        key = 'test_get_object'
+        key = self.object_key('test_get_object')
         content = 'HelloWorld'
         metadata = {
             'test-key1': 'test-value1',
@@ -89,7 +93,7 @@ class PutGetObjectTest(BaseObjectTest):
             self.assertIsNotNone(get_object_response['LastModified'])
             for k, v in metadata.items():
                 self.assertEqual(v, get_object_response['Metadata'][k])
-            self.assertEqual(content, get_object_response['Body'].read().decode('utf-8'))
+            self.assertBodyMatches(get_object_response['Body'], content.encode('utf-8'))
 
         with self.vcr.use_cassette('test_get_object.yaml') as cass:
             run()
@@ -121,7 +125,7 @@ class PutGetObjectTest(BaseObjectTest):
             self.assertEqual(content, resp.body.as_str)
 
     def test_head_object(self):
-        key = 'test_head_object'
+        key = self.object_key('test_head_object')
         content = 'HelloWorld'
         metadata = {
             'test-key1': 'test-value1',
@@ -173,3 +177,42 @@ class PutGetObjectTest(BaseObjectTest):
                 ev = resp.get_header_value('x-sufy-meta-' + k)
                 self.assertIsNotNone(ev)
                 self.assertEqual(v, ev)
+
+    def test_blob_cassette(self):
+        keys = [self.object_key('test_blob_cassette_1'), self.object_key('test_blob_cassette_2')]
+        content = '0123456789abcdef' * 64 * 1024
+
+        def run():
+            for key in keys:
+                self.object_service.put_object(Key=key, Bucket=self.bucket_name, Body=content)
+            for key in keys:
+                get_object_response = self.object_service.get_object(Key=key, Bucket=self.bucket_name)
+                self.assertBodyMatches(get_object_response['Body'], content.encode('utf-8'))
+
+        # 录制完整的body
+        library_dir = self.vcr.cassette_library_dir
+        vcr = self.create_vcr(library_dir, record_mode='once', digest_bodies=False)
+        with vcr.use_cassette('test_blob_cassette.yaml', serializer=BLOB_SERIALIZER):
+            run()
+
+        # 两次上传的请求体与两次下载的响应体内容相同，只保存一份，cassette中只有元数据
+        digest = hashlib.sha256(content.encode('utf-8')).hexdigest()
+        blobs = [f for _, _, files in os.walk(os.path.join(library_dir, BLOB_DIR)) for f in files]
+        self.assertEqual([digest], blobs)
+        self.assertLess(os.path.getsize(os.path.join(library_dir, 'test_blob_cassette.yaml')), 64 * 1024)
+
+        with vcr.use_cassette('test_blob_cassette.yaml', serializer=BLOB_SERIALIZER, record_mode='none') as cass:
+            cu = CassetteUtils(cass)
+            self.assertEqual(4, len(cass))
+            for i, key in enumerate(keys):
+                req = cu.request(i)
+                self.check_public_request_header(req)
+                self.assertEqual('PUT', req.method)
+                self.assertEqual('/' + self.bucket_name + '/' + key, req.url.path)
+                self.assertEqual(digest, req.body.digest)
+
+                resp = cu.response(len(keys) + i)
+                self.check_public_response_header(resp)
+                self.assertEqual(200, resp.status_code)
+                self.assertEqual(digest, resp.body.digest)
+                self.assertEqual(content, resp.body.as_str)
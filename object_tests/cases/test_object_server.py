@@ -0,0 +1,221 @@
+import base64
+import hashlib
+import http.client
+import json
+import os
+import tempfile
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Optional, Tuple
+
+from util.download import RangedDownloader
+from util.object_server import MAX_KEY_LENGTH, LocalObjectServer
+
+
+class ObjectServerTest(unittest.TestCase):
+    """
+    直接通过HTTP访问本地对象存储服务，校验错误码、批量删除的部分失败、分片上传的合成和区间读取，
+    并通过client按分片和字节区间并发下载
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = LocalObjectServer().start()
+        cls.host, cls.port = cls.server.endpoint[len('http://'):].rsplit(':', 1)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.stop()
+
+    def setUp(self):
+        self.bucket = f'bucket-{self._testMethodName.replace("_", "-")}'
+        self.assertEqual(200, self.request('PUT', f'/{self.bucket}')[0])
+
+    def request(self, method: str, path: str, body: bytes = b'',
+                headers: Optional[Dict[str, str]] = None) -> Tuple[int, bytes, Dict[str, str]]:
+        conn = http.client.HTTPConnection(self.host, int(self.port))
+        try:
+            conn.request(method, path, body=body, headers=headers or {})
+            resp = conn.getresponse()
+            return resp.status, resp.read(), dict(resp.getheaders())
+        finally:
+            conn.close()
+
+    def request_json(self, method: str, path: str, document: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        body = json.dumps(document).encode('utf-8')
+        status, data, _ = self.request(method, path, body, {
+            'Content-MD5': base64.b64encode(hashlib.md5(body).digest()).decode('ascii'),
+        })
+        return status, json.loads(data) if data else {}
+
+    def assertError(self, status: int, code: str, response: Tuple[int, bytes, Dict[str, str]]):
+        self.assertEqual(status, response[0])
+        self.assertEqual(code, json.loads(response[1])['code'])
+
+    def test_error_codes(self):
+        self.assertError(404, 'NoSuchBucket', self.request('GET', '/no-such-bucket?list-type=2'))
+        self.assertError(404, 'NoSuchKey', self.request('GET', f'/{self.bucket}/missing'))
+        self.assertError(409, 'BucketAlreadyOwnedByYou', self.request('PUT', f'/{self.bucket}'))
+        self.assertError(400, 'KeyTooLongError', self.request('PUT', f'/{self.bucket}/{"k" * (MAX_KEY_LENGTH + 1)}'))
+        self.assertError(400, 'BadDigest', self.request('PUT', f'/{self.bucket}/key', b'data', {
+            'Content-MD5': base64.b64encode(hashlib.md5(b'other').digest()).decode('ascii'),
+        }))
+        self.assertEqual(200, self.request('PUT', f'/{self.bucket}/key', b'data')[0])
+        self.assertError(416, 'InvalidRange', self.request('GET', f'/{self.bucket}/key', headers={'Range': 'bytes=4-'}))
+        self.assertError(412, 'PreconditionFailed', self.request('GET', f'/{self.bucket}/key', headers={
+            'If-Match': '"0"',
+        }))
+        self.assertError(409, 'BucketNotEmpty', self.request('DELETE', f'/{self.bucket}'))
+        self.assertError(404, 'NoSuchUpload', self.request('PUT', f'/{self.bucket}/key?uploadId=0&partNumber=1'))
+
+        # HEAD 的错误响应没有响应体
+        status, body, headers = self.request('HEAD', f'/{self.bucket}/missing')
+        self.assertEqual((404, b''), (status, body))
+        self.assertIn('x-sufy-request-id', headers)
+
+    def test_delete_objects_errors(self):
+        keys = [f'key-{i}' for i in range(4)]
+        for key in keys:
+            self.request('PUT', f'/{self.bucket}/{key}', b'data')
+        self.server.store.inject_delete_errors(self.bucket, keys[:2], code='SlowDown', times=1)
+        too_long = 'k' * (MAX_KEY_LENGTH + 1)
+
+        status, result = self.request_json('POST', f'/{self.bucket}?delete', {
+            'Objects': [{'Key': key} for key in keys + [too_long]],
+            'Quiet': False,
+        })
+        self.assertEqual(200, status)
+        self.assertEqual(keys[2:], [item['Key'] for item in result['Deleted']])
+        self.assertEqual(
+            [(keys[0], 'SlowDown'), (keys[1], 'SlowDown'), (too_long, 'KeyTooLongError')],
+            [(item['Key'], item['Code']) for item in result['Errors']],
+        )
+        self.assertEqual(200, self.request('HEAD', f'/{self.bucket}/{keys[0]}')[0])
+
+        # 注入的错误只生效一次，重试时删除成功；Quiet模式只返回失败的key
+        status, result = self.request_json('POST', f'/{self.bucket}?delete', {
+            'Objects': [{'Key': key} for key in keys[:2]],
+            'Quiet': True,
+        })
+        self.assertEqual((200, {'Errors': []}), (status, result))
+        self.assertEqual(404, self.request('HEAD', f'/{self.bucket}/{keys[0]}')[0])
+
+    def test_complete_multipart_upload(self):
+        self.request('PUT', f'/{self.bucket}/source', b'0123456789' * 1000)
+        status, data, _ = self.request('POST', f'/{self.bucket}/key?uploads', headers={'Content-Type': 'text/plain'})
+        self.assertEqual(200, status)
+        upload_id = json.loads(data)['UploadId']
+
+        parts = {n: bytes([n]) * (64 * 1024 + n) for n in range(1, 9)}
+
+        def upload(part_number: int) -> str:
+            status, _, headers = self.request('PUT', f'/{self.bucket}/key?uploadId={upload_id}&partNumber={part_number}',
+                                              parts[part_number])
+            self.assertEqual(200, status)
+            return headers['ETag']
+
+        # 并发上传分片
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            etags = dict(zip(parts, executor.map(upload, parts)))
+        # 复制分片
+        status, data, _ = self.request('PUT', f'/{self.bucket}/key?uploadId={upload_id}&partNumber=9', headers={
+            'x-sufy-copy-source': f'/{self.bucket}/source',
+            'x-sufy-copy-source-range': 'bytes=10-19',
+        })
+        self.assertEqual(200, status)
+        parts[9] = b'0123456789'
+        etags[9] = json.loads(data)['ETag']
+        self.assertEqual(f'"{hashlib.md5(parts[9]).hexdigest()}"', etags[9])
+
+        status, result = self.request_json('POST', f'/{self.bucket}/key?uploadId={upload_id}', {
+            'Parts': [{'PartNumber': 2, 'ETag': etags[2]}, {'PartNumber': 1, 'ETag': etags[1]}],
+        })
+        self.assertEqual((400, 'InvalidPartOrder'), (status, result['code']))
+        status, result = self.request_json('POST', f'/{self.bucket}/key?uploadId={upload_id}', {
+            'Parts': [{'PartNumber': 1, 'ETag': etags[2]}],
+        })
+        self.assertEqual((400, 'InvalidPart'), (status, result['code']))
+
+        status, result = self.request_json('POST', f'/{self.bucket}/key?uploadId={upload_id}', {
+            'Parts': [{'PartNumber': n, 'ETag': etags[n]} for n in sorted(parts)],
+        })
+        self.assertEqual(200, status)
+        digest = hashlib.md5(b''.join(hashlib.md5(parts[n]).digest() for n in sorted(parts))).hexdigest()
+        self.assertEqual(f'"{digest}-{len(parts)}"', result['ETag'])
+
+        status, body, headers = self.request('GET', f'/{self.bucket}/key')
+        self.assertEqual(200, status)
+        self.assertEqual(b''.join(parts[n] for n in sorted(parts)), body)
+        self.assertEqual('text/plain', headers['Content-Type'])
+        status, body, headers = self.request('GET', f'/{self.bucket}/key?partNumber=3')
+        self.assertEqual((206, parts[3]), (status, body))
+        self.assertEqual(str(len(parts)), headers['x-sufy-mp-parts-count'])
+
+        # 完成后上传不存在
+        self.assertError(404, 'NoSuchUpload', self.request('GET', f'/{self.bucket}/key?uploadId={upload_id}'))
+
+    def test_get_object_ranges(self):
+        data = bytes(range(256)) * 40
+        status, _, headers = self.request('PUT', f'/{self.bucket}/key', data)
+        self.assertEqual(200, status)
+        etag = headers['ETag']
+
+        for byte_range, first, last in (('bytes=10-19', 10, 19), ('bytes=10000-', 10000, len(data) - 1),
+                                        ('bytes=-16', len(data) - 16, len(data) - 1),
+                                        ('bytes=100-999999', 100, len(data) - 1)):
+            status, body, headers = self.request('GET', f'/{self.bucket}/key', headers={
+                'Range': byte_range,
+                'If-Match': etag,
+            })
+            self.assertEqual((206, data[first:last + 1]), (status, body), byte_range)
+            self.assertEqual(f'bytes {first}-{last}/{len(data)}', headers['Content-Range'])
+
+        # 普通文件只有一个分片，没有分片数响应头
+        status, body, headers = self.request('GET', f'/{self.bucket}/key?partNumber=1')
+        self.assertEqual((206, data), (status, body))
+        self.assertEqual(f'bytes 0-{len(data) - 1}/{len(data)}', headers['Content-Range'])
+        self.assertNotIn('x-sufy-mp-parts-count', headers)
+        self.assertError(416, 'InvalidPartNumber', self.request('GET', f'/{self.bucket}/key?partNumber=2'))
+        self.assertError(412, 'PreconditionFailed', self.request('GET', f'/{self.bucket}/key?partNumber=1', headers={
+            'If-Match': '"0"',
+        }))
+
+    def test_ranged_download(self):
+        import sufycore.session
+        object_service = sufycore.session.Session().create_client(
+            service_name='object',
+            sufy_access_key_id='ak',
+            sufy_secret_access_key='sk',
+            region_name='local',
+            endpoint_url=self.server.endpoint,
+        )
+        # 分片大小各不相同，字节区间与分片边界不对齐
+        parts = [bytes([n]) * (64 * 1024 + n) for n in range(1, 9)]
+        data = b''.join(parts)
+        upload_id = object_service.create_multipart_upload(Bucket=self.bucket, Key='key')['UploadId']
+        etag = object_service.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key='key',
+            UploadId=upload_id,
+            MultipartUpload={'Parts': [
+                {'PartNumber': n, 'ETag': object_service.upload_part(
+                    Bucket=self.bucket, Key='key', UploadId=upload_id, PartNumber=n, Body=part,
+                )['ETag']}
+                for n, part in enumerate(parts, start=1)
+            ]},
+        )['ETag']
+
+        with tempfile.TemporaryDirectory() as tmp:
+            for use_part_numbers, ranges in ((True, len(parts)), (False, 6)):
+                downloader = RangedDownloader(object_service, self.bucket, 'key', workers=4,
+                                              range_size=100 * 1024, use_part_numbers=use_part_numbers)
+                downloaded, result = downloader.download()
+                self.assertEqual((len(data), etag, ranges, use_part_numbers),
+                                 (result.size, result.etag, result.ranges, result.by_part_number))
+                self.assertTrue(downloaded == data)
+
+                path = os.path.join(tmp, f'download-{use_part_numbers}')
+                result = downloader.download_to_file(path)
+                self.assertEqual((ranges, use_part_numbers), (result.ranges, result.by_part_number))
+                with open(path, 'rb') as f:
+                    self.assertTrue(f.read() == data)
@@ -1,61 +1,346 @@
+import atexit
+import contextlib
+import logging
 import os
+import sys
+import re
 import shutil
+import threading
 import unittest
+import uuid
+from datetime import timedelta
+from typing import TYPE_CHECKING, Any, ContextManager, Dict, Iterable, List, Mapping, Optional, Set, Tuple, Union
 
-import sufycore.session
-import vcr
-import yaml
-from botocore.config import Config
 from botocore.exceptions import ClientError
 
 from config import TestConfig
-from resources import test_config_file_path, test_vcr_tmp_file_dir_path
-from util.cass import CassetteRequest, CassetteResponse
+from resources import test_config_file_path, test_vcr_tmp_file_dir_path, test_vcr_replay_dir_path
+from util.cass import BodyDigestFilter, CassetteRequest, CassetteResponse, LazyVCR
+from util.payload import SeededPayload
+from util.seed import Body, ObjectSeeder
+from util.timing import LatencyRecorder, OperationTiming, format_table
+from util.verify import StreamVerifier, VerifyResult, Expected
 
+if TYPE_CHECKING:
+    import sufycore.session
+    from botocore.config import Config
+    from util.async_client import AsyncObjectClient
+    from util.cleanup import BucketCleaner, CleanupReport, SweepReport
+    from util.object_server import LocalObjectServer
 
-class BaseObjectTest(unittest.TestCase):
-    def setUp(self) -> None:
-        with open(test_config_file_path) as f:
-            test_config = TestConfig.from_dict(yaml.load(f, Loader=yaml.FullLoader))
-            self.test_config = test_config
+logger = logging.getLogger(__name__)
 
-        # logging.basicConfig(level=logging.DEBUG)
+_local_server: Optional['LocalObjectServer'] = None
+_local_server_lock = threading.Lock()
+
+
+def get_local_server(test_config: TestConfig) -> 'LocalObjectServer':
+    """
+    整个进程共用一个本地对象存储服务，第一次使用时启动
+    """
+    global _local_server
+    with _local_server_lock:
+        if _local_server is None:
+            from util.object_server import LocalObjectServer
+            _local_server = LocalObjectServer(
+                host=test_config.local.host,
+                port=test_config.local.port,
+                region=test_config.object.region,
+            ).start()
+            atexit.register(_local_server.stop)
+        return _local_server
+
+
+def read_test_config() -> TestConfig:
+    """
+    解析配置文件并应用 SUFY_TEST_* 环境变量，有libyaml时使用C实现的解析器
+    """
+    import yaml
+    loader = getattr(yaml, 'CFullLoader', yaml.FullLoader)
+    with open(test_config_file_path) as f:
+        return TestConfig.from_dict(yaml.load(f, Loader=loader)).with_env_overrides(os.environ)
+
+
+_test_config: Optional[TestConfig] = None
+_test_config_lock = threading.Lock()
+
+
+def load_test_config() -> TestConfig:
+    """
+    每个进程只解析一次配置文件，返回的配置被所有调用方共用，不应修改
+    """
+    global _test_config
+    with _test_config_lock:
+        if _test_config is None:
+            _test_config = read_test_config()
+        return _test_config
+
+
+def get_endpoint_url(test_config: TestConfig) -> str:
+    if test_config.local.enable:
+        return get_local_server(test_config).endpoint
+    return test_config.object.endpoint
+
+
+_latency_recorder = LatencyRecorder()
+
+
+def get_latency_recorder() -> LatencyRecorder:
+    return _latency_recorder
+
+
+def _print_latency_table():
+    timings = _latency_recorder.timings()
+    if timings:
+        print(f'\nobject service latency (ms, mean per call):\n{format_table(timings)}', file=sys.stderr)
 
+
+_latency_table_registered = False
+_latency_table_lock = threading.Lock()
+
+
+def _register_latency_table():
+    # 只有开启 report.latency 时进程退出前才输出汇总
+    global _latency_table_registered
+    with _latency_table_lock:
+        if not _latency_table_registered:
+            atexit.register(_print_latency_table)
+            _latency_table_registered = True
+
+
+def create_client_config(test_config: TestConfig, proxies: Optional[Dict[str, str]] = None) -> 'Config':
+    from botocore.config import Config
+    client = test_config.client
+    retries: Dict[str, Any] = {'mode': client.retry_mode}
+    if client.max_attempts is not None:
+        retries['total_max_attempts'] = client.max_attempts
+    return Config(
+        proxies=proxies,
+        max_pool_connections=client.max_pool_connections,
+        connect_timeout=client.connect_timeout,
+        read_timeout=client.read_timeout,
+        tcp_keepalive=client.tcp_keepalive,
+        retries=retries,
+    )
+
+
+def get_proxy_url(test_config: TestConfig) -> Optional[str]:
+    if not test_config.proxy.enable:
+        return None
+    return f'{test_config.proxy.type}://{test_config.proxy.host}:{test_config.proxy.port}'
+
+
+def _create_client(sufy_session: 'sufycore.session.Session', test_config: TestConfig):
+    proxy_url = get_proxy_url(test_config)
+    return sufy_session.create_client(
+        service_name='object',
+        sufy_access_key_id=test_config.auth.accessKey,
+        sufy_secret_access_key=test_config.auth.secretKey,
+        region_name=test_config.object.region,
+        endpoint_url=get_endpoint_url(test_config),
+        config=create_client_config(test_config, {'http': proxy_url} if proxy_url else None),
+    )
+
+
+def create_object_service(sufy_session: 'sufycore.session.Session', test_config: TestConfig):
+    object_service = _create_client(sufy_session, test_config)
+    if test_config.report.latency:
+        # 记录每次调用的序列化、签名、请求、传输和解析耗时，没有开启时不注册事件处理，也不保存调用记录
+        _latency_recorder.install(object_service)
+    return object_service
+
+
+class ObjectFixture:
+    """
+    进程内共享的测试配置、session和client，创建client需要加载服务模型，是测试中最耗时的部分
+    """
+
+    def __init__(self, test_config: TestConfig):
+        import sufycore.session
+        self.test_config = test_config
         self.sufy_session = sufycore.session.Session()
+        self.object_service = create_object_service(self.sufy_session, test_config)
+        self.__request_builder = None
+        self.__lock = threading.Lock()
 
-        proxies_arg = None
-        if test_config.proxy.enable:
-            proxies_arg = {
-                'http': f'{test_config.proxy.type}://{test_config.proxy.host}:{test_config.proxy.port}',
-            }
-        self.object_service = self.sufy_session.create_client(
-            service_name='object',
-            sufy_access_key_id=test_config.auth.accessKey,
-            sufy_secret_access_key=test_config.auth.secretKey,
-            region_name=test_config.object.region,
-            endpoint_url=test_config.object.endpoint,
-            config=Config(proxies=proxies_arg)
+    def create_async_object_service(self, max_connections: Optional[int] = None) -> 'AsyncObjectClient':
+        """
+        异步client的连接池绑定在当前事件循环上，每个事件循环需要单独创建
+        """
+        from util.async_client import AsyncObjectClient
+        with self.__lock:
+            if self.__request_builder is None:
+                # 异步client只用这个同步client构造和签名请求，所有异步client共用
+                self.__request_builder = _create_client(self.sufy_session, self.test_config)
+        return AsyncObjectClient(
+            self.__request_builder,
+            max_connections=max_connections or self.test_config.client.max_pool_connections,
+            proxy=get_proxy_url(self.test_config),
         )
 
-        self.vcr = vcr.VCR(
-            cassette_library_dir=test_vcr_tmp_file_dir_path,
-            serializer=test_config.vcr.serializer,
-            record_mode=test_config.vcr.record_mode,
-            match_on=test_config.vcr.match_on,
-        )
+
+_object_fixture: Optional[ObjectFixture] = None
+_object_fixture_lock = threading.Lock()
+
+
+def get_object_fixture() -> ObjectFixture:
+    global _object_fixture
+    with _object_fixture_lock:
+        if _object_fixture is None:
+            _object_fixture = ObjectFixture(load_test_config())
+        return _object_fixture
+
+
+def get_worker_id() -> Optional[str]:
+    """
+    并行运行测试时当前进程的编号，由 parallel_runner 或 pytest-xdist 设置
+    """
+    worker = os.environ.get('SUFY_TEST_WORKER') or os.environ.get('PYTEST_XDIST_WORKER')
+    if not worker:
+        return None
+    return re.sub(r'[^a-z0-9-]', '-', worker.lower())
+
+
+def get_vcr_tmp_dir() -> str:
+    """
+    用例临时录制cassette的目录。并行运行时每个进程使用独立的子目录，
+    每个用例开始前清空目录时不会删除其他进程正在写入的cassette
+    """
+    return os.path.join(test_vcr_tmp_file_dir_path, get_worker_id() or 'main')
+
+
+def create_bucket_cleaner(object_service: Any, bucket: str, test_config: TestConfig, **kwargs) -> 'BucketCleaner':
+    """
+    按 cleanup 配置创建 BucketCleaner，回放模式下顺序列举，使cassette中列举请求的顺序固定
+    """
+    from util.cleanup import BucketCleaner
+    cleanup = test_config.cleanup
+    kwargs.setdefault('workers', cleanup.workers)
+    kwargs.setdefault('list_workers', 1 if test_config.vcr.replay else cleanup.list_workers)
+    return BucketCleaner(object_service, bucket, **kwargs)
+
+
+_derived_buckets: Set[str] = set()
+_derived_buckets_lock = threading.Lock()
+
+
+def _delete_derived_buckets():
+    from util.cleanup import MultipartUploadSweeper
+    fixture = get_object_fixture()
+    object_service = fixture.object_service
+    for bucket in _derived_buckets:
+        try:
+            create_bucket_cleaner(object_service, bucket, fixture.test_config).run()
+            MultipartUploadSweeper(object_service, bucket, older_than=timedelta(0), count_bytes=False).run()
+            object_service.delete_bucket(Bucket=bucket)
+        except ClientError:
+            pass
+
+
+class BaseObjectTest(unittest.TestCase):
+    test_config: TestConfig
+    bucket_name: str
+    # 需要独占bucket的测试类（例如会删除bucket的用例）设置该后缀
+    bucket_suffix: Optional[str] = None
+    # 重置bucket时中止早于该时间发起的未完成分片上传，较新的上传可能属于其他正在运行的测试
+    stale_upload_age: timedelta = timedelta(hours=1)
+
+    @classmethod
+    def setUpClass(cls) -> None:
+        # logging.basicConfig(level=logging.DEBUG)
+
+        fixture = get_object_fixture()
+        cls.test_config = fixture.test_config
+        cls.sufy_session = fixture.sufy_session
+        cls.object_service = fixture.object_service
+        cls.bucket_name = cls.get_bucket_name()
+        cls.__register_derived_bucket()
+        if cls.test_config.report.latency:
+            _register_latency_table()
+
+        cls.vcr = cls.create_vcr(get_vcr_tmp_dir())
+
+        # 每个测试类开始前都确保bucket存在并清空所有文件，测试用例之间通过key前缀隔离
+        with cls.replay_cassette(cls.replay_dir(), '__setUpClass__.yaml'):
+            cls.make_sure_bucket_exists()
+            cls.clean_all_files()
+        if not cls.test_config.vcr.replay:
+            # 是否中止取决于当前时间，回放时无法与录制的请求一致
+            report = cls.sweep_stale_uploads()
+            if report.aborted or report.failed:
+                logger.info('%s: %s', cls.bucket_name, report)
+
+    def setUp(self) -> None:
+        self.__timing_mark = _latency_recorder.mark()
+        self.addCleanup(self.__report_timing)
+
+        if self.test_config.vcr.replay:
+            # 回放模式下用例内的cassette也持久化保存，key前缀必须与录制时相同
+            test_dir = os.path.join(self.replay_dir(), self._testMethodName)
+            self.vcr = self.create_vcr(test_dir, record_mode='once')
+            cassette = self.replay_cassette(test_dir, '__test__.yaml')
+            cassette.__enter__()
+            self.addCleanup(cassette.__exit__, None, None, None)
+            self.key_prefix = f'{self._testMethodName}-replay/'
+            return
+
         try:
-            shutil.rmtree(test_vcr_tmp_file_dir_path)
+            shutil.rmtree(get_vcr_tmp_dir())
         except FileNotFoundError:
             pass
 
-        # 测试环境每个测试用例开始前都确保bucket存在并清空所有文件
-        self.make_sure_bucket_exists()
-        self.clean_all_files()
+        self.key_prefix = f'{self._testMethodName}-{uuid.uuid4().hex[:8]}/'
+
+    def __report_timing(self):
+        self.timings: List[OperationTiming] = _latency_recorder.since(self.__timing_mark)
+        if self.timings and self.test_config.report.latency:
+            print(f'\n{self.id()} latency (ms, mean per call):\n{format_table(self.timings)}', file=sys.stderr)
+
+    @classmethod
+    def create_vcr(cls, cassette_library_dir: str, record_mode: Optional[str] = None,
+                   digest_bodies: bool = True, body_digest_threshold: Optional[int] = None) -> LazyVCR:
+        """
+        digest_bodies 为真且不是回放模式时，超过阈值的body只录制摘要，见 BodyDigestFilter。
+        body_digest_threshold 为空时使用配置中的 vcr.body_digest_threshold
+        """
+        kwargs = {}
+        threshold = body_digest_threshold if body_digest_threshold is not None \
+            else cls.test_config.vcr.body_digest_threshold
+        if digest_bodies and threshold is not None and not cls.test_config.vcr.replay:
+            digest_filter = BodyDigestFilter(threshold)
+            kwargs.update(before_record_request=digest_filter.request, before_record_response=digest_filter.response)
+        # 第一次使用cassette时才导入vcr
+        return LazyVCR(
+            cassette_library_dir=cassette_library_dir,
+            serializer=cls.test_config.vcr.serializer,
+            record_mode=record_mode or cls.test_config.vcr.record_mode,
+            match_on=cls.test_config.vcr.match_on,
+            **kwargs,
+        )
+
+    @classmethod
+    def replay_dir(cls) -> str:
+        return os.path.join(test_vcr_replay_dir_path, cls.__name__)
+
+    @classmethod
+    def replay_cassette(cls, cassette_library_dir: str, name: str) -> ContextManager:
+        """
+        回放模式下录制或回放 cassette_library_dir 中的 name，cassette不存在时录制，存在时只回放不访问网络
+        """
+        if not cls.test_config.vcr.replay:
+            return contextlib.nullcontext()
+        return cls.create_vcr(cassette_library_dir, record_mode='once').use_cassette(name)
+
+    def object_key(self, name: str) -> str:
+        """
+        返回当前测试用例独占的key
+        """
+        return self.key_prefix + name
 
     def check_public_request_header(self, request: CassetteRequest):
         host = request.url.hostname
-        if not self.test_config.object.forcePathStyle:
-            self.assertEqual(host, f'{self.test_config.object.bucket}.{self.test_config.object.endpoint}')
+        if not self.test_config.object.forcePathStyle and not self.test_config.local.enable:
+            self.assertEqual(host, f'{self.bucket_name}.{self.test_config.object.endpoint}')
 
         auth = request.get_header_value('authorization')
         self.assertTrue(auth.startswith('Sufy '))
@@ -83,59 +368,106 @@ class BaseObjectTest(unittest.TestCase):
             Body=content,
         )
 
-    @property
-    def bucket_name(self):
-        return self.test_config.object.bucket
+    def seed_objects(self, objects: Union[Mapping[str, Body], Iterable[Tuple[str, Body]]],
+                     workers: Optional[int] = None, **put_kwargs) -> Dict[str, str]:
+        """
+        并发上传测试文件，objects 是 key 到内容的映射或 (key, 内容) 的迭代器，返回 key 到 ETag 的映射
+        """
+        if self.test_config.vcr.replay:
+            # 回放模式下顺序上传，使cassette中请求的顺序固定
+            workers = 1
+        return ObjectSeeder(
+            self.object_service,
+            self.bucket_name,
+            workers=workers or self.test_config.client.max_pool_connections,
+        ).run(objects, **put_kwargs)
+
+    def assertBodyMatches(self, body, expected: Expected) -> VerifyResult:
+        """
+        分块校验下载的内容，不一致时报告第一个不一致的偏移
+        """
+        result = StreamVerifier(expected).verify(body)
+        self.assertTrue(result.ok, str(result))
+        return result
 
-    def make_sure_bucket_exists(self):
+    @classmethod
+    def get_bucket_name(cls) -> str:
+        """
+        并行运行时每个进程使用独立的bucket，避免清空bucket时删除其他进程的测试文件。
+        回放模式下的cassette中记录了bucket名称，为了在任意进程中都能回放，bucket名称与进程无关，
+        因此录制回放用的cassette时应串行运行
+        """
+        worker = None if cls.test_config.vcr.replay else get_worker_id()
+        parts = [cls.test_config.object.bucket, worker, cls.bucket_suffix]
+        return '-'.join(p for p in parts if p)
+
+    @classmethod
+    def make_sure_bucket_exists(cls):
         try:
-            self.object_service.head_bucket(
-                Bucket=self.bucket_name,
+            cls.object_service.head_bucket(
+                Bucket=cls.bucket_name,
             )
         except ClientError as e:
             if e.response['Error']['Code'] == '404':
-                self.object_service.create_bucket(
-                    Bucket=self.bucket_name,
+                cls.object_service.create_bucket(
+                    Bucket=cls.bucket_name,
                     CreateBucketConfiguration={
-                        'LocationConstraint': self.test_config.object.region,
+                        'LocationConstraint': cls.test_config.object.region,
                     },
                 )
             else:
                 raise
 
-    def random_bytes(self, size: int) -> bytes:
-        return os.urandom(size)
+    @classmethod
+    def __register_derived_bucket(cls):
+        # 派生出的bucket在进程退出时删除，配置文件中的bucket保留
+        if cls.bucket_name == cls.test_config.object.bucket:
+            return
+        if cls.test_config.vcr.replay:
+            # 回放模式下不访问网络，bucket由录制时的测试环境负责清理
+            return
+        with _derived_buckets_lock:
+            if not _derived_buckets:
+                atexit.register(_delete_derived_buckets)
+            _derived_buckets.add(cls.bucket_name)
 
-    def clean_all_files(self):
-        # 循环列举bucket的所有文件
-        continuation_token = ''
-        while True:
-            list_resp = self.object_service.list_objects_v2(
-                Bucket=self.bucket_name,
-                ContinuationToken=continuation_token,
-            )
+    def payload(self, size: int, name: str = '') -> SeededPayload:
+        """
+        返回由测试用例名称确定的测试数据，同一个用例每次运行生成的内容相同
+        """
+        return SeededPayload(size, seed=f'{self.id()}:{name}')
 
-            # 使用批量删除接口删除所有文件
-            if len(list_resp['Contents']) > 0:
-                self.object_service.delete_objects(
-                    Bucket=self.bucket_name,
-                    Delete={
-                        'Objects': [{'Key': item['Key']} for item in list_resp['Contents']],
-                    },
-                )
+    @classmethod
+    def clean_all_files(cls) -> 'CleanupReport':
+        # 边列举边使用批量删除接口并发删除所有文件
+        return create_bucket_cleaner(cls.object_service, cls.bucket_name, cls.test_config).run()
 
-            if not list_resp['IsTruncated']:
-                break
-            continuation_token = list_resp['NextContinuationToken']
+    @classmethod
+    def sweep_stale_uploads(cls, older_than: Optional[timedelta] = None) -> 'SweepReport':
+        # 未完成的分片上传不会被 clean_all_files 删除，长期累积会拖慢 list_multipart_uploads
+        from util.cleanup import MultipartUploadSweeper
+        return MultipartUploadSweeper(
+            cls.object_service,
+            cls.bucket_name,
+            older_than=cls.stale_upload_age if older_than is None else older_than,
+        ).run()
 
-    def force_delete_bucket(self):
+    @classmethod
+    def force_delete_bucket(cls):
         try:
-            self.clean_all_files()
-            self.object_service.delete_bucket(Bucket=self.bucket_name)
+            cls.clean_all_files()
+            cls.sweep_stale_uploads(older_than=timedelta(0))
+            cls.object_service.delete_bucket(Bucket=cls.bucket_name)
         except ClientError:
             pass
 
 
 __all__ = [
     'BaseObjectTest',
+    'ObjectFixture',
+    'get_object_fixture',
+    'get_latency_recorder',
+    'create_bucket_cleaner',
+    'get_worker_id',
+    'get_vcr_tmp_dir',
 ]
@@ -0,0 +1,86 @@
+"""
+多进程并行运行测试用例，每个进程通过 SUFY_TEST_WORKER 使用独立的bucket和cassette目录。
+回放模式下bucket名称与进程无关，只能并行回放已录制的cassette，录制时应串行运行
+
+    python -m object_tests.parallel_runner -n 4
+    python -m object_tests.parallel_runner -n 8 --dist test -- -x
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+cases_dir = os.path.join(root_dir, 'object_tests', 'cases')
+
+
+def collect_test_files() -> List[str]:
+    return sorted(
+        os.path.join('object_tests', 'cases', name)
+        for name in os.listdir(cases_dir)
+        if name.startswith('test_') and name.endswith('.py')
+    )
+
+
+def collect_test_ids() -> List[str]:
+    output = subprocess.run(
+        [sys.executable, '-m', 'pytest', '--collect-only', '-q', *collect_test_files()],
+        cwd=root_dir,
+        stdout=subprocess.PIPE,
+        universal_newlines=True,
+        check=True,
+    ).stdout
+    return [line.strip() for line in output.splitlines() if '::' in line]
+
+
+def split(items: List[str], workers: int) -> List[List[str]]:
+    shards: List[List[str]] = [[] for _ in range(workers)]
+    for i, item in enumerate(items):
+        shards[i % workers].append(item)
+    return [shard for shard in shards if shard]
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-n', '--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--dist', choices=['file', 'test'], default='file',
+                        help='distribute whole test files (keeps per-class fixtures) or single tests')
+    parser.add_argument('pytest_args', nargs='*', help='extra arguments passed to each pytest process')
+    args = parser.parse_args()
+
+    items = collect_test_files() if args.dist == 'file' else collect_test_ids()
+    shards = split(items, args.workers)
+
+    start = time.perf_counter()
+    processes = []
+    for i, shard in enumerate(shards):
+        env = dict(os.environ, SUFY_TEST_WORKER=f'w{i}')
+        log = tempfile.TemporaryFile(mode='w+')
+        process = subprocess.Popen(
+            [sys.executable, '-m', 'pytest', '-q', *args.pytest_args, *shard],
+            cwd=root_dir,
+            env=env,
+            stdout=log,
+            stderr=subprocess.STDOUT,
+        )
+        processes.append((i, process, log))
+
+    exit_code = 0
+    for i, process, log in processes:
+        code = process.wait()
+        log.seek(0)
+        lines = log.read().rstrip().splitlines()
+        log.close()
+        print(f'[w{i}] exit={code} {lines[-1] if lines else ""}')
+        if code != 0:
+            print('\n'.join(lines))
+            exit_code = code
+    print(f'{len(shards)} workers finished in {time.perf_counter() - start:.2f}s')
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,371 @@
+import asyncio
+import io
+import ssl
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from botocore.awsrequest import HeadersDict
+from botocore.exceptions import ConnectionClosedError, EndpointConnectionError, ReadTimeoutError
+from botocore.response import StreamingBody
+
+_NO_BODY_STATUS = (204, 304)
+_CONTINUE_TIMEOUT = 1.0
+
+
+class _RequestCaptured(Exception):
+    def __init__(self, request: Any, request_dict: Dict[str, Any]):
+        super().__init__('request captured')
+        self.request = request
+        self.request_dict = request_dict
+
+
+class _RequestCapture:
+    """
+    同步client完成序列化、endpoint解析和签名之后在发送前中止，由异步client发送。
+    重试策略需要 before-call 时的 request_dict，同一次调用的事件在同一线程中触发，保存在线程局部变量里
+    """
+
+    def __init__(self):
+        self.__local = threading.local()
+
+    def on_before_call(self, params: Dict[str, Any], **kwargs):
+        self.__local.request_dict = params
+
+    def on_before_send(self, request: Any, **kwargs):
+        raise _RequestCaptured(request, getattr(self.__local, 'request_dict', {'context': {}}))
+
+
+class _HTTPResponse:
+    # 重试策略只用到状态码、响应头和响应体
+    def __init__(self, status_code: int, headers: HeadersDict, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+
+def _str_headers(headers: Any) -> Dict[str, str]:
+    return {k: v.decode('utf-8') if isinstance(v, bytes) else str(v) for k, v in headers.items()}
+
+
+class _Connection:
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        self.reused = False
+
+    def close(self):
+        self.writer.close()
+
+
+class AsyncHTTPPool:
+    """
+    基于asyncio streams的HTTP/1.1客户端，按 (scheme, host, port) 复用keep-alive连接，
+    同时打开的连接数不超过 max_connections
+    """
+
+    def __init__(self, max_connections: int = 100, connect_timeout: float = 60, read_timeout: float = 60,
+                 proxy: Optional[str] = None):
+        self.__semaphore = asyncio.Semaphore(max_connections)
+        self.__connect_timeout = connect_timeout
+        self.__read_timeout = read_timeout
+        # 只支持通过http代理访问http地址
+        self.__proxy = urlsplit(proxy) if proxy else None
+        self.__idle: Dict[Tuple[str, str, int], Deque[_Connection]] = {}
+        self.__ssl_context: Optional[ssl.SSLContext] = None
+
+    async def request(self, method: str, url: str, headers: Dict[str, str],
+                      body: bytes = b'') -> Tuple[int, List[Tuple[str, str]], bytes]:
+        parts = urlsplit(url)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        if self.__proxy is not None and parts.scheme == 'http':
+            key = ('http', self.__proxy.hostname, self.__proxy.port or 80)
+            target = url
+        else:
+            key = (parts.scheme, parts.hostname, port)
+        async with self.__semaphore:
+            while True:
+                conn = await self.__acquire(key)
+                try:
+                    status, response_headers, response_body, keep_alive = await self.__exchange(
+                        conn, method, target, headers, body)
+                except (ConnectionError, asyncio.IncompleteReadError) as e:
+                    conn.close()
+                    # 复用的连接可能已被服务端关闭，换一个连接重试
+                    if conn.reused and not (isinstance(e, asyncio.IncompleteReadError) and e.partial):
+                        continue
+                    raise
+                except BaseException:
+                    conn.close()
+                    raise
+                if keep_alive:
+                    conn.reused = True
+                    self.__idle.setdefault(key, deque()).append(conn)
+                else:
+                    conn.close()
+                return status, response_headers, response_body
+
+    async def close(self):
+        for connections in self.__idle.values():
+            while connections:
+                conn = connections.popleft()
+                conn.close()
+                try:
+                    await conn.writer.wait_closed()
+                except (ConnectionError, ssl.SSLError):
+                    pass
+
+    async def __acquire(self, key: Tuple[str, str, int]) -> _Connection:
+        idle = self.__idle.get(key)
+        while idle:
+            conn = idle.pop()
+            if not conn.reader.at_eof():
+                return conn
+            conn.close()
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == 'https':
+            if self.__ssl_context is None:
+                self.__ssl_context = ssl.create_default_context()
+            ssl_context = self.__ssl_context
+        reader, writer = await asyncio.wait_for(
+            asyncio.open_connection(host, port, ssl=ssl_context, limit=256 * 1024),
+            self.__connect_timeout,
+        )
+        return _Connection(reader, writer)
+
+    async def __exchange(self, conn: _Connection, method: str, target: str, headers: Dict[str, str],
+                         body: bytes) -> Tuple[int, List[Tuple[str, str]], bytes, bool]:
+        lines = [f'{method} {target} HTTP/1.1']
+        has_length = False
+        expect_continue = False
+        for k, v in headers.items():
+            lk = k.lower()
+            if lk == 'content-length':
+                has_length = True
+            elif lk == 'expect' and v.lower() == '100-continue':
+                expect_continue = bool(body)
+            lines.append(f'{k}: {v}')
+        if not has_length and (body or method in ('PUT', 'POST')):
+            lines.append(f'Content-Length: {len(body)}')
+        conn.writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        if not expect_continue:
+            conn.writer.write(body)
+        await conn.writer.drain()
+
+        if expect_continue:
+            try:
+                status, response_headers = await self.__read_head(conn, _CONTINUE_TIMEOUT)
+            except asyncio.TimeoutError:
+                # 服务端不支持 100-continue 时等待片刻后直接发送请求体
+                status, response_headers = 100, []
+            if status == 100:
+                conn.writer.write(body)
+                await conn.writer.drain()
+                status, response_headers = await self.__read_head(conn)
+            else:
+                # 服务端未读取请求体就返回了最终响应，连接无法继续使用
+                response_headers.append(('Connection', 'close'))
+        else:
+            status, response_headers = await self.__read_head(conn)
+        while 100 <= status < 200:
+            status, response_headers = await self.__read_head(conn)
+
+        lowered = {k.lower(): v for k, v in response_headers}
+        keep_alive = lowered.get('connection', '').lower() != 'close'
+        if method == 'HEAD' or status in _NO_BODY_STATUS:
+            response_body = b''
+        elif lowered.get('transfer-encoding', '').lower() == 'chunked':
+            response_body = await asyncio.wait_for(self.__read_chunked(conn.reader), self.__read_timeout)
+        elif 'content-length' in lowered:
+            response_body = await asyncio.wait_for(
+                conn.reader.readexactly(int(lowered['content-length'])), self.__read_timeout)
+        else:
+            response_body = await asyncio.wait_for(conn.reader.read(), self.__read_timeout)
+            keep_alive = False
+        return status, response_headers, response_body, keep_alive
+
+    async def __read_head(self, conn: _Connection,
+                          timeout: Optional[float] = None) -> Tuple[int, List[Tuple[str, str]]]:
+        head = await asyncio.wait_for(conn.reader.readuntil(b'\r\n\r\n'), timeout or self.__read_timeout)
+        status_line, *header_lines = head[:-4].decode('latin-1').split('\r\n')
+        status = int(status_line.split(' ', 2)[1])
+        headers = []
+        for line in header_lines:
+            k, _, v = line.partition(':')
+            headers.append((k.strip(), v.strip()))
+        return status, headers
+
+    @staticmethod
+    async def __read_chunked(reader: asyncio.StreamReader) -> bytes:
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';', 1)[0].strip(), 16)
+            if size == 0:
+                while (await reader.readline()) not in (b'\r\n', b'\n', b''):
+                    pass
+                return b''.join(chunks)
+            chunks.append(await reader.readexactly(size))
+            await reader.readline()
+
+
+class AsyncObjectClient:
+    """
+    协程版的对象存储client，请求的序列化、签名和响应解析复用同步client，只有网络IO在事件循环中进行。
+    序列化、签名和读取文件形式的请求体在线程池中执行，不阻塞事件循环；响应解析较快，在事件循环中执行。
+    是否重试以及重试前等待的时间由同步client按其 retries 配置（retry_mode、max_attempts）注册的 needs-retry 处理函数决定，
+    与同步client相同，请求体不能seek时不重试。
+    client 必须专门用于构造请求，创建后不能再用于同步调用。
+    请求体和流式响应体（例如 get_object 的 Body）都会被完整读入内存
+
+        async_client = AsyncObjectClient(session.create_client('object', ...))
+        await async_client.put_object(Bucket=bucket, Key=key, Body=b'...')
+    """
+
+    def __init__(self, client: Any, max_connections: int = 100, proxy: Optional[str] = None):
+        self.__client = client
+        self.__api_names: Dict[str, str] = client.meta.method_to_api_mapping
+        self.__method_names = {api_name: name for name, api_name in self.__api_names.items()}
+        capture = _RequestCapture()
+        client.meta.events.register_first('before-call', capture.on_before_call, unique_id='async-object-client-call')
+        client.meta.events.register_first('before-send', capture.on_before_send, unique_id='async-object-client')
+        config = client.meta.config
+        self.__pool = AsyncHTTPPool(
+            max_connections=max_connections,
+            connect_timeout=config.connect_timeout,
+            read_timeout=config.read_timeout,
+            proxy=proxy,
+        )
+
+    @property
+    def meta(self) -> Any:
+        return self.__client.meta
+
+    @property
+    def exceptions(self) -> Any:
+        return self.__client.exceptions
+
+    def __getattr__(self, name: str):
+        api_name = self.__api_names.get(name)
+        if api_name is None:
+            raise AttributeError(name)
+
+        async def call(**params):
+            return await self.call(api_name, **params)
+
+        call.__name__ = name
+        return call
+
+    async def call(self, operation_name: str, **params) -> Dict[str, Any]:
+        operation_model = self.__client.meta.service_model.operation_model(operation_name)
+        loop = asyncio.get_running_loop()
+        stream = params.get('Body')
+        if not hasattr(stream, 'read'):
+            stream = None
+        start = stream.tell() if hasattr(stream, 'seek') and hasattr(stream, 'tell') else None
+        attempts = 1
+        while True:
+            request, request_dict, body = await loop.run_in_executor(None, self.__prepare, operation_name, params)
+            response = None
+            caught_exception = None
+            try:
+                status, headers, content = await self.__pool.request(
+                    request.method, request.url, _str_headers(request.headers), body)
+            except asyncio.TimeoutError as e:
+                caught_exception = ReadTimeoutError(endpoint_url=request.url, error=e)
+            except asyncio.IncompleteReadError as e:
+                caught_exception = ConnectionClosedError(endpoint_url=request.url, error=e)
+            except OSError as e:
+                caught_exception = EndpointConnectionError(endpoint_url=request.url, error=e)
+            else:
+                response = self.__parse(operation_model, status, headers, content)
+
+            delay = None
+            if stream is None or start is not None:
+                delay = self.__retry_delay(operation_model, request_dict, attempts, response, caught_exception)
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+            if start is not None:
+                stream.seek(start)
+            attempts += 1
+
+        if caught_exception is not None:
+            raise caught_exception
+        http_response, parsed = response
+        parsed.setdefault('ResponseMetadata', {})['RetryAttempts'] = attempts - 1
+        if http_response.status_code >= 300:
+            error_code = parsed.get('Error', {}).get('Code')
+            raise self.__client.exceptions.from_code(error_code)(parsed, operation_model.name)
+        return parsed
+
+    async def close(self):
+        await self.__pool.close()
+
+    async def __aenter__(self) -> 'AsyncObjectClient':
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+    def __prepare(self, operation_name: str, params: Dict[str, Any]) -> Tuple[Any, Dict[str, Any], bytes]:
+        # 在线程池中执行
+        api_method = getattr(self.__client, self.__method_names[operation_name])
+        try:
+            api_method(**params)
+        except _RequestCaptured as captured:
+            request = captured.request
+            body = request.body
+            if body is None:
+                body = b''
+            elif isinstance(body, str):
+                body = body.encode('utf-8')
+            elif hasattr(body, 'read'):
+                body = body.read()
+            return request, captured.request_dict, bytes(body)
+        raise RuntimeError(f'{operation_name} was not sent through the http session')
+
+    def __retry_delay(self, operation_model: Any, request_dict: Dict[str, Any], attempts: int,
+                      response: Optional[Tuple[_HTTPResponse, Dict[str, Any]]],
+                      caught_exception: Optional[Exception]) -> Optional[float]:
+        # 与同步client的endpoint触发相同的事件，返回需要等待的秒数，不重试时返回None
+        service_id = operation_model.service_model.service_id.hyphenize()
+        responses = self.__client.meta.events.emit(
+            f'needs-retry.{service_id}.{operation_model.name}',
+            response=response,
+            endpoint=None,
+            operation=operation_model,
+            attempts=attempts,
+            caught_exception=caught_exception,
+            request_dict=request_dict,
+        )
+        for _, delay in responses:
+            if delay is not None and delay is not False:
+                return delay
+        return None
+
+    def __parse(self, operation_model: Any, status: int, headers: List[Tuple[str, str]],
+                content: bytes) -> Tuple[_HTTPResponse, Dict[str, Any]]:
+        response_headers = HeadersDict()
+        for k, v in headers:
+            response_headers[k] = v
+        response_dict: Dict[str, Any] = {
+            'headers': response_headers,
+            'status_code': status,
+            'context': {'operation_name': operation_model.name},
+            'body': content,
+        }
+        if status < 300 and operation_model.has_streaming_output:
+            response_dict['body'] = StreamingBody(io.BytesIO(content), len(content))
+        parsed = self.__client._response_parser.parse(response_dict, operation_model.output_shape)
+        return _HTTPResponse(status, response_headers, content), parsed
+
+
+__all__ = [
+    'AsyncObjectClient',
+    'AsyncHTTPPool',
+]
@@ -0,0 +1,176 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from vcr.persisters.filesystem import CassetteDecodeError, CassetteNotFoundError, FilesystemPersister
+from vcr.request import Request
+
+BLOB_SERIALIZER = 'blob'
+
+# body保存在cassette所在目录的 blobs/<sha256前两位>/<sha256> 中，同一目录下的cassette共用
+BLOB_DIR = 'blobs'
+
+# 小于该大小的body直接写在cassette中，不单独保存文件
+INLINE_LIMIT = 4 * 1024
+
+FORMAT_VERSION = 1
+
+_BYTES = '__bytes__'
+_BLOB = '__blob__'
+
+
+Body = Union[bytes, bytearray, memoryview]
+
+
+class BlobStore:
+    """
+    按sha256保存body的目录，内容相同的body只保存一份。
+    读取时返回bytes：vcr 回放时本来就会把body拷贝到 BytesIO，映射文件省不了拷贝，反而要管理映射的关闭
+    """
+
+    def __init__(self, root: Union[str, Path]):
+        self.root = Path(root)
+
+    def path(self, digest: str) -> Path:
+        return self.root / digest[:2] / digest
+
+    def put(self, data: Body) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.path(digest)
+        if path.exists():
+            return digest
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{digest[:8]}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        return digest
+
+    def get(self, digest: str, size: int) -> bytes:
+        if size == 0:
+            return b''
+        with open(self.path(digest), 'rb') as f:
+            data = f.read()
+        if len(data) != size:
+            raise CassetteDecodeError(f'blob {digest} has {len(data)} bytes, expected {size}')
+        return data
+
+
+class BlobSerializer:
+    """
+    vcr 的 serializer：第一行是格式版本，之后每行一个请求和响应的JSON。
+    单独使用时bytes以base64写在cassette中；由 BlobPersister 读写时较大的body保存到 BlobStore，cassette中只记录sha256和大小
+    """
+
+    def serialize(self, cassette_dict: Dict[str, Any]) -> str:
+        return self.dumps(cassette_dict['interactions'])
+
+    def deserialize(self, cassette_string: str) -> Dict[str, Any]:
+        return {'version': FORMAT_VERSION, 'interactions': self.loads(cassette_string)}
+
+    @staticmethod
+    def dumps(interactions: List[Dict[str, Any]], blobs: Optional[BlobStore] = None) -> str:
+        def encode(value: Any) -> Dict[str, Any]:
+            if isinstance(value, (bytes, bytearray, memoryview)):
+                if blobs is not None and len(value) >= INLINE_LIMIT:
+                    return {_BLOB: blobs.put(value), 'size': len(value)}
+                return {_BYTES: base64.b64encode(value).decode('ascii')}
+            raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+        lines = [json.dumps({'version': FORMAT_VERSION})]
+        lines.extend(json.dumps(i, default=encode, ensure_ascii=False, separators=(',', ':')) for i in interactions)
+        return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def loads(cassette_string: str, blobs: Optional[BlobStore] = None) -> List[Dict[str, Any]]:
+        def decode(obj: Dict[str, Any]) -> Any:
+            if _BYTES in obj:
+                return base64.b64decode(obj[_BYTES])
+            if _BLOB in obj:
+                if blobs is None:
+                    raise CassetteDecodeError(f'blob {obj[_BLOB]} referenced without a blob store')
+                return blobs.get(obj[_BLOB], obj['size'])
+            return obj
+
+        lines = cassette_string.splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError as e:
+            raise CassetteDecodeError(f'not a blob cassette: {e}') from e
+        if header.get('version') != FORMAT_VERSION:
+            raise CassetteDecodeError(f'unsupported blob cassette version {header.get("version")}')
+        return [json.loads(line, object_hook=decode) for line in lines[1:] if line]
+
+
+class BlobPersister:
+    """
+    serializer 为 BlobSerializer 时把body保存到cassette所在目录的 BlobStore 中，其他serializer与vcr默认的持久化方式相同
+    """
+
+    @classmethod
+    def load_cassette(cls, cassette_path: Union[str, Path], serializer: Any) -> Tuple[List[Request], List[Dict[str, Any]]]:
+        if not isinstance(serializer, BlobSerializer):
+            return FilesystemPersister.load_cassette(cassette_path, serializer)
+        cassette_path = Path(cassette_path)
+        if not cassette_path.is_file():
+            raise CassetteNotFoundError()
+        with cassette_path.open(encoding='utf-8') as f:
+            data = f.read()
+        interactions = serializer.loads(data, BlobStore(cassette_path.parent / BLOB_DIR))
+        requests = [Request._from_dict(i['request']) for i in interactions]
+        responses = [i['response'] for i in interactions]
+        return requests, responses
+
+    @staticmethod
+    def save_cassette(cassette_path: Union[str, Path], cassette_dict: Dict[str, Any], serializer: Any):
+        if not isinstance(serializer, BlobSerializer):
+            FilesystemPersister.save_cassette(cassette_path, cassette_dict, serializer)
+            return
+        cassette_path = Path(cassette_path)
+        cassette_path.parent.mkdir(parents=True, exist_ok=True)
+        interactions = [
+            {'request': _request_dict(request), 'response': response}
+            for request, response in zip(cassette_dict['requests'], cassette_dict['responses'])
+        ]
+        data = serializer.dumps(interactions, BlobStore(cassette_path.parent / BLOB_DIR))
+        tmp_path = cassette_path.with_name(f'.{cassette_path.name}.tmp')
+        with tmp_path.open('w', encoding='utf-8') as f:
+            f.write(data)
+        os.replace(tmp_path, cassette_path)
+
+
+def _request_dict(request: Request) -> Dict[str, Any]:
+    dict_ = request._to_dict()
+    body = dict_['body']
+    # 文件形式的body每次访问都返回新的BytesIO
+    if hasattr(body, 'getvalue'):
+        dict_['body'] = body.getvalue()
+    elif isinstance(body, list):
+        dict_['body'] = b''.join(body)
+    return dict_
+
+
+def register_blob_cassette(vcr_: Any):
+    """
+    在 vcr.VCR 上注册 blob serializer 和 BlobPersister，使用其他serializer的cassette不受影响
+    """
+    vcr_.register_serializer(BLOB_SERIALIZER, BlobSerializer())
+    vcr_.register_persister(BlobPersister)
+
+
+__all__ = [
+    'BLOB_SERIALIZER',
+    'BLOB_DIR',
+    'BlobStore',
+    'BlobSerializer',
+    'BlobPersister',
+    'register_blob_cassette',
+]
@@ -1,27 +1,120 @@
+import base64
+import hashlib
 import json
-from typing import Optional, Dict, Any, Union
+import re
+from typing import TYPE_CHECKING, Optional, Dict, Any, Union
 from urllib.parse import urlparse, ParseResult
 
-from vcr.cassette import Cassette
-from vcr.request import Request
+if TYPE_CHECKING:
+    import vcr
+    from vcr.cassette import Cassette
+    from vcr.request import Request
 
+# 摘要中保留的body开头的字节数
+DIGEST_PREFIX_SIZE = 32
 
-class RequestBody:
-    def __init__(self, body: Union[bytes]):
-        self.__body = body
+_DIGEST_BODY = re.compile(rb'sufy-body-digest size=(\d+) sha256=([0-9a-f]{64}) prefix=([A-Za-z0-9+/]*={0,2})')
+_MAX_DIGEST_BODY_SIZE = 192
+
+
+def digest_body(body: Union[bytes, memoryview]) -> bytes:
+    """
+    返回记录body大小、sha256和开头若干字节的摘要，录制时代替较大的body
+    """
+    return b'sufy-body-digest size=%d sha256=%s prefix=%s' % (
+        len(body),
+        hashlib.sha256(body).hexdigest().encode('ascii'),
+        base64.b64encode(body[:DIGEST_PREFIX_SIZE]),
+    )
+
+
+class BodyDigestFilter:
+    """
+    vcr 的 before_record_request / before_record_response：超过 threshold 字节的body录制为 digest_body 的摘要。
+    回放时返回的是摘要而不是原始内容，需要回放的cassette不能使用
+    """
+
+    def __init__(self, threshold: int):
+        self.threshold = threshold
+
+    def request(self, request: 'Request') -> 'Request':
+        body = request.body
+        if hasattr(body, 'getvalue'):
+            body = body.getvalue()
+        if body is not None and not isinstance(body, list) and len(body) > self.threshold:
+            request.body = digest_body(body)
+        return request
+
+    def response(self, response: Dict[str, Any]) -> Dict[str, Any]:
+        body = response['body']['string']
+        if body is not None and len(body) > self.threshold:
+            response['body']['string'] = digest_body(body)
+        return response
+
+
+class _Body:
+    def __init__(self, body: Any):
+        if hasattr(body, 'getvalue'):
+            body = body.getvalue()
+        elif isinstance(body, str):
+            body = body.encode('utf-8')
+        elif isinstance(body, list):
+            # 以迭代器发送的body被vcr录制为分块的列表
+            body = b''.join(chunk.encode('utf-8') if isinstance(chunk, str) else bytes(chunk) for chunk in body)
+        self._body = body
+        self._digest = None
+        if isinstance(body, (bytes, bytearray)) and len(body) <= _MAX_DIGEST_BODY_SIZE:
+            self._digest = _DIGEST_BODY.fullmatch(body)
 
     @property
-    def as_json(self) -> Dict[str, Any]:
-        return json.loads(self.as_str)
+    def is_digest(self) -> bool:
+        """
+        录制时是否只保存了body的摘要
+        """
+        return self._digest is not None
+
+    @property
+    def size(self) -> int:
+        if self._digest is not None:
+            return int(self._digest.group(1))
+        return len(self._body)
+
+    @property
+    def digest(self) -> str:
+        """
+        body的sha256，十六进制
+        """
+        if self._digest is not None:
+            return self._digest.group(2).decode('ascii')
+        return hashlib.sha256(self._body).hexdigest()
+
+    @property
+    def prefix(self) -> bytes:
+        """
+        body开头的至多 DIGEST_PREFIX_SIZE 个字节
+        """
+        if self._digest is not None:
+            return base64.b64decode(self._digest.group(3))
+        return bytes(self._body[:DIGEST_PREFIX_SIZE])
 
     @property
     def as_str(self) -> str:
-        return self.__body.decode('utf-8')
+        if self._digest is not None:
+            raise ValueError(f'body was recorded as a digest: {self.size} bytes, sha256 {self.digest}')
+        return str(self._body, 'utf-8')
+
+    @property
+    def as_json(self) -> Dict[str, Any]:
+        return json.loads(self.as_str)
+
+
+class RequestBody(_Body):
+    pass
 
 
 class CassetteRequest:
 
-    def __init__(self, request: Request):
+    def __init__(self, request: 'Request'):
         self.__request = request
 
     @property
@@ -30,7 +123,8 @@ class CassetteRequest:
 
     @property
     def body(self) -> Optional[RequestBody]:
-        return self.__request.body
+        body = self.__request.body
+        return None if body is None else RequestBody(body)
 
     def get_header_value(self, header: str) -> Optional[str]:
         for k, v in self.__request.headers.items():
@@ -47,20 +141,11 @@ class CassetteRequest:
         return urlparse(self.__request.url)
 
 
-class ResponseBody:
+class ResponseBody(_Body):
     def __init__(self, body: Any):
-        self.__body = body
-
-    @property
-    def as_str(self) -> str:
-        try:
-            return self.__body['string'].decode('utf-8')
-        except TypeError:
-            return self.__body.decode('utf-8')
-
-    @property
-    def as_json(self) -> Dict[str, Any]:
-        return json.loads(self.as_str)
+        if isinstance(body, dict):
+            body = body['string']
+        super().__init__(body)
 
 
 class CassetteResponse:
@@ -87,7 +172,7 @@ class CassetteResponse:
 
 
 class CassetteUtils:
-    def __init__(self, cassette: Cassette):
+    def __init__(self, cassette: 'Cassette'):
         self.__cassette = cassette
 
     def request(self, index: int = 0) -> CassetteRequest:
@@ -97,10 +182,33 @@ class CassetteUtils:
         return CassetteResponse(self.__cassette.responses[index])
 
 
+class LazyVCR:
+    """
+    与 vcr.VCR 用法相同，第一次访问时才导入vcr并创建 vcr.VCR，不使用cassette的进程不需要导入vcr。
+    创建时注册 blob serializer，见 util.blob_cassette
+    """
+
+    def __init__(self, **kwargs):
+        self.__kwargs = kwargs
+        self.__vcr: Optional['vcr.VCR'] = None
+
+    def __getattr__(self, name: str) -> Any:
+        if self.__vcr is None:
+            import vcr
+            from util.blob_cassette import register_blob_cassette
+            self.__vcr = vcr.VCR(**self.__kwargs)
+            register_blob_cassette(self.__vcr)
+        return getattr(self.__vcr, name)
+
+
 __all__ = [
+    'LazyVCR',
     'CassetteUtils',
     'CassetteRequest',
     'CassetteResponse',
     'RequestBody',
     'ResponseBody',
+    'BodyDigestFilter',
+    'digest_body',
+    'DIGEST_PREFIX_SIZE',
 ]
@@ -0,0 +1,153 @@
+import base64
+import hashlib
+import zlib
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Union
+
+from util.payload import MemoryViewReader
+
+try:
+    # 可选依赖，没有安装 crc32c 时不计算CRC32C
+    from crc32c import crc32c as _crc32c
+except ImportError:
+    _crc32c = None
+
+ChecksumBody = Union[bytes, bytearray, memoryview, Any]
+
+CHUNK_SIZE = 1024 * 1024
+
+
+def crc32c_available() -> bool:
+    return _crc32c is not None
+
+
+@dataclass(frozen=True)
+class Checksums:
+    size: int
+    md5: bytes
+    # 不计算SHA-256时为None
+    sha256: Optional[bytes]
+    crc32: int
+    crc32c: Optional[int] = None
+
+    @property
+    def content_md5(self) -> str:
+        """
+        Content-MD5 请求头的值
+        """
+        return base64.b64encode(self.md5).decode('ascii')
+
+    @property
+    def md5_hex(self) -> str:
+        return self.md5.hex()
+
+    @property
+    def sha256_hex(self) -> Optional[str]:
+        if self.sha256 is None:
+            return None
+        return self.sha256.hex()
+
+    @property
+    def crc32_base64(self) -> str:
+        return base64.b64encode(self.crc32.to_bytes(4, 'big')).decode('ascii')
+
+    @property
+    def crc32c_base64(self) -> Optional[str]:
+        if self.crc32c is None:
+            return None
+        return base64.b64encode(self.crc32c.to_bytes(4, 'big')).decode('ascii')
+
+    @property
+    def etag(self) -> str:
+        """
+        非分片上传时服务端返回的ETag
+        """
+        return f'"{self.md5_hex}"'
+
+
+class MultiHasher:
+    """
+    一次遍历同时计算MD5、CRC32以及可选的SHA-256和CRC32C。
+    数据按 chunk_size 切块后每块依次喂给所有算法，块仍在CPU缓存中时完成全部计算，
+    而不是对整个缓冲区分别遍历多次
+    """
+
+    def __init__(self, crc32c: bool = True, chunk_size: int = CHUNK_SIZE, sha256: bool = True):
+        self.__md5 = hashlib.md5()
+        self.__sha256 = hashlib.sha256() if sha256 else None
+        self.__crc32 = 0
+        self.__crc32c: Optional[int] = 0 if crc32c and _crc32c is not None else None
+        self.__chunk_size = chunk_size
+        self.__size = 0
+
+    def update(self, data: Union[bytes, bytearray, memoryview]):
+        view = memoryview(data).cast('B')
+        for start in range(0, len(view), self.__chunk_size):
+            chunk = view[start:start + self.__chunk_size]
+            self.__md5.update(chunk)
+            if self.__sha256 is not None:
+                self.__sha256.update(chunk)
+            self.__crc32 = zlib.crc32(chunk, self.__crc32)
+            if self.__crc32c is not None:
+                self.__crc32c = _crc32c(chunk, self.__crc32c)
+        self.__size += len(view)
+
+    def result(self) -> Checksums:
+        return Checksums(
+            size=self.__size,
+            md5=self.__md5.digest(),
+            sha256=self.__sha256.digest() if self.__sha256 is not None else None,
+            crc32=self.__crc32,
+            crc32c=self.__crc32c,
+        )
+
+
+def compute_checksums(body: ChecksumBody, crc32c: bool = True, chunk_size: int = CHUNK_SIZE,
+                      sha256: bool = True) -> Checksums:
+    """
+    计算bytes或文件对象的校验和。文件对象从当前位置读到结尾，
+    使用同一个缓冲区 readinto，结束后 seek 回原来的位置，以便随后作为请求body发送；
+    MemoryViewReader 直接计算底层内存，不经过缓冲区
+    """
+    hasher = MultiHasher(crc32c=crc32c, chunk_size=chunk_size, sha256=sha256)
+    if isinstance(body, (bytes, bytearray, memoryview)):
+        hasher.update(body)
+        return hasher.result()
+    if isinstance(body, MemoryViewReader):
+        with body.remaining() as view:
+            hasher.update(view)
+        return hasher.result()
+    position = body.tell()
+    buffer = bytearray(chunk_size)
+    view = memoryview(buffer)
+    try:
+        while True:
+            n = body.readinto(buffer)
+            if not n:
+                break
+            hasher.update(view[:n])
+    finally:
+        body.seek(position)
+    return hasher.result()
+
+
+def predict_multipart_etag(part_md5s: Iterable[bytes]) -> str:
+    """
+    分片上传完成后的ETag：各分片MD5拼接后再做一次MD5，后缀为分片数
+    """
+    md5 = hashlib.md5()
+    count = 0
+    for digest in part_md5s:
+        md5.update(digest)
+        count += 1
+    return f'"{md5.hexdigest()}-{count}"'
+
+
+__all__ = [
+    'CHUNK_SIZE',
+    'Checksums',
+    'MultiHasher',
+    'compute_checksums',
+    'crc32c_available',
+    'predict_multipart_etag',
+]
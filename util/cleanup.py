@@ -0,0 +1,213 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from botocore.exceptions import ClientError
+
+from util.listing import ShardedLister
+from util.paginate import iter_multipart_uploads, iter_objects_v2, iter_parts
+
+
+@dataclass()
+class CleanupReport:
+    deleted: int
+    failed: int
+    seconds: float
+
+    @property
+    def keys_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.deleted / self.seconds
+
+    def __str__(self) -> str:
+        return f'deleted {self.deleted} keys ({self.failed} failed) in {self.seconds:.3f}s, ' \
+               f'{self.keys_per_second:.0f} keys/s'
+
+
+class BucketCleaner:
+    """
+    并发清空bucket：列举下一页的同时由线程池并发执行批量删除，
+    批量删除返回的部分失败的key会重试
+    """
+
+    def __init__(self, object_service: Any, bucket: str, prefix: str = '', workers: int = 8,
+                 batch_size: int = 1000, max_pending: Optional[int] = None, max_retries: int = 3,
+                 retry_backoff: float = 0.2, list_workers: int = 1):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__prefix = prefix
+        self.__workers = workers
+        self.__batch_size = batch_size
+        self.__max_retries = max_retries
+        self.__retry_backoff = retry_backoff
+        # 大于1时按目录拆分后并发列举
+        self.__list_workers = list_workers
+        # 限制已列举但尚未删除完成的批次数，避免列举速度远超删除速度时占用过多内存
+        self.__pending = threading.BoundedSemaphore(max_pending or workers * 2)
+        self.__lock = threading.Lock()
+        self.__deleted = 0
+        self.__failed = 0
+
+    def run(self) -> CleanupReport:
+        start = time.perf_counter()
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='bucket-cleaner') as executor:
+            try:
+                for batch in self.__list_batches():
+                    self.__pending.acquire()
+                    future = executor.submit(self.__delete_batch, batch)
+                    future.add_done_callback(lambda _: self.__pending.release())
+                    futures.append(future)
+            finally:
+                for future in futures:
+                    future.result()
+        return CleanupReport(
+            deleted=self.__deleted,
+            failed=self.__failed,
+            seconds=time.perf_counter() - start,
+        )
+
+    def __list_batches(self):
+        batch: List[str] = []
+        for key in self.__list_keys():
+            batch.append(key)
+            if len(batch) >= self.__batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def __list_keys(self) -> Iterator[str]:
+        if self.__list_workers > 1:
+            yield from ShardedLister(
+                self.__object_service,
+                self.__bucket,
+                prefix=self.__prefix,
+                workers=self.__list_workers,
+            ).iter_keys()
+            return
+        # 分页器在后台预取下一页，列举与组装删除批次重叠进行
+        for item in iter_objects_v2(self.__object_service, Bucket=self.__bucket, Prefix=self.__prefix):
+            yield item['Key']
+
+    def __delete_batch(self, keys: List[str]):
+        attempt = 0
+        while True:
+            resp = self.__object_service.delete_objects(
+                Bucket=self.__bucket,
+                Delete={
+                    'Objects': [{'Key': key} for key in keys],
+                    'Quiet': True,
+                },
+            )
+            # Quiet模式下只返回删除失败的key
+            failed_keys = [item['Key'] for item in resp.get('Errors', [])]
+            with self.__lock:
+                self.__deleted += len(keys) - len(failed_keys)
+            if not failed_keys:
+                return
+            attempt += 1
+            if attempt > self.__max_retries:
+                with self.__lock:
+                    self.__failed += len(failed_keys)
+                return
+            time.sleep(self.__retry_backoff * (2 ** (attempt - 1)))
+            keys = failed_keys
+
+
+@dataclass()
+class SweepReport:
+    aborted: int
+    failed: int
+    # 被中止的上传中已上传分片的总大小
+    bytes: int
+    seconds: float
+
+    def __str__(self) -> str:
+        return f'aborted {self.aborted} multipart uploads ({self.failed} failed), ' \
+               f'reclaimed {self.bytes} bytes in {self.seconds:.3f}s'
+
+
+class MultipartUploadSweeper:
+    """
+    分页列举未完成的分片上传，并发中止发起时间早于 older_than 的上传，
+    较新的上传可能属于正在运行的测试，不会被中止。
+    count_bytes 为真时中止前先用 list_parts 统计已上传分片的大小；
+    now 返回计算截止时间用的当前时间，回放cassette时应固定为录制时的时间
+    """
+
+    def __init__(self, object_service: Any, bucket: str, prefix: str = '',
+                 older_than: timedelta = timedelta(hours=1), workers: int = 8, count_bytes: bool = True,
+                 max_pending: Optional[int] = None, now: Optional[Callable[[], datetime]] = None):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__prefix = prefix
+        self.__older_than = older_than
+        self.__workers = workers
+        self.__count_bytes = count_bytes
+        self.__now = now or (lambda: datetime.now(timezone.utc))
+        self.__pending = threading.BoundedSemaphore(max_pending or workers * 4)
+        self.__lock = threading.Lock()
+        self.__aborted = 0
+        self.__failed = 0
+        self.__bytes = 0
+
+    def run(self) -> SweepReport:
+        start = time.perf_counter()
+        now = self.__now()
+        if now.tzinfo is None:
+            now = now.replace(tzinfo=timezone.utc)
+        cutoff = now - self.__older_than
+        futures: List[Future] = []
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='upload-sweeper') as executor:
+            try:
+                for upload in iter_multipart_uploads(self.__object_service, Bucket=self.__bucket,
+                                                     Prefix=self.__prefix):
+                    initiated: datetime = upload['Initiated']
+                    if initiated.tzinfo is None:
+                        initiated = initiated.replace(tzinfo=timezone.utc)
+                    if initiated >= cutoff:
+                        continue
+                    self.__pending.acquire()
+                    future = executor.submit(self.__abort, upload)
+                    future.add_done_callback(lambda _: self.__pending.release())
+                    futures.append(future)
+            finally:
+                for future in futures:
+                    future.result()
+        return SweepReport(
+            aborted=self.__aborted,
+            failed=self.__failed,
+            bytes=self.__bytes,
+            seconds=time.perf_counter() - start,
+        )
+
+    def __abort(self, upload: Dict[str, Any]):
+        kwargs = {'Bucket': self.__bucket, 'Key': upload['Key'], 'UploadId': upload['UploadId']}
+        try:
+            size = 0
+            if self.__count_bytes:
+                size = sum(part['Size'] for part in iter_parts(self.__object_service, **kwargs))
+            self.__object_service.abort_multipart_upload(**kwargs)
+        except ClientError as e:
+            # 上传已经被其他进程完成或中止
+            if e.response['Error']['Code'] in ('NoSuchUpload', '404'):
+                return
+            with self.__lock:
+                self.__failed += 1
+            return
+        with self.__lock:
+            self.__aborted += 1
+            self.__bytes += size
+
+
+__all__ = [
+    'BucketCleaner',
+    'CleanupReport',
+    'MultipartUploadSweeper',
+    'SweepReport',
+]
@@ -0,0 +1,140 @@
+import mmap
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+MiB = 1024 * 1024
+
+_CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+|\*)$')
+
+Buffer = Union[bytearray, mmap.mmap]
+
+
+@dataclass()
+class DownloadResult:
+    size: int
+    etag: str
+    # 按分片下载时为分片数，否则为字节区间数
+    ranges: int
+    by_part_number: bool
+    seconds: float
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / self.seconds
+
+
+def parse_content_range(content_range: str) -> Tuple[int, int]:
+    match = _CONTENT_RANGE.match(content_range.strip())
+    if match is None:
+        raise ValueError(f'unexpected Content-Range: {content_range}')
+    return int(match.group(1)), int(match.group(2))
+
+
+def parts_count_from_etag(etag: str) -> int:
+    """
+    分片上传合成的文件ETag形如 "<md5>-<分片数>"
+    """
+    _, sep, count = etag.strip('"').rpartition('-')
+    return int(count) if sep and count.isdigit() else 1
+
+
+class RangedDownloader:
+    """
+    先通过 head_object 获取文件大小，再把文件拆分为多个区间并发下载到预分配的内存或内存映射文件中。
+    分片上传合成的文件按照PartNumber下载，使每个请求与服务端的分片边界对齐
+    """
+
+    def __init__(self, object_service: Any, bucket: str, key: str, workers: int = 8, range_size: int = 8 * MiB,
+                 use_part_numbers: bool = True, chunk_size: int = MiB):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__key = key
+        self.__workers = workers
+        self.__range_size = range_size
+        self.__use_part_numbers = use_part_numbers
+        self.__chunk_size = chunk_size
+
+    def download(self) -> Tuple[bytearray, DownloadResult]:
+        head = self.__head()
+        buffer = bytearray(head['ContentLength'])
+        return buffer, self.__download_into(head, buffer)
+
+    def download_to_file(self, path: str) -> DownloadResult:
+        head = self.__head()
+        size = head['ContentLength']
+        with open(path, 'w+b') as f:
+            f.truncate(size)
+            if size == 0:
+                return DownloadResult(size=0, etag=head['ETag'], ranges=0, by_part_number=False, seconds=0.0)
+            with mmap.mmap(f.fileno(), size) as buffer:
+                result = self.__download_into(head, buffer)
+                buffer.flush()
+        return result
+
+    def __head(self) -> Dict[str, Any]:
+        return self.__object_service.head_object(Bucket=self.__bucket, Key=self.__key)
+
+    def __download_into(self, head: Dict[str, Any], buffer: Buffer) -> DownloadResult:
+        size = head['ContentLength']
+        etag = head['ETag']
+        parts_count = parts_count_from_etag(etag)
+        by_part_number = self.__use_part_numbers and parts_count > 1
+        requests: List[Dict[str, Any]]
+        if by_part_number:
+            requests = [{'PartNumber': n} for n in range(1, parts_count + 1)]
+        else:
+            requests = [
+                {'Range': f'bytes={start}-{min(start + self.__range_size, size) - 1}'}
+                for start in range(0, size, self.__range_size)
+            ]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='ranged-download') as executor:
+            # 任意区间失败时 result() 抛出异常
+            list(executor.map(lambda kwargs: self.__fetch(buffer, etag, kwargs), requests))
+        return DownloadResult(
+            size=size,
+            etag=etag,
+            ranges=len(requests),
+            by_part_number=by_part_number,
+            seconds=time.perf_counter() - start,
+        )
+
+    def __fetch(self, buffer: Buffer, etag: str, kwargs: Dict[str, Any]):
+        resp = self.__object_service.get_object(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            IfMatch=etag,
+            **kwargs,
+        )
+        content_range: Optional[str] = resp.get('ContentRange')
+        if not content_range and 'PartNumber' in kwargs:
+            # 没有 Content-Range 时无法确定分片在文件中的偏移，不能按0写入覆盖文件开头
+            resp['Body'].close()
+            raise IOError(f'part {kwargs["PartNumber"]} of {self.__key} was returned without Content-Range')
+        offset = parse_content_range(content_range)[0] if content_range else 0
+        end = offset + resp['ContentLength']
+        body = resp['Body']
+        view = memoryview(buffer)
+        try:
+            while offset < end:
+                chunk = body.read(min(self.__chunk_size, end - offset))
+                if not chunk:
+                    raise IOError(f'unexpected end of body at offset {offset}, expected {end}')
+                view[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+        finally:
+            view.release()
+            body.close()
+
+
+__all__ = [
+    'RangedDownloader',
+    'DownloadResult',
+    'parse_content_range',
+    'parts_count_from_etag',
+]
@@ -0,0 +1,160 @@
+import heapq
+import itertools
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# 分片列举线程结束时放入队列的标记
+_DONE = object()
+
+
+@dataclass()
+class _Level:
+    prefix: str
+    objects: List[Dict[str, Any]] = field(default_factory=list)
+    common_prefixes: List[str] = field(default_factory=list)
+    # 该前缀下的直接文件太多，不再按目录拆分，整个前缀作为一个分片
+    flat: bool = False
+
+
+def _object_key(item: Dict[str, Any]) -> str:
+    return item['Key']
+
+
+class ShardedLister:
+    """
+    按目录拆分keyspace后并发列举：先用 Delimiter 逐层发现 CommonPrefixes，
+    每个目录作为一个分片独立分页列举，最后归并为一个按key排序的结果流。
+
+    发现阶段最多下降 max_depth 层，分片数达到 min_shards 后停止下降；
+    某一层的直接文件超过 max_discovery_pages 页时该前缀不再拆分，避免在发现阶段顺序列举大量文件
+    """
+
+    def __init__(self, object_service: Any, bucket: str, prefix: str = '', delimiter: str = '/',
+                 workers: int = 8, max_depth: int = 2, min_shards: Optional[int] = None,
+                 max_discovery_pages: int = 4, page_size: int = 1000, queue_pages: int = 4):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__prefix = prefix
+        self.__delimiter = delimiter
+        self.__workers = workers
+        self.__max_depth = max_depth
+        self.__min_shards = min_shards or workers * 2
+        self.__max_discovery_pages = max_discovery_pages
+        self.__page_size = page_size
+        self.__queue_pages = queue_pages
+
+    def iter_objects(self) -> Iterator[Dict[str, Any]]:
+        """
+        按key排序返回前缀下的所有文件，元素是 list_objects_v2 返回的 Contents 中的条目
+        """
+        stop = threading.Event()
+        executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='sharded-lister')
+        queues: List[queue.Queue] = []
+        try:
+            objects, shards = self.__discover(executor)
+            # 分片按前缀排序且互不包含，依次拼接即有序；线程池先进先出，正在消费的分片一定已经开始列举
+            streams = []
+            for shard in shards:
+                q: queue.Queue = queue.Queue(maxsize=self.__queue_pages)
+                queues.append(q)
+                future = executor.submit(self.__list_shard, shard, q, stop)
+                streams.append(self.__drain(q, future))
+            yield from heapq.merge(objects, itertools.chain.from_iterable(streams), key=_object_key)
+        finally:
+            stop.set()
+            for q in queues:
+                # 唤醒阻塞在 put 上的列举线程
+                while not q.empty():
+                    q.get_nowait()
+            executor.shutdown(wait=True)
+
+    def iter_keys(self) -> Iterator[str]:
+        return (item['Key'] for item in self.iter_objects())
+
+    def shards(self) -> Tuple[int, List[str]]:
+        """
+        返回发现阶段得到的直接文件数与分片前缀，用于观察keyspace的拆分情况
+        """
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='sharded-lister') as executor:
+            objects, shards = self.__discover(executor)
+        return len(objects), shards
+
+    def __discover(self, executor: ThreadPoolExecutor) -> Tuple[List[Dict[str, Any]], List[str]]:
+        objects: List[Dict[str, Any]] = []
+        shards: List[str] = []
+        frontier = [self.__prefix]
+        for _ in range(self.__max_depth):
+            if not frontier or len(frontier) >= self.__min_shards:
+                break
+            next_frontier: List[str] = []
+            for level in executor.map(self.__list_level, frontier):
+                if level.flat:
+                    shards.append(level.prefix)
+                    continue
+                objects.extend(level.objects)
+                next_frontier.extend(level.common_prefixes)
+            frontier = next_frontier
+        shards.extend(frontier)
+        objects.sort(key=_object_key)
+        shards.sort()
+        return objects, shards
+
+    def __list_level(self, prefix: str) -> _Level:
+        level = _Level(prefix=prefix)
+        kwargs: Dict[str, Any] = {
+            'Bucket': self.__bucket,
+            'Prefix': prefix,
+            'Delimiter': self.__delimiter,
+            'MaxKeys': self.__page_size,
+        }
+        for _ in range(self.__max_discovery_pages):
+            resp = self.__object_service.list_objects_v2(**kwargs)
+            level.objects.extend(resp.get('Contents', []))
+            level.common_prefixes.extend(p['Prefix'] for p in resp.get('CommonPrefixes', []))
+            if not resp['IsTruncated']:
+                return level
+            kwargs['ContinuationToken'] = resp['NextContinuationToken']
+        return _Level(prefix=prefix, flat=True)
+
+    def __list_shard(self, prefix: str, q: queue.Queue, stop: threading.Event):
+        try:
+            kwargs: Dict[str, Any] = {
+                'Bucket': self.__bucket,
+                'Prefix': prefix,
+                'MaxKeys': self.__page_size,
+            }
+            while not stop.is_set():
+                resp = self.__object_service.list_objects_v2(**kwargs)
+                self.__put(q, resp.get('Contents', []), stop)
+                if not resp['IsTruncated']:
+                    break
+                kwargs['ContinuationToken'] = resp['NextContinuationToken']
+        finally:
+            self.__put(q, _DONE, stop)
+
+    @staticmethod
+    def __put(q: queue.Queue, item: Any, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                q.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    @staticmethod
+    def __drain(q: queue.Queue, future: Future) -> Iterator[Dict[str, Any]]:
+        while True:
+            page = q.get()
+            if page is _DONE:
+                # 列举失败时在这里抛出异常
+                future.result()
+                return
+            yield from page
+
+
+__all__ = [
+    'ShardedLister',
+]
@@ -0,0 +1,908 @@
+import base64
+import bisect
+import hashlib
+import json
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional, Dict, Any, Iterable, List, Tuple, Union
+from urllib.parse import urlparse, parse_qs, unquote
+
+DEFAULT_REGION = 'local'
+
+# key按UTF-8编码后的最大长度
+MAX_KEY_LENGTH = 1024
+
+
+class ServiceError(Exception):
+    def __init__(self, status: int, code: str, message: str = ''):
+        super().__init__(message or code)
+        self.status = status
+        self.code = code
+        self.message = message or code
+
+
+@dataclass()
+class StoredPart:
+    data: bytes
+    md5: bytes
+    last_modified: float
+
+    @property
+    def etag(self) -> str:
+        return _quote_etag(self.md5.hex())
+
+
+@dataclass()
+class StoredObject:
+    data: bytes
+    etag: str
+    content_type: str
+    metadata: Dict[str, str]
+    storage_class: str
+    last_modified: float
+    # 分片上传合成的文件记录每个分片的大小，用于按PartNumber读取
+    part_sizes: List[int] = field(default_factory=list)
+
+
+@dataclass()
+class MultipartUpload:
+    key: str
+    upload_id: str
+    content_type: str
+    metadata: Dict[str, str]
+    storage_class: str
+    initiated: float
+    parts: Dict[int, StoredPart] = field(default_factory=dict)
+
+
+@dataclass()
+class StoredBucket:
+    name: str
+    region: str
+    created: float
+    objects: Dict[str, StoredObject] = field(default_factory=dict)
+    sorted_keys: List[str] = field(default_factory=list)
+    uploads: Dict[str, MultipartUpload] = field(default_factory=dict)
+    cors: Optional[Dict[str, Any]] = None
+    policy: Optional[bytes] = None
+    lifecycle: Optional[Dict[str, Any]] = None
+    tagging: Optional[Dict[str, Any]] = None
+
+    def put(self, key: str, obj: StoredObject):
+        if key not in self.objects:
+            bisect.insort(self.sorted_keys, key)
+        self.objects[key] = obj
+
+    def remove(self, key: str) -> bool:
+        if self.objects.pop(key, None) is None:
+            return False
+        index = bisect.bisect_left(self.sorted_keys, key)
+        del self.sorted_keys[index]
+        return True
+
+
+class ObjectStore:
+    """
+    内存中的对象存储，读写状态时持有同一把锁；计算摘要、拼接分片等耗时的操作在锁外进行
+    """
+
+    def __init__(self, region: str = DEFAULT_REGION):
+        self.region = region
+        self.lock = threading.RLock()
+        self.buckets: Dict[str, StoredBucket] = {}
+        # (bucket, key) -> [错误码, 剩余次数]
+        self.delete_errors: Dict[Tuple[str, str], List[Any]] = {}
+
+    def bucket(self, name: str) -> StoredBucket:
+        try:
+            return self.buckets[name]
+        except KeyError:
+            raise ServiceError(404, 'NoSuchBucket', f'The specified bucket does not exist: {name}')
+
+    def inject_delete_errors(self, bucket: str, keys: Iterable[str], code: str = 'InternalError', times: int = 1):
+        """
+        之后 times 次批量删除这些key时不删除，在Errors中返回 code，用于测试部分失败时的重试
+        """
+        with self.lock:
+            for key in keys:
+                self.delete_errors[(bucket, key)] = [code, times]
+
+    def take_delete_error(self, bucket: str, key: str) -> Optional[str]:
+        with self.lock:
+            error = self.delete_errors.get((bucket, key))
+            if error is None:
+                return None
+            error[1] -= 1
+            if error[1] <= 0:
+                del self.delete_errors[(bucket, key)]
+            return error[0]
+
+
+def _quote_etag(digest: str) -> str:
+    return f'"{digest}"'
+
+
+def _strip_etag(etag: str) -> str:
+    return etag.strip().strip('"')
+
+
+def _iso8601(ts: float) -> str:
+    return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(ts)) + '.%03dZ' % (int(ts * 1000) % 1000)
+
+
+def _rfc822(ts: float) -> str:
+    return formatdate(ts, usegmt=True)
+
+
+def _first(query: Dict[str, List[str]], name: str, default: Optional[str] = None) -> Optional[str]:
+    values = query.get(name)
+    if not values:
+        return default
+    return values[0]
+
+
+@dataclass()
+class Response:
+    status: int
+    body: Union[bytes, memoryview] = b''
+    headers: Dict[str, str] = field(default_factory=dict)
+    content_type: Optional[str] = None
+
+
+def _json(status: int, document: Dict[str, Any]) -> Response:
+    return Response(status, json.dumps(document).encode('utf-8'), content_type='application/json')
+
+
+def _error(error: ServiceError, method: str) -> Response:
+    if method == 'HEAD':
+        return Response(error.status)
+    return _json(error.status, {'code': error.code, 'message': error.message})
+
+
+def _check_key(key: str):
+    if len(key.encode('utf-8')) > MAX_KEY_LENGTH:
+        raise ServiceError(400, 'KeyTooLongError', 'Your key is too long')
+
+
+@dataclass()
+class Deferred:
+    """
+    路由返回 Deferred 时先在锁外执行 compute，再重新加锁用其结果执行 commit 修改状态并生成响应
+    """
+    compute: Callable[[], Any]
+    commit: Callable[[Any], Response]
+
+
+def _list_entries(bucket: StoredBucket, prefix: str, delimiter: str, marker: str,
+                  max_keys: int) -> Tuple[List[StoredObject], List[str], List[str], bool]:
+    """
+    按照字典序列举文件，公共前缀与文件一起计入max_keys
+    返回 (文件名列表对应的文件, 文件名列表, 公共前缀列表, 是否截断)
+    """
+    keys: List[str] = []
+    common_prefixes: List[str] = []
+    start = max(marker, prefix) if marker else prefix
+    index = bisect.bisect_left(bucket.sorted_keys, start)
+    last_prefix = marker if delimiter and marker.endswith(delimiter) else None
+    truncated = False
+    while index < len(bucket.sorted_keys):
+        key = bucket.sorted_keys[index]
+        index += 1
+        if not key.startswith(prefix):
+            break
+        if marker and key <= marker:
+            continue
+        if delimiter:
+            pos = key.find(delimiter, len(prefix))
+            if pos >= 0:
+                common_prefix = key[:pos + len(delimiter)]
+                if common_prefix == last_prefix:
+                    continue
+                if len(keys) + len(common_prefixes) >= max_keys:
+                    truncated = True
+                    break
+                common_prefixes.append(common_prefix)
+                last_prefix = common_prefix
+                continue
+        if len(keys) + len(common_prefixes) >= max_keys:
+            truncated = True
+            break
+        keys.append(key)
+    return [bucket.objects[k] for k in keys], keys, common_prefixes, truncated
+
+
+class ObjectRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # 响应头与响应体分两次写出，不关闭Nagle时小文件的GET会被延迟确认拖慢约40ms
+    disable_nagle_algorithm = True
+    server: 'ObjectHTTPServer'
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+    # ---------- 请求解析 ----------
+
+    def _read_body(self) -> bytes:
+        if self.headers.get('Transfer-Encoding', '').lower() == 'chunked':
+            chunks = []
+            while True:
+                size = int(self.rfile.readline().split(b';', 1)[0].strip(), 16)
+                if size == 0:
+                    # 丢弃trailer
+                    while self.rfile.readline() not in (b'\r\n', b'\n', b''):
+                        pass
+                    break
+                chunks.append(self.rfile.read(size))
+                self.rfile.readline()
+            return b''.join(chunks)
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length > 0 else b''
+
+    def _parse_target(self) -> Tuple[Optional[str], Optional[str], Dict[str, List[str]]]:
+        url = urlparse(self.path)
+        query = parse_qs(url.query, keep_blank_values=True)
+        path = unquote(url.path)
+        host = (self.headers.get('Host') or '').split(':', 1)[0]
+        server_host = self.server.server_name_for_vhost
+        if server_host and host.endswith('.' + server_host):
+            # 虚拟主机风格：bucket.host/key
+            return host[:-len(server_host) - 1], path.lstrip('/') or None, query
+        parts = path.lstrip('/').split('/', 1)
+        bucket = parts[0] or None
+        key = parts[1] if len(parts) > 1 and parts[1] != '' else None
+        return bucket, key, query
+
+    def _metadata(self) -> Dict[str, str]:
+        return {
+            k.lower()[len('x-sufy-meta-'):]: v
+            for k, v in self.headers.items()
+            if k.lower().startswith('x-sufy-meta-')
+        }
+
+    def _json_body(self, body: bytes) -> Dict[str, Any]:
+        if not body:
+            return {}
+        try:
+            return json.loads(body.decode('utf-8'))
+        except ValueError:
+            raise ServiceError(400, 'MalformedJSON', 'The JSON you provided was not well-formed')
+
+    def _check_content_md5(self):
+        content_md5 = self.headers.get('Content-MD5')
+        if content_md5 is None:
+            return
+        if base64.b64encode(self.body_md5).decode('ascii') != content_md5.strip():
+            raise ServiceError(400, 'BadDigest', 'The Content-MD5 you specified did not match what was received')
+
+    # ---------- 响应 ----------
+
+    def _send(self, response: Response):
+        request_id = uuid.uuid4().hex
+        self.send_response(response.status)
+        self.send_header('x-sufy-request-id', request_id)
+        self.send_header('X-Reqid', request_id)
+        if response.content_type is not None:
+            self.send_header('Content-Type', response.content_type)
+        for k, v in response.headers.items():
+            self.send_header(k, v)
+        self.send_header('Content-Length', str(len(response.body)))
+        self.end_headers()
+        if response.body and self.command != 'HEAD':
+            self.wfile.write(response.body)
+
+    def _dispatch(self):
+        try:
+            body = self._read_body()
+            # 请求体的MD5在锁外计算，校验Content-MD5和生成ETag共用
+            self.body_md5 = hashlib.md5(body).digest()
+            bucket, key, query = self._parse_target()
+            response = self.server.dispatch(self, self.command, bucket, key, query, body)
+        except ServiceError as e:
+            response = _error(e, self.command)
+        except Exception as e:  # noqa
+            response = _error(ServiceError(500, 'InternalError', repr(e)), self.command)
+        self._send(response)
+
+    do_GET = _dispatch
+    do_PUT = _dispatch
+    do_POST = _dispatch
+    do_HEAD = _dispatch
+    do_DELETE = _dispatch
+
+
+class ObjectHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    # 默认的监听队列只有5，高并发建立连接时会被重置
+    request_queue_size = 1024
+
+    def __init__(self, address: Tuple[str, int], store: ObjectStore):
+        super().__init__(address, ObjectRequestHandler)
+        self.store = store
+        self.server_name_for_vhost = address[0] if not address[0].replace('.', '').isdigit() else ''
+
+    # ---------- 路由 ----------
+
+    def dispatch(self, h: ObjectRequestHandler, method: str, bucket: Optional[str], key: Optional[str],
+                 query: Dict[str, List[str]], body: bytes) -> Response:
+        # 只在读写状态时持有锁，写回响应时不持有锁
+        with self.store.lock:
+            result = self.route(h, method, bucket, key, query, body)
+        if isinstance(result, Deferred):
+            value = result.compute()
+            with self.store.lock:
+                result = result.commit(value)
+        return result
+
+    def route(self, h: ObjectRequestHandler, method: str, bucket: Optional[str], key: Optional[str],
+              query: Dict[str, List[str]], body: bytes) -> Union[Response, Deferred]:
+        if bucket is None:
+            if method == 'GET':
+                return self.list_buckets(h)
+            raise ServiceError(405, 'MethodNotAllowed')
+        if key is None:
+            return self.dispatch_bucket(h, method, bucket, query, body)
+        return self.dispatch_object(h, method, bucket, key, query, body)
+
+    def dispatch_bucket(self, h: ObjectRequestHandler, method: str, name: str, query: Dict[str, List[str]],
+                        body: bytes):
+        if 'acl' in query:
+            self.store.bucket(name)
+            raise ServiceError(501, 'NotImplemented', 'A header you provided implies functionality that is not implemented')
+        for sub in ('cors', 'policy', 'lifecycle', 'tagging'):
+            if sub in query:
+                return getattr(self, f'bucket_{sub}')(h, method, self.store.bucket(name), body)
+        if method == 'PUT':
+            return self.create_bucket(h, name, body)
+        if method == 'HEAD':
+            bucket = self.store.bucket(name)
+            return Response(200, headers={'X-Sufy-Bucket-Region': bucket.region})
+        if method == 'DELETE':
+            return self.delete_bucket(h, name)
+        if method == 'POST' and 'delete' in query:
+            h._check_content_md5()
+            return self.delete_objects(h, self.store.bucket(name), h._json_body(body))
+        if method == 'GET':
+            bucket = self.store.bucket(name)
+            if 'location' in query:
+                return _json(200, {'LocationConstraint': bucket.region})
+            if 'uploads' in query:
+                return self.list_multipart_uploads(h, bucket, query)
+            if _first(query, 'list-type') == '2':
+                return self.list_objects_v2(h, bucket, query)
+            return self.list_objects(h, bucket, query)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    def dispatch_object(self, h: ObjectRequestHandler, method: str, bucket_name: str, key: str,
+                        query: Dict[str, List[str]], body: bytes):
+        bucket = self.store.bucket(bucket_name)
+        _check_key(key)
+        if 'acl' in query:
+            raise ServiceError(501, 'NotImplemented', 'A header you provided implies functionality that is not implemented')
+        upload_id = _first(query, 'uploadId')
+        if method == 'POST' and 'uploads' in query:
+            return self.create_multipart_upload(h, bucket, key)
+        if upload_id is not None:
+            upload = bucket.uploads.get(upload_id)
+            if upload is None or upload.key != key:
+                raise ServiceError(404, 'NoSuchUpload', 'The specified multipart upload does not exist')
+            if method == 'PUT':
+                return self.upload_part(h, bucket, upload, int(_first(query, 'partNumber', '0')), body)
+            if method == 'POST':
+                return self.complete_multipart_upload(h, bucket, upload, h._json_body(body))
+            if method == 'DELETE':
+                del bucket.uploads[upload_id]
+                return Response(204)
+            if method == 'GET':
+                return self.list_parts(h, bucket, upload, query)
+        if method == 'POST' and 'restore' in query:
+            self.get_stored_object(bucket, key)
+            return Response(202)
+        if method == 'PUT':
+            if h.headers.get('x-sufy-copy-source'):
+                return self.copy_object(h, bucket, key)
+            return self.put_object(h, bucket, key, body)
+        if method in ('GET', 'HEAD'):
+            return self.get_object(h, bucket, key, query)
+        if method == 'DELETE':
+            bucket.remove(key)
+            return Response(204)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    # ---------- 服务级别 ----------
+
+    def list_buckets(self, h: ObjectRequestHandler):
+        return _json(200, {
+            'Buckets': [
+                {
+                    'Name': b.name,
+                    'CreationDate': _iso8601(b.created),
+                    'LocationConstraint': b.region,
+                }
+                for b in sorted(self.store.buckets.values(), key=lambda x: x.name)
+            ],
+            'Owner': {'ID': 'local', 'DisplayName': 'local'},
+        })
+
+    # ---------- bucket级别 ----------
+
+    def create_bucket(self, h: ObjectRequestHandler, name: str, body: bytes):
+        if name in self.store.buckets:
+            raise ServiceError(409, 'BucketAlreadyOwnedByYou', 'Your previous request to create the named bucket succeeded')
+        region = h._json_body(body).get('LocationConstraint') or self.store.region
+        self.store.buckets[name] = StoredBucket(name=name, region=region, created=time.time())
+        return Response(200, headers={'Location': '/' + name})
+
+    def delete_bucket(self, h: ObjectRequestHandler, name: str):
+        bucket = self.store.bucket(name)
+        if bucket.objects:
+            raise ServiceError(409, 'BucketNotEmpty', 'The bucket you tried to delete is not empty')
+        del self.store.buckets[name]
+        return Response(204)
+
+    def bucket_cors(self, h: ObjectRequestHandler, method: str, bucket: StoredBucket, body: bytes):
+        if method == 'PUT':
+            h._check_content_md5()
+            bucket.cors = h._json_body(body)
+            return Response(200)
+        if method == 'GET':
+            if bucket.cors is None:
+                raise ServiceError(404, 'NoSuchCORSConfiguration', 'The CORS configuration does not exist')
+            return _json(200, bucket.cors)
+        if method == 'DELETE':
+            bucket.cors = None
+            return Response(204)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    def bucket_policy(self, h: ObjectRequestHandler, method: str, bucket: StoredBucket, body: bytes):
+        if method == 'PUT':
+            h._json_body(body)
+            bucket.policy = body
+            return Response(204)
+        if method == 'GET':
+            if bucket.policy is None:
+                raise ServiceError(404, 'NoSuchBucketPolicy', 'The bucket policy does not exist')
+            return Response(200, bucket.policy, content_type='application/json')
+        if method == 'DELETE':
+            bucket.policy = None
+            return Response(204)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    def bucket_lifecycle(self, h: ObjectRequestHandler, method: str, bucket: StoredBucket, body: bytes):
+        if method == 'PUT':
+            h._check_content_md5()
+            bucket.lifecycle = h._json_body(body)
+            return Response(200)
+        if method == 'GET':
+            if bucket.lifecycle is None:
+                raise ServiceError(404, 'NoSuchLifecycleConfiguration', 'The lifecycle configuration does not exist')
+            # 与线上服务保持一致：暂不返回规则的Status属性
+            rules = [{k: v for k, v in rule.items() if k != 'Status'} for rule in bucket.lifecycle.get('Rules', [])]
+            return _json(200, {'Rules': rules})
+        if method == 'DELETE':
+            bucket.lifecycle = None
+            return Response(204)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    def bucket_tagging(self, h: ObjectRequestHandler, method: str, bucket: StoredBucket, body: bytes):
+        if method == 'PUT':
+            h._check_content_md5()
+            bucket.tagging = h._json_body(body)
+            return Response(204)
+        if method == 'GET':
+            if bucket.tagging is None:
+                raise ServiceError(404, 'NoSuchTagSet', 'The TagSet does not exist')
+            return _json(200, bucket.tagging)
+        if method == 'DELETE':
+            bucket.tagging = None
+            return Response(204)
+        raise ServiceError(405, 'MethodNotAllowed')
+
+    def delete_objects(self, h: ObjectRequestHandler, bucket: StoredBucket, document: Dict[str, Any]):
+        objects = document.get('Objects', document.get('Object', []))
+        deleted = []
+        errors = []
+        for item in objects:
+            key = item['Key']
+            try:
+                _check_key(key)
+                code = self.store.take_delete_error(bucket.name, key)
+                if code is not None:
+                    raise ServiceError(500, code, 'We encountered an internal error. Please try again.')
+            except ServiceError as e:
+                errors.append({'Key': key, 'Code': e.code, 'Message': e.message})
+                continue
+            bucket.remove(key)
+            deleted.append({'Key': key})
+        result: Dict[str, Any] = {'Errors': errors}
+        if not document.get('Quiet'):
+            result['Deleted'] = deleted
+        return _json(200, result)
+
+    def _content_entry(self, key: str, obj: StoredObject) -> Dict[str, Any]:
+        return {
+            'Key': key,
+            'LastModified': _iso8601(obj.last_modified),
+            'ETag': obj.etag,
+            'Size': len(obj.data),
+            'StorageClass': obj.storage_class,
+        }
+
+    def list_objects(self, h: ObjectRequestHandler, bucket: StoredBucket, query: Dict[str, List[str]]):
+        prefix = _first(query, 'prefix', '')
+        delimiter = _first(query, 'delimiter', '')
+        marker = _first(query, 'marker', '')
+        max_keys = int(_first(query, 'max-keys', '1000'))
+        objects, keys, common_prefixes, truncated = _list_entries(bucket, prefix, delimiter, marker, max_keys)
+        result: Dict[str, Any] = {
+            'Name': bucket.name,
+            'Prefix': prefix,
+            'Marker': marker,
+            'MaxKeys': max_keys,
+            'IsTruncated': truncated,
+            'Contents': [self._content_entry(k, o) for k, o in zip(keys, objects)],
+        }
+        if delimiter:
+            result['Delimiter'] = delimiter
+            result['CommonPrefixes'] = [{'Prefix': p} for p in common_prefixes]
+        if truncated:
+            result['NextMarker'] = max(keys[-1:] + common_prefixes[-1:])
+        return _json(200, result)
+
+    def list_objects_v2(self, h: ObjectRequestHandler, bucket: StoredBucket, query: Dict[str, List[str]]):
+        prefix = _first(query, 'prefix', '')
+        delimiter = _first(query, 'delimiter', '')
+        token = _first(query, 'continuation-token', '')
+        start_after = _first(query, 'start-after', '')
+        max_keys = int(_first(query, 'max-keys', '1000'))
+        marker = base64.urlsafe_b64decode(token.encode('ascii')).decode('utf-8') if token else start_after
+        objects, keys, common_prefixes, truncated = _list_entries(bucket, prefix, delimiter, marker, max_keys)
+        result: Dict[str, Any] = {
+            'Name': bucket.name,
+            'Prefix': prefix,
+            'MaxKeys': max_keys,
+            'KeyCount': len(keys) + len(common_prefixes),
+            'IsTruncated': truncated,
+            'Contents': [self._content_entry(k, o) for k, o in zip(keys, objects)],
+        }
+        if token:
+            result['ContinuationToken'] = token
+        if start_after:
+            result['StartAfter'] = start_after
+        if delimiter:
+            result['Delimiter'] = delimiter
+            result['CommonPrefixes'] = [{'Prefix': p} for p in common_prefixes]
+        if truncated:
+            last = max(keys[-1:] + common_prefixes[-1:])
+            result['NextContinuationToken'] = base64.urlsafe_b64encode(last.encode('utf-8')).decode('ascii')
+        return _json(200, result)
+
+    def list_multipart_uploads(self, h: ObjectRequestHandler, bucket: StoredBucket, query: Dict[str, List[str]]):
+        prefix = _first(query, 'prefix', '')
+        key_marker = _first(query, 'key-marker', '')
+        upload_id_marker = _first(query, 'upload-id-marker', '')
+        max_uploads = int(_first(query, 'max-uploads', '1000'))
+        uploads = sorted(
+            (u for u in bucket.uploads.values() if u.key.startswith(prefix)),
+            key=lambda u: (u.key, u.initiated, u.upload_id),
+        )
+        if key_marker:
+            if upload_id_marker:
+                marker_upload = bucket.uploads.get(upload_id_marker)
+                marker_sort = (key_marker, marker_upload.initiated if marker_upload else 0, upload_id_marker)
+                uploads = [u for u in uploads if (u.key, u.initiated, u.upload_id) > marker_sort]
+            else:
+                uploads = [u for u in uploads if u.key > key_marker]
+        truncated = len(uploads) > max_uploads
+        uploads = uploads[:max_uploads]
+        result: Dict[str, Any] = {
+            'Bucket': bucket.name,
+            'Prefix': prefix,
+            'KeyMarker': key_marker,
+            'UploadIdMarker': upload_id_marker,
+            'MaxUploads': max_uploads,
+            'IsTruncated': truncated,
+            'Uploads': [
+                {
+                    'Key': u.key,
+                    'UploadId': u.upload_id,
+                    'Initiated': _iso8601(u.initiated),
+                    'StorageClass': u.storage_class,
+                }
+                for u in uploads
+            ],
+        }
+        if truncated:
+            result['NextKeyMarker'] = uploads[-1].key
+            result['NextUploadIdMarker'] = uploads[-1].upload_id
+        return _json(200, result)
+
+    # ---------- 文件级别 ----------
+
+    def get_stored_object(self, bucket: StoredBucket, key: str) -> StoredObject:
+        try:
+            return bucket.objects[key]
+        except KeyError:
+            raise ServiceError(404, 'NoSuchKey', 'The specified key does not exist')
+
+    def _object_headers(self, obj: StoredObject) -> Dict[str, str]:
+        headers = {
+            'ETag': obj.etag,
+            'Last-Modified': _rfc822(obj.last_modified),
+            'Accept-Ranges': 'bytes',
+        }
+        if obj.storage_class != 'STANDARD':
+            headers['x-sufy-storage-class'] = obj.storage_class
+        for k, v in obj.metadata.items():
+            headers['x-sufy-meta-' + k] = v
+        return headers
+
+    def put_object(self, h: ObjectRequestHandler, bucket: StoredBucket, key: str, body: bytes):
+        h._check_content_md5()
+        obj = StoredObject(
+            data=body,
+            etag=_quote_etag(h.body_md5.hex()),
+            content_type=h.headers.get('Content-Type') or 'application/octet-stream',
+            metadata=h._metadata(),
+            storage_class=h.headers.get('x-sufy-storage-class') or 'STANDARD',
+            last_modified=time.time(),
+        )
+        bucket.put(key, obj)
+        return Response(200, headers={'ETag': obj.etag})
+
+    def _copy_source(self, h: ObjectRequestHandler) -> StoredObject:
+        source = unquote(h.headers['x-sufy-copy-source']).split('?', 1)[0].lstrip('/')
+        src_bucket, _, src_key = source.partition('/')
+        src = self.get_stored_object(self.store.bucket(src_bucket), src_key)
+        if_match = h.headers.get('x-sufy-copy-source-if-match')
+        if if_match is not None and _strip_etag(if_match) != _strip_etag(src.etag):
+            raise ServiceError(412, 'PreconditionFailed', 'At least one of the preconditions you specified did not hold')
+        return src
+
+    def copy_object(self, h: ObjectRequestHandler, bucket: StoredBucket, key: str):
+        src = self._copy_source(h)
+        replace = (h.headers.get('x-sufy-metadata-directive') or 'COPY').upper() == 'REPLACE'
+        obj = StoredObject(
+            data=src.data,
+            etag=src.etag,
+            content_type=(h.headers.get('Content-Type') or src.content_type) if replace else src.content_type,
+            metadata=h._metadata() if replace else dict(src.metadata),
+            storage_class=h.headers.get('x-sufy-storage-class') or src.storage_class,
+            last_modified=time.time(),
+            part_sizes=list(src.part_sizes),
+        )
+        bucket.put(key, obj)
+        return _json(200, {'ETag': obj.etag, 'LastModified': _iso8601(obj.last_modified)})
+
+    def get_object(self, h: ObjectRequestHandler, bucket: StoredBucket, key: str, query: Dict[str, List[str]]):
+        obj = self.get_stored_object(bucket, key)
+        if_match = h.headers.get('If-Match')
+        if if_match is not None and _strip_etag(if_match) != _strip_etag(obj.etag):
+            raise ServiceError(412, 'PreconditionFailed', 'At least one of the preconditions you specified did not hold')
+        headers = self._object_headers(obj)
+        size = len(obj.data)
+        part_number = _first(query, 'partNumber')
+        byte_range = h.headers.get('Range')
+        if part_number is not None:
+            # 按分片读取，普通文件视为只有一个分片
+            part_sizes = obj.part_sizes or [size]
+            number = int(part_number)
+            if not 1 <= number <= len(part_sizes):
+                raise ServiceError(416, 'InvalidPartNumber', 'The requested partnumber is not satisfiable')
+            first = sum(part_sizes[:number - 1])
+            last = first + part_sizes[number - 1] - 1
+            if obj.part_sizes:
+                headers['x-sufy-mp-parts-count'] = str(len(part_sizes))
+        elif byte_range is not None:
+            first, last = self._parse_range(byte_range, size)
+        else:
+            return Response(200, obj.data, headers, content_type=obj.content_type)
+        headers['Content-Range'] = f'bytes {first}-{last}/{size}'
+        # 使用memoryview避免拷贝文件内容
+        return Response(206, memoryview(obj.data)[first:last + 1], headers, content_type=obj.content_type)
+
+    @staticmethod
+    def _parse_range(byte_range: str, size: int) -> Tuple[int, int]:
+        unit, _, spec = byte_range.partition('=')
+        if unit.strip() != 'bytes' or ',' in spec:
+            raise ServiceError(416, 'InvalidRange', 'The requested range is not satisfiable')
+        first_text, _, last_text = spec.strip().partition('-')
+        if first_text == '':
+            # bytes=-N 表示最后N个字节
+            first, last = max(size - int(last_text), 0), size - 1
+        else:
+            first = int(first_text)
+            last = min(int(last_text), size - 1) if last_text else size - 1
+        if first > last or first >= size:
+            raise ServiceError(416, 'InvalidRange', 'The requested range is not satisfiable')
+        return first, last
+
+    def create_multipart_upload(self, h: ObjectRequestHandler, bucket: StoredBucket, key: str):
+        upload = MultipartUpload(
+            key=key,
+            upload_id=uuid.uuid4().hex,
+            content_type=h.headers.get('Content-Type') or 'application/octet-stream',
+            metadata=h._metadata(),
+            storage_class=h.headers.get('x-sufy-storage-class') or 'STANDARD',
+            initiated=time.time(),
+        )
+        bucket.uploads[upload.upload_id] = upload
+        return _json(200, {'Bucket': bucket.name, 'Key': key, 'UploadId': upload.upload_id})
+
+    def upload_part(self, h: ObjectRequestHandler, bucket: StoredBucket, upload: MultipartUpload,
+                    part_number: int, body: bytes):
+        if not 1 <= part_number <= 10000:
+            raise ServiceError(400, 'InvalidArgument', 'Part number must be an integer between 1 and 10000')
+        if not h.headers.get('x-sufy-copy-source'):
+            h._check_content_md5()
+            part = StoredPart(data=body, md5=h.body_md5, last_modified=time.time())
+            upload.parts[part_number] = part
+            return Response(200, headers={'ETag': part.etag})
+
+        data = self._copy_source(h).data
+        copy_range = h.headers.get('x-sufy-copy-source-range')
+        first, last = 0, len(data) - 1
+        if copy_range:
+            first_text, _, last_text = copy_range.split('=', 1)[1].partition('-')
+            first, last = int(first_text), int(last_text)
+            if last >= len(data):
+                raise ServiceError(416, 'InvalidRange', 'The requested range is not satisfiable')
+
+        def copy() -> Tuple[bytes, bytes]:
+            part_data = data[first:last + 1] if copy_range else data
+            return part_data, hashlib.md5(part_data).digest()
+
+        def commit(copied: Tuple[bytes, bytes]) -> Response:
+            self._check_upload(bucket, upload)
+            part = StoredPart(data=copied[0], md5=copied[1], last_modified=time.time())
+            upload.parts[part_number] = part
+            return _json(200, {'ETag': part.etag, 'LastModified': _iso8601(part.last_modified)})
+
+        # 复制数据和计算摘要在锁外进行
+        return Deferred(copy, commit)
+
+    @staticmethod
+    def _check_upload(bucket: StoredBucket, upload: MultipartUpload):
+        # 锁外计算期间上传可能已被完成或中止
+        if bucket.uploads.get(upload.upload_id) is not upload:
+            raise ServiceError(404, 'NoSuchUpload', 'The specified multipart upload does not exist')
+
+    def complete_multipart_upload(self, h: ObjectRequestHandler, bucket: StoredBucket, upload: MultipartUpload,
+                                  document: Dict[str, Any]):
+        requested = document.get('Parts', document.get('Part', []))
+        if not requested:
+            raise ServiceError(400, 'MalformedJSON', 'You must specify at least one part')
+        part_numbers = [int(p['PartNumber']) for p in requested]
+        if part_numbers != sorted(set(part_numbers)):
+            raise ServiceError(400, 'InvalidPartOrder', 'The list of parts was not in ascending order')
+        parts = []
+        for p in requested:
+            part = upload.parts.get(int(p['PartNumber']))
+            if part is None or _strip_etag(part.etag) != _strip_etag(p['ETag']):
+                raise ServiceError(400, 'InvalidPart', 'One or more of the specified parts could not be found')
+            parts.append(part)
+        digest = hashlib.md5(b''.join(p.md5 for p in parts)).hexdigest()
+
+        def commit(data: bytes) -> Response:
+            self._check_upload(bucket, upload)
+            obj = StoredObject(
+                data=data,
+                etag=_quote_etag(f'{digest}-{len(parts)}'),
+                content_type=upload.content_type,
+                metadata=upload.metadata,
+                storage_class=upload.storage_class,
+                last_modified=time.time(),
+                part_sizes=[len(p.data) for p in parts],
+            )
+            bucket.put(upload.key, obj)
+            del bucket.uploads[upload.upload_id]
+            return _json(200, {
+                'Location': f'/{bucket.name}/{upload.key}',
+                'Bucket': bucket.name,
+                'Key': upload.key,
+                'ETag': obj.etag,
+            })
+
+        # 拼接分片在锁外进行
+        return Deferred(lambda: b''.join(p.data for p in parts), commit)
+
+    def list_parts(self, h: ObjectRequestHandler, bucket: StoredBucket, upload: MultipartUpload,
+                   query: Dict[str, List[str]]):
+        marker = int(_first(query, 'part-number-marker', '0') or 0)
+        max_parts = int(_first(query, 'max-parts', '1000'))
+        numbers = sorted(n for n in upload.parts if n > marker)
+        truncated = len(numbers) > max_parts
+        numbers = numbers[:max_parts]
+        result: Dict[str, Any] = {
+            'Bucket': bucket.name,
+            'Key': upload.key,
+            'UploadId': upload.upload_id,
+            'PartNumberMarker': marker,
+            'MaxParts': max_parts,
+            'IsTruncated': truncated,
+            'StorageClass': upload.storage_class,
+            'Parts': [
+                {
+                    'PartNumber': n,
+                    'ETag': upload.parts[n].etag,
+                    'Size': len(upload.parts[n].data),
+                    'LastModified': _iso8601(upload.parts[n].last_modified),
+                }
+                for n in numbers
+            ],
+        }
+        if truncated:
+            result['NextPartNumberMarker'] = numbers[-1]
+        return _json(200, result)
+
+
+class LocalObjectServer:
+    """
+    本地的对象存储服务，实现测试用例所用到的接口，用于离线运行测试用例
+
+        with LocalObjectServer() as server:
+            client = session.create_client('object', endpoint_url=server.endpoint, ...)
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, region: str = DEFAULT_REGION):
+        self.store = ObjectStore(region)
+        self.__httpd = ObjectHTTPServer((host, port), self.store)
+        self.__thread: Optional[threading.Thread] = None
+
+    @property
+    def endpoint(self) -> str:
+        host, port = self.__httpd.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self) -> 'LocalObjectServer':
+        if self.__thread is None:
+            self.__thread = threading.Thread(
+                target=self.__httpd.serve_forever,
+                name='local-object-server',
+                daemon=True,
+            )
+            self.__thread.start()
+        return self
+
+    def stop(self):
+        if self.__thread is not None:
+            self.__httpd.shutdown()
+            self.__thread.join()
+            self.__thread = None
+        self.__httpd.server_close()
+
+    def __enter__(self) -> 'LocalObjectServer':
+        return self.start()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+
+
+__all__ = [
+    'LocalObjectServer',
+    'ObjectStore',
+    'ServiceError',
+    'MAX_KEY_LENGTH',
+]
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Run the local object service')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--region', default=DEFAULT_REGION)
+    args = parser.parse_args()
+
+    server = LocalObjectServer(args.host, args.port, args.region).start()
+    print(f'Local object service listening on {server.endpoint}')
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, Optional
+
+Page = Dict[str, Any]
+
+
+def _next_marker(resp: Page) -> Optional[Dict[str, Any]]:
+    # 没有指定Delimiter时服务端不返回NextMarker，使用本页最后一个key或目录作为Marker
+    marker = resp.get('NextMarker')
+    if not marker:
+        candidates = [item['Key'] for item in resp.get('Contents', [])[-1:]]
+        candidates += [item['Prefix'] for item in resp.get('CommonPrefixes', [])[-1:]]
+        if not candidates:
+            return None
+        marker = max(candidates)
+    return {'Marker': marker}
+
+
+@dataclass(frozen=True)
+class _PageSpec:
+    items: str
+    next_kwargs: Callable[[Page], Optional[Dict[str, Any]]]
+
+
+_PAGE_SPECS: Dict[str, _PageSpec] = {
+    'list_objects': _PageSpec('Contents', _next_marker),
+    'list_objects_v2': _PageSpec(
+        'Contents',
+        lambda resp: {'ContinuationToken': resp['NextContinuationToken']},
+    ),
+    'list_multipart_uploads': _PageSpec(
+        'Uploads',
+        lambda resp: {'KeyMarker': resp['NextKeyMarker'], 'UploadIdMarker': resp['NextUploadIdMarker']},
+    ),
+    'list_parts': _PageSpec(
+        'Parts',
+        lambda resp: {'PartNumberMarker': resp['NextPartNumberMarker']},
+    ),
+}
+
+
+def iter_pages(object_service: Any, operation: str, **kwargs) -> Iterator[Page]:
+    """
+    逐页返回列举接口的响应，调用方处理当前页时后台线程已经在请求下一页，
+    内存中最多同时持有两页。提前结束迭代时会等待正在进行的请求完成
+    """
+    spec = _PAGE_SPECS[operation]
+    fetch = getattr(object_service, operation)
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f'paginate-{operation}')
+    try:
+        future: Optional[Future] = executor.submit(fetch, **kwargs)
+        while future is not None:
+            resp = future.result()
+            future = None
+            if resp.get('IsTruncated'):
+                next_kwargs = spec.next_kwargs(resp)
+                if next_kwargs is not None:
+                    kwargs = {**kwargs, **next_kwargs}
+                    future = executor.submit(fetch, **kwargs)
+            yield resp
+    finally:
+        executor.shutdown(wait=True)
+
+
+def _iter_items(object_service: Any, operation: str, **kwargs) -> Iterator[Dict[str, Any]]:
+    items = _PAGE_SPECS[operation].items
+    for page in iter_pages(object_service, operation, **kwargs):
+        yield from page.get(items, [])
+
+
+def iter_objects(object_service: Any, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    使用 Marker 分页的 list_objects，返回 Contents 中的条目
+    """
+    return _iter_items(object_service, 'list_objects', **kwargs)
+
+
+def iter_objects_v2(object_service: Any, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    使用 ContinuationToken 分页的 list_objects_v2，返回 Contents 中的条目
+    """
+    return _iter_items(object_service, 'list_objects_v2', **kwargs)
+
+
+def iter_multipart_uploads(object_service: Any, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    使用 KeyMarker/UploadIdMarker 分页的 list_multipart_uploads，返回 Uploads 中的条目
+    """
+    return _iter_items(object_service, 'list_multipart_uploads', **kwargs)
+
+
+def iter_parts(object_service: Any, **kwargs) -> Iterator[Dict[str, Any]]:
+    """
+    使用 PartNumberMarker 分页的 list_parts，返回 Parts 中的条目
+    """
+    return _iter_items(object_service, 'list_parts', **kwargs)
+
+
+__all__ = [
+    'iter_pages',
+    'iter_objects',
+    'iter_objects_v2',
+    'iter_multipart_uploads',
+    'iter_parts',
+]
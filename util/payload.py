@@ -0,0 +1,233 @@
+import hashlib
+import io
+import threading
+from collections import OrderedDict
+from typing import Iterator, Optional, Union
+
+Seed = Union[int, str, bytes]
+
+
+class SeededPayload:
+    """
+    由种子确定的虚拟文件内容，可以按需生成任意字节区间而不需要在内存中保存整个文件
+
+    内容由1MiB大小的块组成，每个块由种子和块号经SHAKE-128独立生成，任意两个块的内容都不相同，
+    错位或交换的区间不会被误认为正确。最近生成的块会被缓存，顺序读取时每个块只生成一次
+    """
+
+    BLOCK_SIZE = 1024 * 1024
+    # 缓存的块数，应不小于并发读取同一个payload的线程数
+    CACHE_BLOCKS = 32
+
+    def __init__(self, size: int, seed: Seed = 0):
+        if size < 0:
+            raise ValueError('size must not be negative')
+        self.__size = size
+        self.__seed = seed
+        self.__key = hashlib.blake2b(repr(seed).encode('utf-8'), digest_size=32).digest()
+        self.__cache: 'OrderedDict[int, memoryview]' = OrderedDict()
+        self.__cache_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self.__size
+
+    @property
+    def size(self) -> int:
+        return self.__size
+
+    @property
+    def seed(self) -> Seed:
+        return self.__seed
+
+    def __block(self, index: int) -> memoryview:
+        with self.__cache_lock:
+            block = self.__cache.get(index)
+            if block is not None:
+                self.__cache.move_to_end(index)
+                return block
+        # 最后一个块只生成需要的长度，SHAKE的较短输出是较长输出的前缀，内容与完整的块一致
+        size = min(self.BLOCK_SIZE, self.__size - index * self.BLOCK_SIZE)
+        block = memoryview(hashlib.shake_128(self.__key + index.to_bytes(8, 'big')).digest(size))
+        with self.__cache_lock:
+            self.__cache[index] = block
+            if len(self.__cache) > self.CACHE_BLOCKS:
+                self.__cache.popitem(last=False)
+        return block
+
+    def __range(self, start: int, end: Optional[int]) -> range:
+        end = self.__size if end is None else end
+        if not 0 <= start <= end <= self.__size:
+            raise ValueError(f'invalid range [{start}, {end}) for payload of size {self.__size}')
+        return range(start, end)
+
+    def iter_views(self, start: int = 0, end: Optional[int] = None,
+                   chunk_size: int = BLOCK_SIZE) -> Iterator[memoryview]:
+        """
+        以只读memoryview的形式依次返回[start, end)区间的内容，每段不超过chunk_size且不跨块
+        """
+        r = self.__range(start, end)
+        pos = r.start
+        while pos < r.stop:
+            index, inner = divmod(pos, self.BLOCK_SIZE)
+            n = min(chunk_size, self.BLOCK_SIZE - inner, r.stop - pos)
+            yield self.__block(index)[inner:inner + n]
+            pos += n
+
+    def read(self, start: int = 0, end: Optional[int] = None) -> bytes:
+        """
+        生成[start, end)区间的内容，只应该用于较小的区间
+        """
+        return b''.join(self.iter_views(start, end))
+
+    def reader(self, start: int = 0, end: Optional[int] = None) -> 'PayloadReader':
+        r = self.__range(start, end)
+        return PayloadReader(self, r.start, r.stop)
+
+    def parts(self, part_size: int) -> Iterator['PayloadReader']:
+        """
+        按照分片大小依次返回每个分片的reader
+        """
+        for start in range(0, self.__size, part_size):
+            yield self.reader(start, min(start + part_size, self.__size))
+
+    def digest(self, algorithm: str = 'md5', start: int = 0, end: Optional[int] = None) -> str:
+        """
+        流式计算[start, end)区间的摘要
+        """
+        h = hashlib.new(algorithm)
+        for view in self.iter_views(start, end):
+            h.update(view)
+        return h.hexdigest()
+
+
+class PayloadReader(io.RawIOBase):
+    """
+    SeededPayload某个区间的只读文件对象，seek的位置相对于区间起点，
+    因此请求重试时 seek(0) 会回到区间开头
+    """
+
+    def __init__(self, payload: SeededPayload, start: int, end: int):
+        super().__init__()
+        self.__payload = payload
+        self.__start = start
+        self.__end = end
+        self.__pos = 0
+
+    def __len__(self) -> int:
+        return self.__end - self.__start
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.__pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self) + offset
+        else:
+            raise ValueError(f'invalid whence {whence}')
+        if pos < 0:
+            raise ValueError('negative seek position')
+        self.__pos = pos
+        return pos
+
+    def readinto(self, b) -> int:
+        out = memoryview(b).cast('B')
+        begin = self.__start + min(self.__pos, len(self))
+        end = min(begin + len(out), self.__end)
+        n = 0
+        for view in self.__payload.iter_views(begin, end):
+            out[n:n + len(view)] = view
+            n += len(view)
+        self.__pos += n
+        return n
+
+    def readall(self) -> bytes:
+        begin = self.__start + min(self.__pos, len(self))
+        data = self.__payload.read(begin, self.__end)
+        self.__pos += len(data)
+        return data
+
+
+class MemoryViewReader(io.RawIOBase):
+    """
+    memoryview（例如 mmap 映射的文件区间）的只读文件对象。
+    read 返回拷贝出的bytes，调用方持有的结果不会阻止映射关闭；readinto 和 remaining 不拷贝数据。
+    seek 的位置相对于窗口起点，请求重试时 seek(0) 回到窗口开头，不需要重新读取文件
+    """
+
+    def __init__(self, view: memoryview):
+        super().__init__()
+        self.__view = view
+        self.__pos = 0
+
+    def __len__(self) -> int:
+        return len(self.__view)
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def tell(self) -> int:
+        return self.__pos
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        if whence == io.SEEK_SET:
+            pos = offset
+        elif whence == io.SEEK_CUR:
+            pos = self.__pos + offset
+        elif whence == io.SEEK_END:
+            pos = len(self) + offset
+        else:
+            raise ValueError(f'invalid whence {whence}')
+        if pos < 0:
+            raise ValueError('negative seek position')
+        self.__pos = pos
+        return pos
+
+    def remaining(self) -> memoryview:
+        """
+        从当前位置到窗口结尾的内容，不移动位置。返回的是底层内存的切片，应在 with 块中使用，用完即释放
+        """
+        self._checkClosed()
+        return self.__view[min(self.__pos, len(self)):]
+
+    def read(self, size: int = -1) -> bytes:
+        with self.remaining() as view:
+            if size is not None and size >= 0:
+                view = view[:size]
+            self.__pos += len(view)
+            return bytes(view)
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, b) -> int:
+        out = memoryview(b).cast('B')
+        with self.remaining() as view:
+            n = min(len(out), len(view))
+            out[:n] = view[:n]
+        self.__pos += n
+        return n
+
+    def close(self):
+        if not self.closed:
+            self.__view.release()
+        super().close()
+
+
+__all__ = [
+    'SeededPayload',
+    'PayloadReader',
+    'MemoryViewReader',
+]
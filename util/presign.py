@@ -0,0 +1,216 @@
+import threading
+import uuid
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional
+
+from botocore.awsrequest import AWSRequest
+from botocore.utils import percent_encode
+
+_INSTALLED_ATTR = '_sufy_presign_capture'
+
+# 派生签名密钥的缓存条目上限，每个 (日期, 区域, 服务) 只占几个条目
+_MAX_DERIVED_KEYS = 256
+
+
+class _TemplateCaptured(Exception):
+    def __init__(self, template: '_Template'):
+        super().__init__('presign template captured')
+        self.template = template
+
+
+class _Capture(threading.local):
+    active = False
+
+
+_capture = _Capture()
+
+
+@dataclass()
+class _Template:
+    placeholder: str
+    method: str
+    url: str
+    headers: Dict[str, str]
+    data: Any
+    params: Dict[str, Any]
+    auth_path: Optional[str]
+    context: Dict[str, Any]
+    # None 表示client不签名，URL中替换key即可
+    auth: Any
+
+
+class _CapturingAuth:
+    """
+    包装签名器：签名前保存请求作为模板并中止 generate_presigned_url
+    """
+
+    def __init__(self, auth: Any):
+        self.__auth = auth
+
+    def add_auth(self, request: Any):
+        raise _TemplateCaptured(_Template(
+            placeholder='',
+            method=request.method,
+            url=request.url,
+            headers=dict(request.headers.items()),
+            data=request.data,
+            params=dict(request.params),
+            auth_path=request.auth_path,
+            context=dict(request.context),
+            auth=self.__auth,
+        ))
+
+
+def _template_signer(client: Any) -> Any:
+    """
+    模板签名依赖 RequestSigner 的私有方法 get_auth_instance，不存在时（例如sdk版本变化）返回None，
+    BatchPresigner 退回逐个调用公开的 generate_presigned_url
+    """
+    signer = getattr(client, '_request_signer', None)
+    if not callable(getattr(signer, 'get_auth_instance', None)):
+        return None
+    return signer
+
+
+def _install(signer: Any):
+    if getattr(signer, _INSTALLED_ATTR, False):
+        return
+    setattr(signer, _INSTALLED_ATTR, True)
+    get_auth_instance = signer.get_auth_instance
+
+    def capturing_get_auth_instance(*args, **kwargs):
+        auth = get_auth_instance(*args, **kwargs)
+        return _CapturingAuth(auth) if _capture.active else auth
+
+    signer.get_auth_instance = capturing_get_auth_instance
+
+
+def _cache_key_derivation(auth: Any, derived: Dict[Any, bytes]):
+    """
+    签名密钥由密钥依次对日期、区域、服务和结束标记做HMAC派生，输入相同时结果相同。
+    缓存签名器中非hex的HMAC结果，每个URL只需计算最后一次对StringToSign的HMAC。
+    签名器没有私有方法 _sign 时不缓存
+    """
+    sign = getattr(auth, '_sign', None)
+    if not callable(sign):
+        return
+
+    def cached_sign(key: bytes, msg: str, hex: bool = False):
+        if hex:
+            return sign(key, msg, hex=True)
+        cache_key = (key, msg)
+        digest = derived.get(cache_key)
+        if digest is None:
+            if len(derived) >= _MAX_DERIVED_KEYS:
+                derived.clear()
+            digest = derived[cache_key] = sign(key, msg)
+        return digest
+
+    auth._sign = cached_sign
+
+
+class BatchPresigner:
+    """
+    批量生成同一个bucket中大量文件的预签名URL，结果与逐个调用 generate_presigned_url 相同。
+
+    每批只用占位key走一次完整的 generate_presigned_url，在签名前截获请求作为模板，
+    参数校验、endpoint解析、序列化和 before-sign 事件都不再逐个执行；
+    每个key只替换模板URL中的key后复用同一个签名器签名，签名密钥的派生结果跨批次缓存。
+    截获模板需要client的私有签名接口，接口不存在时逐个调用 generate_presigned_url
+    """
+
+    def __init__(self, object_service: Any, bucket: str, client_method: str = 'get_object',
+                 expires_in: int = 3600, http_method: Optional[str] = None, **params):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__client_method = client_method
+        self.__expires_in = expires_in
+        self.__http_method = http_method
+        self.__params = params
+        self.__derived: Dict[Any, bytes] = {}
+
+    def presign(self, keys: Iterable[str]) -> List[str]:
+        """
+        按 keys 的顺序返回预签名URL。每次调用重新获取凭证和签名器
+        """
+        signer = _template_signer(self.__object_service)
+        if signer is None:
+            return [self.__presign_one(key) for key in keys]
+        template = self.__template(signer)
+        return [self.__sign(template, key) for key in keys]
+
+    def __presign_one(self, key: str) -> str:
+        return self.__object_service.generate_presigned_url(
+            self.__client_method,
+            Params={**self.__params, 'Bucket': self.__bucket, 'Key': key},
+            ExpiresIn=self.__expires_in,
+            HttpMethod=self.__http_method,
+        )
+
+    def __template(self, signer: Any) -> _Template:
+        client = self.__object_service
+        _install(signer)
+        placeholder = f'presign{uuid.uuid4().hex}'
+        _capture.active = True
+        try:
+            url = client.generate_presigned_url(
+                self.__client_method,
+                Params={**self.__params, 'Bucket': self.__bucket, 'Key': placeholder},
+                ExpiresIn=self.__expires_in,
+                HttpMethod=self.__http_method,
+            )
+        except _TemplateCaptured as e:
+            template = e.template
+            template.placeholder = placeholder
+            _cache_key_derivation(template.auth, self.__derived)
+            return template
+        finally:
+            _capture.active = False
+        return _Template(
+            placeholder=placeholder,
+            method=self.__http_method or 'GET',
+            url=url,
+            headers={},
+            data=None,
+            params={},
+            auth_path=None,
+            context={},
+            auth=None,
+        )
+
+    @staticmethod
+    def __sign(template: _Template, key: str) -> str:
+        # 与序列化 {Key+} 时的编码方式相同
+        encoded = percent_encode(key, safe='/~')
+        url = template.url.replace(template.placeholder, encoded)
+        if template.auth is None:
+            return url
+        auth_path = template.auth_path
+        if auth_path is not None:
+            auth_path = auth_path.replace(template.placeholder, encoded)
+        request = AWSRequest(
+            method=template.method,
+            url=url,
+            headers=template.headers,
+            data=template.data,
+            params=dict(template.params),
+            auth_path=auth_path,
+        )
+        # 签名器会在 context 中写入时间戳
+        request.context = dict(template.context)
+        template.auth.add_auth(request)
+        if not request.params:
+            # 只需要URL，没有额外的查询参数时不需要 prepare 整个请求
+            return request.url
+        return request.prepare().url
+
+
+def presign_urls(object_service: Any, bucket: str, keys: Iterable[str], client_method: str = 'get_object',
+                 expires_in: int = 3600, **params) -> List[str]:
+    return BatchPresigner(object_service, bucket, client_method, expires_in, **params).presign(keys)
+
+
+__all__ = [
+    'BatchPresigner',
+    'presign_urls',
+]
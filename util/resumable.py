@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Optional
+
+from botocore.exceptions import ClientError
+
+from util.paginate import iter_parts
+from util.payload import MemoryViewReader
+from util.transfer import MultipartUploader, UploadResult, mapped_parts, split_ranges, MiB
+
+
+@dataclass()
+class UploadCheckpoint:
+    bucket: str
+    key: str
+    upload_id: str
+    part_size: int
+    # 源文件的大小与修改时间，文件变化后检查点失效
+    size: int
+    mtime_ns: int
+    # PartNumber 到 ETag
+    parts: Dict[int, str] = field(default_factory=dict)
+
+    @staticmethod
+    def from_dict(dict_: Dict[str, Any]):
+        dict_ = dict(dict_)
+        dict_['parts'] = {int(n): etag for n, etag in dict_.get('parts', {}).items()}
+        return UploadCheckpoint(**dict_)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def save(self, path: str):
+        """
+        先写临时文件再 rename，进程在任何时刻退出检查点文件都是完整的
+        """
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(self.to_dict(), f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def load(path: str) -> Optional['UploadCheckpoint']:
+        try:
+            with open(path) as f:
+                return UploadCheckpoint.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+
+
+def _strip_etag(etag: str) -> str:
+    return etag.strip().strip('"')
+
+
+def _md5_hex(reader: MemoryViewReader) -> str:
+    with reader.remaining() as view:
+        return hashlib.md5(view).hexdigest()
+
+
+class ResumableUploader:
+    """
+    可以中断后继续的本地文件分片上传。upload ID、分片大小和已完成分片的ETag保存在检查点文件中，
+    每个分片完成后立即更新检查点；重新运行时以 list_parts 的结果核对检查点，只上传缺少的分片。
+
+    上传失败时保留分片上传与检查点以便下次继续，完成上传后删除检查点。
+    检查点对应的文件被修改过时中止旧的分片上传，重新开始
+    """
+
+    def __init__(self, object_service: Any, bucket: str, key: str, checkpoint_path: str, workers: int = 8,
+                 part_size: int = 64 * MiB, max_in_flight_bytes: int = 64 * MiB, checksums: bool = False):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__key = key
+        self.__checkpoint_path = checkpoint_path
+        self.__part_size = part_size
+        self.__uploader = MultipartUploader(object_service, bucket, key, workers=workers,
+                                            max_in_flight_bytes=max_in_flight_bytes, checksums=checksums)
+
+    def upload_file(self, path: str, **create_kwargs) -> UploadResult:
+        """
+        上传或继续上传本地文件，返回结果的 timings 只包含本次上传的分片，parts 包含全部分片
+        """
+        stat = os.stat(path)
+        if stat.st_size == 0:
+            result = self.__uploader.upload_file(path, **create_kwargs)
+            self.__remove_checkpoint()
+            return result
+
+        checkpoint = self.__resume(path, stat)
+        if checkpoint is None:
+            upload_id = self.__object_service.create_multipart_upload(
+                Bucket=self.__bucket,
+                Key=self.__key,
+                **create_kwargs,
+            )['UploadId']
+            checkpoint = UploadCheckpoint(
+                bucket=self.__bucket,
+                key=self.__key,
+                upload_id=upload_id,
+                part_size=self.__part_size,
+                size=stat.st_size,
+                mtime_ns=stat.st_mtime_ns,
+            )
+            checkpoint.save(self.__checkpoint_path)
+
+        lock = threading.Lock()
+
+        def on_part(part: Dict[str, Any]):
+            with lock:
+                checkpoint.parts[part['PartNumber']] = part['ETag']
+                checkpoint.save(self.__checkpoint_path)
+
+        with mapped_parts(path, checkpoint.part_size) as readers:
+            missing = [(n, reader) for n, reader in enumerate(readers, start=1) if n not in checkpoint.parts]
+            result = self.__uploader.upload_numbered_parts(
+                checkpoint.upload_id,
+                missing,
+                abort_on_failure=False,
+                on_part=on_part,
+            )
+        result.parts = [{'PartNumber': n, 'ETag': checkpoint.parts[n]} for n in sorted(checkpoint.parts)]
+        result.etag = self.__uploader.complete(result)['ETag']
+        self.__remove_checkpoint()
+        return result
+
+    def __resume(self, path: str, stat: os.stat_result) -> Optional[UploadCheckpoint]:
+        checkpoint = UploadCheckpoint.load(self.__checkpoint_path)
+        if checkpoint is None:
+            return None
+        current = (self.__bucket, self.__key, stat.st_size, stat.st_mtime_ns)
+        if (checkpoint.bucket, checkpoint.key, checkpoint.size, checkpoint.mtime_ns) != current:
+            self.__abort(checkpoint)
+            return None
+
+        try:
+            listed = {
+                p['PartNumber']: p
+                for p in iter_parts(
+                    self.__object_service,
+                    Bucket=checkpoint.bucket,
+                    Key=checkpoint.key,
+                    UploadId=checkpoint.upload_id,
+                )
+            }
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('NoSuchUpload', '404'):
+                return None
+            raise
+
+        # 以服务端为准：检查点中有但服务端没有的分片需要重传；
+        # 服务端有而检查点中没有的分片（进程在保存检查点前退出）大小和MD5都与本地文件一致时直接使用
+        ranges = split_ranges(checkpoint.size, checkpoint.part_size)
+        parts: Dict[int, str] = {}
+        unrecorded: Dict[int, str] = {}
+        for n, part in listed.items():
+            if not 1 <= n <= len(ranges):
+                continue
+            first, last = ranges[n - 1]
+            if part['Size'] != last - first + 1:
+                continue
+            recorded = checkpoint.parts.get(n)
+            if recorded is None:
+                unrecorded[n] = part['ETag']
+            elif _strip_etag(recorded) == _strip_etag(part['ETag']):
+                parts[n] = part['ETag']
+        if unrecorded:
+            with mapped_parts(path, checkpoint.part_size) as readers:
+                for n, etag in unrecorded.items():
+                    if _md5_hex(readers[n - 1]) == _strip_etag(etag):
+                        parts[n] = etag
+        checkpoint.parts = parts
+        checkpoint.save(self.__checkpoint_path)
+        return checkpoint
+
+    def __abort(self, checkpoint: UploadCheckpoint):
+        try:
+            self.__object_service.abort_multipart_upload(
+                Bucket=checkpoint.bucket,
+                Key=checkpoint.key,
+                UploadId=checkpoint.upload_id,
+            )
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchUpload', '404'):
+                raise
+
+    def __remove_checkpoint(self):
+        try:
+            os.remove(self.__checkpoint_path)
+        except FileNotFoundError:
+            pass
+
+
+__all__ = [
+    'UploadCheckpoint',
+    'ResumableUploader',
+]
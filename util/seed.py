@@ -0,0 +1,64 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Any, BinaryIO, Dict, Iterable, List, Mapping, Optional, Tuple, Union
+
+Body = Union[str, bytes, bytearray, BinaryIO]
+
+
+class ObjectSeeder:
+    """
+    通过有界线程池并发上传测试文件。
+    待上传的文件可以来自生成器，已提交但未完成的上传数不超过 max_pending，内存占用与文件总数无关
+    """
+
+    def __init__(self, object_service: Any, bucket: str, workers: int = 16, max_pending: Optional[int] = None):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__workers = workers
+        self.__max_pending = max_pending or workers * 4
+
+    def run(self, objects: Union[Mapping[str, Body], Iterable[Tuple[str, Body]]], **put_kwargs) -> Dict[str, str]:
+        """
+        上传所有文件并返回 key 到 ETag 的映射，put_kwargs 会传给每一次 put_object。
+        任意一个文件上传失败时停止提交新的上传，等待已提交的完成后抛出第一个异常
+        """
+        items = objects.items() if isinstance(objects, Mapping) else objects
+        etags: Dict[str, str] = {}
+        errors: List[BaseException] = []
+        lock = threading.Lock()
+        pending = threading.BoundedSemaphore(self.__max_pending)
+
+        def done(key: str, future: Future):
+            try:
+                etag = future.result()['ETag']
+                with lock:
+                    etags[key] = etag
+            except BaseException as e:
+                with lock:
+                    errors.append(e)
+            finally:
+                pending.release()
+
+        with ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='object-seeder') as executor:
+            for key, body in items:
+                pending.acquire()
+                if errors:
+                    pending.release()
+                    break
+                future = executor.submit(
+                    self.__object_service.put_object,
+                    Bucket=self.__bucket,
+                    Key=key,
+                    Body=body,
+                    **put_kwargs,
+                )
+                future.add_done_callback(functools.partial(done, key))
+        if errors:
+            raise errors[0]
+        return etags
+
+
+__all__ = [
+    'ObjectSeeder',
+]
@@ -0,0 +1,222 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+
+_INSTALLED_ATTR = '_sufy_latency_recorder'
+
+
+@dataclass()
+class OperationTiming:
+    """
+    一次API调用各阶段的耗时（秒），重试时各阶段累加
+    """
+    operation: str
+    # 参数校验与请求序列化：before-parameter-build -> before-call
+    serialize: float = 0.0
+    # 签名与构造HTTP请求：before-sign -> before-send
+    sign: float = 0.0
+    # 发出请求到收到响应：before-send -> before-parse。
+    # client的事件无法区分首字节与响应体传输：非流式响应（如 list_objects_v2）包含读取整个响应体的时间，
+    # 流式响应只到收到响应头为止
+    send: float = 0.0
+    # 调用方读取流式响应体（如 get_object 的 Body）的时间，非流式响应为0
+    transfer: float = 0.0
+    # 解析响应：before-parse -> after-call
+    parse: float = 0.0
+    # 调用开始到返回的总耗时，不包含流式响应体的读取
+    seconds: float = 0.0
+    attempts: int = 0
+    error: bool = False
+
+    @property
+    def client_seconds(self) -> float:
+        return self.serialize + self.sign + self.parse
+
+
+class _Pending:
+    def __init__(self, operation: str):
+        self.timing = OperationTiming(operation=operation)
+        self.start = time.perf_counter()
+        self.mark = self.start
+
+
+@dataclass()
+class OperationSummary:
+    operation: str
+    count: int
+    errors: int
+    attempts: int
+    serialize: float
+    sign: float
+    send: float
+    transfer: float
+    parse: float
+    seconds: float
+    max_seconds: float
+
+    @staticmethod
+    def from_timings(operation: str, timings: List[OperationTiming]) -> 'OperationSummary':
+        n = len(timings)
+        return OperationSummary(
+            operation=operation,
+            count=n,
+            errors=sum(t.error for t in timings),
+            attempts=sum(t.attempts for t in timings),
+            serialize=sum(t.serialize for t in timings) / n,
+            sign=sum(t.sign for t in timings) / n,
+            send=sum(t.send for t in timings) / n,
+            transfer=sum(t.transfer for t in timings) / n,
+            parse=sum(t.parse for t in timings) / n,
+            seconds=sum(t.seconds for t in timings) / n,
+            max_seconds=max(t.seconds for t in timings),
+        )
+
+
+def summarize(timings: List[OperationTiming]) -> List[OperationSummary]:
+    by_operation: Dict[str, List[OperationTiming]] = {}
+    for t in timings:
+        by_operation.setdefault(t.operation, []).append(t)
+    return [OperationSummary.from_timings(op, ts) for op, ts in sorted(by_operation.items())]
+
+
+def format_table(timings: List[OperationTiming]) -> str:
+    """
+    按操作汇总的平均耗时表，单位毫秒
+    """
+    header = f'{"operation":<28}{"count":>7}{"retry":>7}{"err":>5}' \
+             f'{"serialize":>11}{"sign":>9}{"send":>10}{"transfer":>10}{"parse":>9}{"total":>10}{"max":>10}'
+    lines = [header, '-' * len(header)]
+    for s in summarize(timings):
+        lines.append(
+            f'{s.operation:<28}{s.count:>7}{s.attempts - s.count:>7}{s.errors:>5}'
+            f'{s.serialize * 1000:>11.2f}{s.sign * 1000:>9.2f}{s.send * 1000:>10.2f}'
+            f'{s.transfer * 1000:>10.2f}{s.parse * 1000:>9.2f}{s.seconds * 1000:>10.2f}{s.max_seconds * 1000:>10.2f}'
+        )
+    return '\n'.join(lines)
+
+
+class LatencyRecorder:
+    """
+    通过client的事件系统记录每次调用各阶段的耗时，只使用公开的事件，不替换client内部的对象。
+    同一次调用的事件都在发起调用的线程中触发，因此进行中的调用保存在线程局部变量里
+    """
+
+    def __init__(self):
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__timings: List[OperationTiming] = []
+
+    def install(self, client: Any):
+        if getattr(client, _INSTALLED_ATTR, None) is self:
+            return
+        setattr(client, _INSTALLED_ATTR, self)
+        events = client.meta.events
+        uid = f'latency-recorder-{id(self)}'
+        events.register('before-parameter-build', self.__on_start, unique_id=f'{uid}-start')
+        events.register('before-call', self.__on_serialized, unique_id=f'{uid}-serialized')
+        events.register('before-sign', self.__on_before_sign, unique_id=f'{uid}-sign')
+        events.register('before-send', self.__on_before_send, unique_id=f'{uid}-send')
+        events.register('before-parse', self.__on_before_parse, unique_id=f'{uid}-parse')
+        events.register('after-call', self.__on_after_call, unique_id=f'{uid}-after')
+        events.register('after-call-error', self.__on_after_call_error, unique_id=f'{uid}-error')
+
+    def mark(self) -> int:
+        """
+        返回当前已记录的调用数，配合 since 获取之后的调用
+        """
+        with self.__lock:
+            return len(self.__timings)
+
+    def since(self, mark: int) -> List[OperationTiming]:
+        with self.__lock:
+            return self.__timings[mark:]
+
+    def timings(self) -> List[OperationTiming]:
+        return self.since(0)
+
+    # ---------- 事件处理 ----------
+
+    def __pending(self) -> Optional[_Pending]:
+        return getattr(self.__local, 'pending', None)
+
+    def __advance(self) -> Optional[float]:
+        pending = self.__pending()
+        if pending is None:
+            return None
+        now = time.perf_counter()
+        elapsed = now - pending.mark
+        pending.mark = now
+        return elapsed
+
+    def __on_start(self, model: Any = None, **kwargs):
+        # generate_presigned_url 同样触发该事件但不会触发 after-call，下一次调用开始时会被覆盖
+        self.__local.pending = _Pending(model.name if model is not None else '')
+
+    def __on_serialized(self, **kwargs):
+        elapsed = self.__advance()
+        if elapsed is not None:
+            self.__pending().timing.serialize += elapsed
+
+    def __on_before_sign(self, **kwargs):
+        self.__advance()
+
+    def __on_before_send(self, **kwargs):
+        elapsed = self.__advance()
+        if elapsed is not None:
+            pending = self.__pending()
+            pending.timing.sign += elapsed
+            pending.timing.attempts += 1
+
+    def __on_before_parse(self, **kwargs):
+        elapsed = self.__advance()
+        if elapsed is not None:
+            self.__pending().timing.send += elapsed
+
+    def __on_after_call(self, parsed: Optional[Dict[str, Any]] = None, **kwargs):
+        timing = self.__finish(error=False)
+        if timing is not None and parsed is not None:
+            body = parsed.get('Body')
+            if body is not None and hasattr(body, 'read'):
+                self.__time_body(body, timing)
+
+    def __on_after_call_error(self, **kwargs):
+        self.__finish(error=True)
+
+    def __finish(self, error: bool) -> Optional[OperationTiming]:
+        pending = self.__pending()
+        if pending is None:
+            return None
+        self.__local.pending = None
+        now = time.perf_counter()
+        timing = pending.timing
+        if not error:
+            timing.parse += now - pending.mark
+        timing.seconds = now - pending.start
+        timing.error = error
+        with self.__lock:
+            self.__timings.append(timing)
+        return timing
+
+    @staticmethod
+    def __time_body(body: Any, timing: OperationTiming):
+        # 流式响应体在调用返回后才被读取，读取时间累加到 transfer
+        read = body.read
+
+        def timed_read(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return read(*args, **kwargs)
+            finally:
+                timing.transfer += time.perf_counter() - start
+
+        body.read = timed_read
+
+
+__all__ = [
+    'LatencyRecorder',
+    'OperationTiming',
+    'OperationSummary',
+    'summarize',
+    'format_table',
+]
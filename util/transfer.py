@@ -0,0 +1,418 @@
+import contextlib
+import math
+import mmap
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from util.checksum import Checksums, compute_checksums, predict_multipart_etag
+from util.payload import MemoryViewReader
+
+# 分片内容可以是bytes，也可以是支持len()的可seek文件对象，例如 util.payload.PayloadReader
+PartBody = Union[bytes, bytearray, BinaryIO]
+
+MiB = 1024 * 1024
+GiB = 1024 * MiB
+
+# 分片大小与分片数的上限，除最后一个分片外每个分片不小于5MiB
+MIN_PART_SIZE = 5 * MiB
+MAX_PART_SIZE = 5 * GiB
+MAX_PARTS = 10000
+# copy_object 单次请求能复制的最大文件
+MAX_COPY_OBJECT_SIZE = 5 * GiB
+
+# 分片复制时目标文件不会继承源文件的这些属性，需要从 head_object 的结果中带上
+_COPIED_ATTRIBUTES = (
+    'ContentType',
+    'Metadata',
+    'CacheControl',
+    'ContentDisposition',
+    'ContentEncoding',
+    'ContentLanguage',
+)
+
+
+@dataclass()
+class PartTiming:
+    part_number: int
+    size: int
+    seconds: float
+
+
+@dataclass()
+class UploadResult:
+    upload_id: str
+    parts: List[Dict[str, Any]] = field(default_factory=list)
+    timings: List[PartTiming] = field(default_factory=list)
+    seconds: float = 0.0
+    etag: Optional[str] = None
+    # 开启校验和时每个分片的校验和，以PartNumber为键
+    checksums: Dict[int, Checksums] = field(default_factory=dict)
+
+    @property
+    def size(self) -> int:
+        return sum(t.size for t in self.timings)
+
+    @property
+    def predicted_etag(self) -> Optional[str]:
+        """
+        根据分片MD5预测完成上传后的ETag，没有开启校验和时返回None
+        """
+        if not self.checksums or len(self.checksums) != len(self.parts):
+            return None
+        return predict_multipart_etag(self.checksums[n].md5 for n in sorted(self.checksums))
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / self.seconds
+
+
+@contextlib.contextmanager
+def mapped_parts(path: str, part_size: int) -> Iterator[List[MemoryViewReader]]:
+    """
+    只读映射本地文件，按 split_ranges 的分片返回映射上的 MemoryViewReader 窗口，空文件返回空列表。
+    退出时先释放所有窗口再关闭映射
+    """
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            # 空文件不能映射
+            yield []
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(mapped)
+        readers: List[MemoryViewReader] = []
+        try:
+            if hasattr(mapped, 'madvise'):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+            readers = [MemoryViewReader(view[first:last + 1]) for first, last in split_ranges(size, part_size)]
+            yield readers
+        finally:
+            for reader in readers:
+                reader.close()
+            view.release()
+            try:
+                mapped.close()
+            except BufferError:
+                # 调用方仍持有 remaining() 返回的切片，映射在切片被回收后释放，不掩盖 with 块内的异常
+                pass
+
+
+class _ByteBudget:
+    """
+    限制正在上传中的分片占用的内存，单个分片超过上限时独占全部额度
+    """
+
+    def __init__(self, limit: int):
+        self.__limit = limit
+        self.__used = 0
+        self.__cond = threading.Condition()
+
+    def acquire(self, size: int):
+        with self.__cond:
+            self.__cond.wait_for(lambda: self.__used == 0 or self.__used + size <= self.__limit)
+            self.__used += size
+
+    def release(self, size: int):
+        with self.__cond:
+            self.__used -= size
+            self.__cond.notify_all()
+
+
+class MultipartUploader:
+    """
+    使用线程池并发上传分片，上传中的分片总大小不超过max_in_flight_bytes，
+    任意分片失败时中止分片上传。
+
+    开启 checksums 时每个分片在上传线程中一次遍历算出MD5和CRC32，
+    通过 ContentMD5 参数带上MD5，完成上传后用分片MD5校验服务端返回的ETag。
+    不计算SHA-256：S3签名总是自己计算body的SHA-256，不接受预先算好的值，
+    https 下带有 Content-MD5 的流式body则不签名body，算出来也用不上
+    """
+
+    def __init__(self, object_service: Any, bucket: str, key: str, workers: int = 8,
+                 max_in_flight_bytes: int = 64 * MiB, checksums: bool = False):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__key = key
+        self.__workers = workers
+        self.__max_in_flight_bytes = max_in_flight_bytes
+        self.__checksums = checksums
+
+    def upload(self, parts: Iterable[PartBody], **create_kwargs) -> UploadResult:
+        """
+        创建分片上传任务、上传所有分片并完成上传
+        """
+        upload_id = self.__object_service.create_multipart_upload(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            **create_kwargs,
+        )['UploadId']
+        result = self.upload_parts(upload_id, parts)
+        try:
+            result.etag = self.complete(result)['ETag']
+        except Exception:
+            self.abort(upload_id)
+            raise
+        predicted = result.predicted_etag
+        if predicted is not None and predicted != result.etag:
+            raise IOError(f'ETag {result.etag} of {self.__key} does not match the uploaded parts, expected {predicted}')
+        return result
+
+    def upload_file(self, path: str, part_size: int = 64 * MiB, **create_kwargs) -> UploadResult:
+        """
+        分片上传本地文件。文件只读映射到内存，每个分片是映射上的一个 MemoryViewReader 窗口，
+        发送时按块从映射中读取，不会把整个分片读入内存，占用的内存与文件大小无关
+        """
+        with mapped_parts(path, part_size) as readers:
+            # 空文件没有分片窗口，上传一个空分片
+            return self.upload(readers or [b''], **create_kwargs)
+
+    def upload_parts(self, upload_id: str, parts: Iterable[PartBody], first_part_number: int = 1,
+                     abort_on_failure: bool = True) -> UploadResult:
+        """
+        上传分片但不完成上传，返回的结果中分片按照PartNumber排序
+        """
+        return self.upload_numbered_parts(
+            upload_id,
+            enumerate(parts, start=first_part_number),
+            abort_on_failure=abort_on_failure,
+        )
+
+    def upload_numbered_parts(self, upload_id: str, parts: Iterable[Tuple[int, PartBody]],
+                              abort_on_failure: bool = True,
+                              on_part: Optional[Callable[[Dict[str, Any]], None]] = None) -> UploadResult:
+        """
+        上传指定PartNumber的分片，PartNumber不需要连续。
+        on_part 在上传线程中以 {'PartNumber', 'ETag'} 为参数调用，每个分片成功后立即调用一次
+        """
+        result = UploadResult(upload_id=upload_id)
+        budget = _ByteBudget(self.__max_in_flight_bytes)
+        failed = threading.Event()
+        futures: List[Future] = []
+        start = time.perf_counter()
+        executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='multipart-upload')
+        try:
+            for part_number, body in parts:
+                if failed.is_set():
+                    break
+                size = len(body)
+                budget.acquire(size)
+                future = executor.submit(self.__upload_part, upload_id, part_number, body, on_part)
+                future.add_done_callback(lambda f, size=size: self.__on_done(f, size, budget, failed))
+                futures.append(future)
+            for future in futures:
+                part, timing, checksums = future.result()
+                result.parts.append(part)
+                result.timings.append(timing)
+                if checksums is not None:
+                    result.checksums[part['PartNumber']] = checksums
+        except Exception:
+            # 取消尚未开始的分片，等待进行中的分片结束后再中止
+            executor.shutdown(wait=True, cancel_futures=True)
+            if abort_on_failure:
+                self.abort(upload_id)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        result.seconds = time.perf_counter() - start
+        result.parts.sort(key=lambda p: p['PartNumber'])
+        result.timings.sort(key=lambda t: t.part_number)
+        return result
+
+    def complete(self, result: UploadResult) -> Dict[str, Any]:
+        return self.__object_service.complete_multipart_upload(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            UploadId=result.upload_id,
+            MultipartUpload={'Parts': result.parts},
+        )
+
+    def abort(self, upload_id: str):
+        self.__object_service.abort_multipart_upload(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            UploadId=upload_id,
+        )
+
+    @staticmethod
+    def __on_done(future: Future, size: int, budget: _ByteBudget, failed: threading.Event):
+        budget.release(size)
+        if future.cancelled() or future.exception() is not None:
+            failed.set()
+
+    def __upload_part(self, upload_id: str, part_number: int, body: PartBody,
+                      on_part: Optional[Callable[[Dict[str, Any]], None]]):
+        start = time.perf_counter()
+        kwargs = dict(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        checksums: Optional[Checksums] = None
+        if self.__checksums:
+            checksums = compute_checksums(body, crc32c=False, sha256=False)
+            kwargs['ContentMD5'] = checksums.content_md5
+        resp = self.__object_service.upload_part(**kwargs)
+        timing = PartTiming(part_number=part_number, size=len(body), seconds=time.perf_counter() - start)
+        part = {'PartNumber': part_number, 'ETag': resp['ETag']}
+        if on_part is not None:
+            on_part(part)
+        return part, timing, checksums
+
+
+@dataclass()
+class CopyResult:
+    size: int
+    etag: Optional[str] = None
+    # False 表示使用 copy_object 单次复制
+    multipart: bool = False
+    upload_id: Optional[str] = None
+    parts: List[Dict[str, Any]] = field(default_factory=list)
+    seconds: float = 0.0
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / self.seconds
+
+
+def split_ranges(size: int, part_size: int) -> List[Tuple[int, int]]:
+    """
+    把 [0, size) 拆分为闭区间 (first, last) 的列表，分片数超过上限时增大分片
+    """
+    part_size = min(max(part_size, MIN_PART_SIZE, math.ceil(size / MAX_PARTS)), MAX_PART_SIZE)
+    return [(start, min(start + part_size, size) - 1) for start in range(0, size, part_size)]
+
+
+class MultipartCopier:
+    """
+    服务端复制文件，数据不经过客户端：先 head_object 获取源文件的大小和ETag，
+    小于 multipart_threshold 的文件使用 copy_object，否则按 part_size 拆分后并发 upload_part_copy，
+    每个分片都校验源文件的ETag，复制过程中源文件被修改时复制失败并中止分片上传
+    """
+
+    def __init__(self, object_service: Any, bucket: str, key: str, workers: int = 8,
+                 part_size: int = 64 * MiB, multipart_threshold: int = 128 * MiB):
+        self.__object_service = object_service
+        self.__bucket = bucket
+        self.__key = key
+        self.__workers = workers
+        self.__part_size = part_size
+        self.__multipart_threshold = min(multipart_threshold, MAX_COPY_OBJECT_SIZE)
+
+    def copy(self, src_bucket: str, src_key: str, **kwargs) -> CopyResult:
+        """
+        kwargs 中的 ContentType、Metadata 等属性会覆盖源文件的属性，其他参数原样传给
+        copy_object 或 create_multipart_upload，例如 StorageClass
+        """
+        start = time.perf_counter()
+        head = self.__object_service.head_object(Bucket=src_bucket, Key=src_key)
+        size = head['ContentLength']
+        attributes = {k: head[k] for k in _COPIED_ATTRIBUTES if head.get(k) is not None}
+        attributes.update(kwargs)
+        if size < self.__multipart_threshold:
+            copy_kwargs = dict(kwargs)
+            if any(k in kwargs for k in _COPIED_ATTRIBUTES):
+                copy_kwargs = {**attributes, 'MetadataDirective': 'REPLACE'}
+            resp = self.__object_service.copy_object(
+                Bucket=self.__bucket,
+                Key=self.__key,
+                CopySource=f'{src_bucket}/{src_key}',
+                CopySourceIfMatch=head['ETag'],
+                **copy_kwargs,
+            )
+            return CopyResult(
+                size=size,
+                etag=resp['CopyObjectResult']['ETag'],
+                seconds=time.perf_counter() - start,
+            )
+
+        upload_id = self.__object_service.create_multipart_upload(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            **attributes,
+        )['UploadId']
+        result = self.copy_parts(upload_id, src_bucket, src_key, size=size, source_etag=head['ETag'])
+        try:
+            result.etag = self.__object_service.complete_multipart_upload(
+                Bucket=self.__bucket,
+                Key=self.__key,
+                UploadId=upload_id,
+                MultipartUpload={'Parts': result.parts},
+            )['ETag']
+        except Exception:
+            self.abort(upload_id)
+            raise
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def copy_parts(self, upload_id: str, src_bucket: str, src_key: str, first_part_number: int = 1,
+                   size: Optional[int] = None, source_etag: Optional[str] = None,
+                   abort_on_failure: bool = True) -> CopyResult:
+        """
+        把源文件复制为已有分片上传任务中从 first_part_number 开始的分片，但不完成上传
+        """
+        start = time.perf_counter()
+        if size is None or source_etag is None:
+            head = self.__object_service.head_object(Bucket=src_bucket, Key=src_key)
+            size, source_etag = head['ContentLength'], head['ETag']
+        ranges = split_ranges(size, self.__part_size)
+        result = CopyResult(size=size, multipart=True, upload_id=upload_id)
+        executor = ThreadPoolExecutor(max_workers=self.__workers, thread_name_prefix='multipart-copy')
+        try:
+            futures = [
+                executor.submit(self.__copy_part, upload_id, part_number, src_bucket, src_key, source_etag, r)
+                for part_number, r in enumerate(ranges, start=first_part_number)
+            ]
+            for future in futures:
+                result.parts.append(future.result())
+        except Exception:
+            # 取消尚未开始的分片，等待进行中的分片结束后再中止
+            executor.shutdown(wait=True, cancel_futures=True)
+            if abort_on_failure:
+                self.abort(upload_id)
+            raise
+        finally:
+            executor.shutdown(wait=True)
+        result.seconds = time.perf_counter() - start
+        return result
+
+    def abort(self, upload_id: str):
+        self.__object_service.abort_multipart_upload(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            UploadId=upload_id,
+        )
+
+    def __copy_part(self, upload_id: str, part_number: int, src_bucket: str, src_key: str, source_etag: str,
+                    byte_range: Tuple[int, int]) -> Dict[str, Any]:
+        resp = self.__object_service.upload_part_copy(
+            Bucket=self.__bucket,
+            Key=self.__key,
+            UploadId=upload_id,
+            PartNumber=part_number,
+            CopySource=f'{src_bucket}/{src_key}',
+            CopySourceRange=f'bytes={byte_range[0]}-{byte_range[1]}',
+            CopySourceIfMatch=source_etag,
+        )
+        return {'PartNumber': part_number, 'ETag': resp['CopyPartResult']['ETag']}
+
+
+__all__ = [
+    'MultipartUploader',
+    'UploadResult',
+    'PartTiming',
+    'MultipartCopier',
+    'CopyResult',
+    'split_ranges',
+    'mapped_parts',
+]
@@ -0,0 +1,116 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Any, Optional, Union
+
+from util.payload import SeededPayload
+
+Expected = Union[SeededPayload, bytes, bytearray, memoryview]
+
+
+@dataclass()
+class VerifyResult:
+    size: int
+    expected_size: int
+    digest: str
+    expected_digest: str
+    # 第一个内容不一致的字节的偏移，内容一致时为None
+    mismatch_offset: Optional[int]
+    seconds: float
+
+    @property
+    def ok(self) -> bool:
+        return self.mismatch_offset is None and self.size == self.expected_size and self.digest == self.expected_digest
+
+    @property
+    def bytes_per_second(self) -> float:
+        if self.seconds <= 0:
+            return 0.0
+        return self.size / self.seconds
+
+    def __str__(self) -> str:
+        state = 'ok' if self.ok else f'mismatch at offset {self.mismatch_offset}'
+        return f'{state}: {self.size}/{self.expected_size} bytes, {self.digest} vs {self.expected_digest}, ' \
+               f'{self.bytes_per_second / 1024 / 1024:.1f} MiB/s'
+
+
+def _first_difference(a: memoryview, b: memoryview) -> int:
+    # 二分查找第一个不同的字节，避免逐字节比较
+    lo, hi = 0, min(len(a), len(b))
+    while hi - lo > 64:
+        mid = (lo + hi) // 2
+        if a[lo:mid] == b[lo:mid]:
+            lo = mid
+        else:
+            hi = mid
+    for i in range(lo, hi):
+        if a[i] != b[i]:
+            return i
+    return hi
+
+
+class StreamVerifier:
+    """
+    分块读取下载的内容，逐块与期望内容比较并增量计算摘要，
+    内存占用与文件大小无关
+    """
+
+    def __init__(self, expected: Expected, algorithm: str = 'md5', chunk_size: int = 1024 * 1024):
+        self.__expected = expected
+        self.__algorithm = algorithm
+        self.__chunk_size = chunk_size
+
+    def __expected_views(self, start: int, end: int):
+        if isinstance(self.__expected, SeededPayload):
+            return self.__expected.iter_views(start, end)
+        return [memoryview(self.__expected)[start:end]]
+
+    def verify(self, body: Any) -> VerifyResult:
+        """
+        body 是 get_object 返回的 Body 或其他支持 read(size) 的文件对象，
+        期望内容的摘要在同一次遍历中计算
+        """
+        expected_size = len(self.__expected)
+        h = hashlib.new(self.__algorithm)
+        expected_h = hashlib.new(self.__algorithm)
+        size = 0
+        mismatch_offset: Optional[int] = None
+        start = time.perf_counter()
+        while True:
+            chunk = body.read(self.__chunk_size)
+            if not chunk:
+                break
+            h.update(chunk)
+            actual = memoryview(chunk)
+            pos = 0
+            for expected in self.__expected_views(min(size, expected_size), min(size + len(chunk), expected_size)):
+                segment = actual[pos:pos + len(expected)]
+                if mismatch_offset is None and segment != expected:
+                    mismatch_offset = size + pos + _first_difference(segment, expected)
+                expected_h.update(expected)
+                pos += len(expected)
+            if mismatch_offset is None and pos < len(chunk):
+                # 下载的内容比期望的更长
+                mismatch_offset = size + pos
+            size += len(chunk)
+        seconds = time.perf_counter() - start
+        if size < expected_size:
+            # 下载的内容是期望内容的前缀
+            for expected in self.__expected_views(size, expected_size):
+                expected_h.update(expected)
+            if mismatch_offset is None:
+                mismatch_offset = size
+        return VerifyResult(
+            size=size,
+            expected_size=expected_size,
+            digest=h.hexdigest(),
+            expected_digest=expected_h.hexdigest(),
+            mismatch_offset=mismatch_offset,
+            seconds=seconds,
+        )
+
+
+__all__ = [
+    'StreamVerifier',
+    'VerifyResult',
+]